@@ -0,0 +1,266 @@
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from synthetic import generate, parse_scale
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+DEFAULT_WORKDIR = Path(tempfile.gettempdir()) / "az-hp-bench"
+DEFAULT_SCALES = ["10k", "100k"]
+DEFAULT_TOLERANCE = 0.25
+# Stages faster than this are timer noise at small scales; only their row counts and memory are checked
+MIN_TIMED_SECONDS = 0.5
+SYNTHETIC_VERSION = 2
+GEOPANDAS = "geopandas"
+DUCKDB = "duckdb"
+# Layers both enrichment backends write, and the columns that order their rows for comparison
+OUTPUT_LAYERS = ["roads_enriched", "places_hunt", "water_named"]
+ROW_KEYS = ["id", "ADMIN_UNIT_NAME", "GMUNAME"]
+
+
+def ensure_data(data_dir: Path, roads: int, seed: int):
+    marker = data_dir / "synthetic.json"
+    spec = {"version": SYNTHETIC_VERSION, "roads": roads, "seed": seed}
+    if marker.exists() and json.loads(marker.read_text()) == spec:
+        return
+    print(f"  Generating synthetic inputs ({roads} roads)...")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    generate(data_dir, roads, seed)
+    marker.write_text(json.dumps(spec))
+
+
+def execute(streaming: bool, workers: int, partitioned: bool, backend: str):
+    # Runs inside a child process whose AZHP_DATA_DIR points at the synthetic tree
+    from pipeline import instrument
+
+    clip = importlib.import_module("pipeline.02_clip_arizona")
+    enrich = importlib.import_module("pipeline.03_enrich")
+    if partitioned:
+        for input_name, output_name in clip.CLIP_LAYERS:
+            clip.clip_layer_partitioned(input_name, output_name)
+        enrich.enrich_roads_partitioned(workers=workers)
+        enrich.filter_hunt_pois_partitioned(workers=workers)
+        enrich.process_water_features_partitioned(workers=workers)
+        instrument.write_report()
+        return
+    for input_name, output_name in clip.CLIP_LAYERS:
+        clip.clip_layer(input_name, output_name)
+    if backend == DUCKDB:
+        enrich.enrich_roads_sql(workers)
+        enrich.filter_hunt_pois_sql(workers)
+        enrich.process_water_features_sql(workers)
+        instrument.write_report()
+        return
+    if streaming:
+        enrich.enrich_roads_streaming(workers=workers)
+    else:
+        enrich.enrich_roads()
+    enrich.filter_hunt_pois()
+    enrich.process_water_features()
+    instrument.write_report()
+
+
+def stage_key(record: dict) -> str:
+    input_name = record["args"].get("input_name")
+    return f"{record['stage']}[{input_name}]" if input_name else record["stage"]
+
+
+def run_scale(scale: str, data_dir: Path, streaming: bool, workers: int, partitioned: bool, backend: str) -> dict:
+    # Drop outputs, manifest and old reports so every stage really runs
+    shutil.rmtree(data_dir / "processed", ignore_errors=True)
+    shutil.rmtree(data_dir / "reports", ignore_errors=True)
+    (data_dir / "processed").mkdir()
+    (data_dir / "manifest.json").unlink(missing_ok=True)
+
+    run_id = f"bench-{scale}"
+    env = {**os.environ, "AZHP_DATA_DIR": str(data_dir), "PIPELINE_RUN_ID": run_id}
+    env.pop("PIPELINE_PROFILE", None)
+    command = [sys.executable, __file__, "--execute", "--workers", str(workers)]
+    if streaming:
+        command.append("--streaming")
+    if partitioned:
+        command.append("--partitioned")
+    command += ["--backend", backend]
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    report = json.loads((data_dir / "reports" / f"{run_id}.json").read_text())
+    results = {}
+    for record in report["stages"]:
+        wall = max(record["wall_seconds"], 1e-9)
+        results[stage_key(record)] = {
+            "rows_in": record["rows_in"],
+            "rows_out": record["rows_out"],
+            "wall_seconds": record["wall_seconds"],
+            "cpu_seconds": round(record["cpu_seconds"] + record["children_cpu_seconds"], 3),
+            "rows_per_second": round((record["rows_in"] or 0) / wall, 1),
+            "peak_rss_bytes": record["peak_rss_bytes"],
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for scale, stages in results.items():
+        for stage, current in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is None:
+                continue
+            label = f"{scale} {stage}"
+            # Same seed, same inputs: a different output row count is a behaviour change
+            if current["rows_out"] != reference["rows_out"]:
+                regressions.append(f"{label}: rows_out {current['rows_out']} != baseline {reference['rows_out']}")
+            timed = reference["wall_seconds"] >= MIN_TIMED_SECONDS
+            if timed and current["rows_per_second"] < reference["rows_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: {current['rows_per_second']:.0f} rows/s vs baseline {reference['rows_per_second']:.0f}"
+                )
+            if current["peak_rss_bytes"] > reference["peak_rss_bytes"] * (1 + tolerance):
+                regressions.append(
+                    f"{label}: peak RSS {current['peak_rss_bytes'] / 2**20:.0f} MB "
+                    f"vs baseline {reference['peak_rss_bytes'] / 2**20:.0f} MB"
+                )
+    return regressions
+
+
+def canonical(path: Path) -> pa.Table:
+    # Row order, column order and string widths aside, the backends must agree value for value
+    table = pq.read_table(path).replace_schema_metadata()
+    table = table.drop_columns([c for c in ("bbox",) if c in table.column_names])
+    table = table.select(sorted(table.column_names))
+    for i, field in enumerate(table.schema):
+        if pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table.sort_by([(c, "ascending") for c in ROW_KEYS if c in table.column_names])
+
+
+def snapshot_outputs(data_dir: Path, backend: str) -> Path:
+    target = data_dir / f"outputs-{backend}"
+    shutil.rmtree(target, ignore_errors=True)
+    target.mkdir()
+    for name in OUTPUT_LAYERS:
+        path = data_dir / "processed" / f"{name}.parquet"
+        if path.exists():
+            shutil.copyfile(path, target / path.name)
+    return target
+
+
+def compare_outputs(label: str, reference_dir: Path, other_dir: Path) -> list[str]:
+    mismatches = []
+    for name in OUTPUT_LAYERS:
+        reference_path, other_path = reference_dir / f"{name}.parquet", other_dir / f"{name}.parquet"
+        if not reference_path.exists() or not other_path.exists():
+            if reference_path.exists() != other_path.exists():
+                mismatches.append(f"{label} {name}: written by only one backend")
+            continue
+        reference, other = canonical(reference_path), canonical(other_path)
+        if reference.column_names != other.column_names:
+            mismatches.append(f"{label} {name}: columns {reference.column_names} != {other.column_names}")
+            continue
+        if reference.num_rows != other.num_rows:
+            mismatches.append(f"{label} {name}: {reference.num_rows} rows != {other.num_rows}")
+            continue
+        # Nested columns can come back from the pandas round trip with null-typed children
+        differing = [
+            c for c in reference.column_names
+            if not reference.column(c).equals(other.column(c))
+            and reference.column(c).to_pylist() != other.column(c).to_pylist()
+        ]
+        if differing:
+            mismatches.append(f"{label} {name}: values differ in {', '.join(differing)}")
+    return mismatches
+
+
+def print_results(scale: str, stages: dict):
+    print(f"  {'stage':<50} {'rows in':>10} {'rows out':>10} {'wall s':>8} {'rows/s':>12} {'peak MB':>8}")
+    for stage, r in stages.items():
+        print(
+            f"  {stage:<50} {r['rows_in'] or 0:>10} {r['rows_out'] or 0:>10} {r['wall_seconds']:>8.2f} "
+            f"{r['rows_per_second']:>12.0f} {r['peak_rss_bytes'] / 2**20:>8.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clip and enrich stages on synthetic Arizona data")
+    parser.add_argument("scales", nargs="*", default=DEFAULT_SCALES, help="Road counts, e.g. 10k 1M 10M")
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR, help="Where synthetic data is generated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--streaming", action="store_true", help="Benchmark enrich_roads_streaming instead")
+    parser.add_argument("--partitioned", action="store_true", help="Benchmark the quadkey-partitioned clip and enrich")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (DuckDB threads) for enrichment")
+    parser.add_argument("--backend", choices=[GEOPANDAS, DUCKDB], default=GEOPANDAS, help="Enrichment engine to benchmark")
+    parser.add_argument(
+        "--compare-backends", action="store_true",
+        help="Run the in-memory GeoPandas and the DuckDB enrichment and check they write the same rows",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed fractional slowdown/growth")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--execute", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.execute:
+        execute(args.streaming, args.workers, args.partitioned, args.backend)
+        return
+    if (args.backend == DUCKDB or args.compare_backends) and (args.streaming or args.partitioned):
+        parser.error("the DuckDB backend does not take --streaming or --partitioned")
+
+    print("=" * 60)
+    print("AZ Hunt Planner - Synthetic Benchmarks")
+    print("=" * 60)
+
+    mode = "partitioned" if args.partitioned else "streaming" if args.streaming else "in-memory"
+    backends = [GEOPANDAS, DUCKDB] if args.compare_backends else [args.backend]
+    results = {}
+    mismatches = []
+    for scale in args.scales:
+        roads = parse_scale(scale)
+        data_dir = args.workdir / str(roads)
+        ensure_data(data_dir, roads, args.seed)
+        for backend in backends:
+            key = f"{roads}-{DUCKDB if backend == DUCKDB else mode}"
+            print(f"Scale {scale} ({roads} roads, {DUCKDB if backend == DUCKDB else mode} enrichment)")
+            results[key] = run_scale(str(roads), data_dir, args.streaming, args.workers, args.partitioned, backend)
+            print_results(key, results[key])
+            if args.compare_backends:
+                snapshot_outputs(data_dir, backend)
+        if args.compare_backends:
+            mismatches += compare_outputs(
+                str(roads), data_dir / f"outputs-{GEOPANDAS}", data_dir / f"outputs-{DUCKDB}"
+            )
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance) + mismatches
+    print("=" * 60)
+    if args.compare_backends and not mismatches:
+        print("GeoPandas and DuckDB enrichment wrote the same rows")
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    if baseline:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline.geoparquet import wkb_geo_metadata
+from pipeline.overture import THEMES as OVERTURE_THEMES, connect, extract_theme
+from pipeline.partitions import tile_bounds
+from pipeline.terrain import write_dem
+from pipeline.utils import AGENCY_ACCESS_MAP, AZ_BBOX, HUNT_POI_CATEGORIES
+
+CHUNK_SIZE = 250_000
+SMA_GRID = (64, 64)
+GMU_GRID = (12, 10)
+# Synthetic DEM: 256-pixel Terrarium tiles at this zoom (about 300 m per pixel)
+TERRAIN_ZOOM = 9
+TERRAIN_TILE_SIZE = 256
+
+# Rough Arizona outline (Colorado River on the west, the Sonora border to the south)
+AZ_OUTLINE = [
+    (-109.05, 37.00), (-114.05, 37.00), (-114.05, 36.19), (-114.75, 36.09), (-114.57, 35.18),
+    (-114.63, 34.87), (-114.13, 34.31), (-114.43, 34.08), (-114.72, 33.41), (-114.52, 33.03),
+    (-114.82, 32.50), (-114.81, 32.49), (-111.07, 31.33), (-109.05, 31.33),
+]
+
+# Population centers roads and places cluster around: (lon, lat, spread in degrees, weight)
+CLUSTERS = [
+    (-112.07, 33.45, 0.35, 0.40),
+    (-110.97, 32.22, 0.25, 0.20),
+    (-111.65, 35.20, 0.15, 0.10),
+    (-114.60, 32.69, 0.10, 0.05),
+    (-112.47, 34.54, 0.15, 0.10),
+    (-109.90, 34.25, 0.30, 0.15),
+]
+
+ROAD_CLASSES = ["motorway", "primary", "secondary", "tertiary", "residential", "service",
+                "unclassified", "track", "path", "footway"]
+ROAD_CLASS_WEIGHTS = [0.01, 0.03, 0.05, 0.08, 0.38, 0.15, 0.07, 0.15, 0.05, 0.03]
+SURFACES = ["paved", "unpaved", "gravel", "dirt"]
+PLACE_CATEGORIES = HUNT_POI_CATEGORIES + ["restaurant", "cafe", "gas_station", "hotel", "school", "church"]
+WATER_CLASSES = [("stream", "river"), ("river", "river"), ("canal", "canal"), ("lake", "lake"), ("pond", "lake")]
+
+ROAD_SURFACE_TYPE = pa.list_(pa.struct([("value", pa.string()), ("between", pa.list_(pa.float64()))]))
+NAMES_TYPE = pa.struct([("primary", pa.string())])
+CATEGORIES_TYPE = pa.struct([("primary", pa.string()), ("alternate", pa.list_(pa.string()))])
+CONNECTORS_TYPE = pa.list_(pa.struct([("connector_id", pa.string()), ("at", pa.float64())]))
+# Road ends closer than this share a connector, which is what joins the random walks into a network
+CONNECTOR_SNAP = 0.01
+BBOX_TYPE = pa.struct([("xmin", pa.float64()), ("xmax", pa.float64()), ("ymin", pa.float64()), ("ymax", pa.float64())])
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower().replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def _geo_schema(fields: list) -> pa.Schema:
+    return pa.schema(fields, metadata={b"geo": json.dumps(wkb_geo_metadata()).encode()})
+
+
+def _locations(rng, n: int) -> np.ndarray:
+    # Mix of clustered and uniform points over a box a little larger than Arizona, so clipping has work
+    clustered = rng.random(n) < 0.6
+    weights = np.array([c[3] for c in CLUSTERS])
+    which = rng.choice(len(CLUSTERS), size=n, p=weights / weights.sum())
+    centers = np.array([c[:2] for c in CLUSTERS])[which]
+    spread = np.array([c[2] for c in CLUSTERS])[which][:, None]
+    points = centers + rng.normal(size=(n, 2)) * spread
+    margin = 0.3
+    uniform = np.column_stack([
+        rng.uniform(AZ_BBOX["xmin"] - margin, AZ_BBOX["xmax"] + margin, n),
+        rng.uniform(AZ_BBOX["ymin"] - margin, AZ_BBOX["ymax"] + margin, n),
+    ])
+    return np.where(clustered[:, None], points, uniform)
+
+
+def _random_lines(rng, n: int, min_vertices: int = 2, max_vertices: int = 8, step: float = 0.004) -> np.ndarray:
+    counts = rng.integers(min_vertices, max_vertices + 1, n)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    increments = rng.normal(scale=step, size=(int(counts.sum()), 2))
+    increments[starts] = 0.0
+    walk = np.cumsum(increments, axis=0)
+    walk -= np.repeat(walk[starts], counts, axis=0)
+    coords = walk + np.repeat(_locations(rng, n), counts, axis=0)
+    return shapely.linestrings(coords, indices=np.repeat(np.arange(n), counts))
+
+
+def _bbox(geoms: np.ndarray) -> pa.StructArray:
+    bounds = shapely.bounds(geoms)
+    return pa.StructArray.from_arrays(
+        [pa.array(bounds[:, i]) for i in (0, 2, 1, 3)], fields=list(BBOX_TYPE)
+    )
+
+
+def _names(rng, prefix: str, ids: np.ndarray, null_fraction: float) -> pa.StructArray:
+    missing = rng.random(len(ids)) < null_fraction
+    primary = pa.array([f"{prefix} {i}" for i in ids], type=pa.string())
+    return pa.StructArray.from_arrays([primary], fields=list(NAMES_TYPE), mask=pa.array(missing))
+
+
+def _road_surface(rng, n: int) -> pa.ListArray:
+    # Half the segments carry one surface entry, the rest are null as in Overture
+    present = rng.random(n) < 0.5
+    offsets = np.r_[0, np.cumsum(present)].astype(np.int32)
+    values = pa.StructArray.from_arrays(
+        [
+            pa.array(np.array(SURFACES)[rng.integers(0, len(SURFACES), int(present.sum()))]),
+            pa.nulls(int(present.sum()), type=pa.list_(pa.float64())),
+        ],
+        fields=list(ROAD_SURFACE_TYPE.value_type),
+    )
+    return pa.ListArray.from_arrays(pa.array(offsets), values, type=ROAD_SURFACE_TYPE, mask=pa.array(~present))
+
+
+def _connectors(geoms: np.ndarray) -> pa.ListArray:
+    # A connector at both ends of every road, named after the snap cell the end falls in
+    ends = np.stack([shapely.get_coordinates(shapely.get_point(geoms, i)) for i in (0, -1)], axis=1)
+    cells = np.round(ends / CONNECTOR_SNAP).astype(np.int64)
+    ids = np.char.add(np.char.add("c", cells[..., 0].astype(str)), np.char.add("_", cells[..., 1].astype(str)))
+    values = pa.StructArray.from_arrays(
+        [pa.array(ids.ravel()), pa.array(np.tile([0.0, 1.0], len(geoms)))], fields=list(CONNECTORS_TYPE.value_type)
+    )
+    return pa.ListArray.from_arrays(pa.array(np.arange(0, 2 * len(geoms) + 1, 2, dtype=np.int32)), values, type=CONNECTORS_TYPE)
+
+
+def road_chunk(rng, start: int, n: int) -> pa.Table:
+    geoms = _random_lines(rng, n)
+    ids = np.arange(start, start + n)
+    classes = rng.choice(ROAD_CLASSES, size=n, p=ROAD_CLASS_WEIGHTS)
+    return pa.table(
+        {
+            "id": pa.array([f"r{i}" for i in ids]),
+            "geometry": pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+            "bbox": _bbox(geoms),
+            "subtype": pa.array(["road"] * n),
+            "class": pa.array(classes),
+            "subclass": pa.nulls(n, type=pa.string()),
+            "names": _names(rng, "Road", ids, 0.3),
+            "road_surface": _road_surface(rng, n),
+            "road_flags": pa.nulls(n, type=pa.string()),
+            "access_restrictions": pa.nulls(n, type=pa.string()),
+            "connectors": _connectors(geoms),
+        }
+    )
+
+
+def place_chunk(rng, start: int, n: int) -> pa.Table:
+    points = _locations(rng, n)
+    geoms = shapely.points(points)
+    ids = np.arange(start, start + n)
+    primary = rng.choice(PLACE_CATEGORIES, size=n)
+    has_alternate = rng.random(n) < 0.2
+    alternate = pa.ListArray.from_arrays(
+        pa.array(np.r_[0, np.cumsum(has_alternate)].astype(np.int32)),
+        pa.array(["parking_lot"] * int(has_alternate.sum()), type=pa.string()),
+    )
+    categories = pa.StructArray.from_arrays(
+        [pa.array(primary), alternate], fields=list(CATEGORIES_TYPE), mask=pa.array(rng.random(n) < 0.05)
+    )
+    return pa.table(
+        {
+            "id": pa.array([f"p{i}" for i in ids]),
+            "geometry": pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+            "bbox": _bbox(geoms),
+            "names": _names(rng, "Place", ids, 0.2),
+            "categories": categories,
+            "confidence": pa.array(rng.uniform(0.3, 1.0, n)),
+        }
+    )
+
+
+def water_chunk(rng, start: int, n: int) -> pa.Table:
+    lakes = rng.random(n) < 0.15
+    geoms = _random_lines(rng, n, step=0.01)
+    geoms[lakes] = shapely.buffer(shapely.points(_locations(rng, int(lakes.sum()))), 0.005, quad_segs=4)
+    ids = np.arange(start, start + n)
+    kind = rng.integers(0, len(WATER_CLASSES), n)
+    kind[lakes] = 3
+    return pa.table(
+        {
+            "id": pa.array([f"w{i}" for i in ids]),
+            "geometry": pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+            "bbox": _bbox(geoms),
+            "names": _names(rng, "Creek", ids, 0.4),
+            "subtype": pa.array([WATER_CLASSES[k][1] for k in kind]),
+            "class": pa.array([WATER_CLASSES[k][0] for k in kind]),
+            "is_intermittent": pa.array(rng.random(n) < 0.5),
+        }
+    )
+
+
+def write_chunked(path: Path, make_chunk, total: int, rng):
+    tmp_path = path.with_suffix(".parquet.tmp")
+    writer = None
+    try:
+        for start in range(0, total, CHUNK_SIZE):
+            table = make_chunk(rng, start, min(CHUNK_SIZE, total - start))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, _geo_schema(list(table.schema)))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp_path.replace(path)
+
+
+def _grid(nx: int, ny: int, rng, jitter: float) -> list:
+    xs = np.linspace(AZ_BBOX["xmin"], AZ_BBOX["xmax"], nx + 1)
+    ys = np.linspace(AZ_BBOX["ymin"], AZ_BBOX["ymax"], ny + 1)
+    dx, dy = xs[1] - xs[0], ys[1] - ys[0]
+    cells = []
+    for j in range(ny):
+        for i in range(nx):
+            shrink = rng.uniform(0, jitter, 4) * [dx, dy, dx, dy]
+            cells.append(shapely.box(xs[i] + shrink[0], ys[j] + shrink[1], xs[i + 1] - shrink[2], ys[j + 1] - shrink[3]))
+    return cells
+
+
+def sma_table(rng) -> pa.Table:
+    # Agency parcels with gaps (private land), holes (inholdings) and two-part multipolygons
+    codes = list(AGENCY_ACCESS_MAP)
+    rows = []
+    for k, cell in enumerate(_grid(*SMA_GRID, rng, jitter=0.05)):
+        if k % 5 == 0:
+            continue
+        if k % 7 == 0:
+            cell = cell.difference(shapely.buffer(shapely.centroid(cell), 0.25 * min(
+                cell.bounds[2] - cell.bounds[0], cell.bounds[3] - cell.bounds[1])))
+        elif k % 11 == 0:
+            xmin, ymin, xmax, ymax = cell.bounds
+            mid = (xmin + xmax) / 2
+            cell = shapely.MultiPolygon([shapely.box(xmin, ymin, mid - 0.005, ymax), shapely.box(mid + 0.005, ymin, xmax, ymax)])
+        rows.append((k, codes[k % len(codes)], cell))
+    geoms = np.array([r[2] for r in rows], dtype=object)
+    return pa.table(
+        {
+            "OBJECTID": pa.array([r[0] for r in rows], type=pa.int64()),
+            "SMA_ID": pa.array([str(r[0]) for r in rows]),
+            "ADMIN_DEPT_CODE": pa.array(["DOI"] * len(rows)),
+            "ADMIN_AGENCY_CODE": pa.array([r[1] for r in rows]),
+            "ADMIN_UNIT_NAME": pa.array([f"{r[1]} Unit {r[0]}" for r in rows]),
+            "geometry": pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+        }
+    ).replace_schema_metadata({b"geo": json.dumps(wkb_geo_metadata()).encode()})
+
+
+def gmu_frame(rng) -> gpd.GeoDataFrame:
+    cells = _grid(*GMU_GRID, rng, jitter=0.0)
+    n = len(cells)
+    return gpd.GeoDataFrame(
+        {
+            "GMUNAME": [f"{i // 3 + 1}{'ABC'[i % 3]}" for i in range(n)],
+            "REG_NAME": [f"Region {i % 6 + 1}" for i in range(n)],
+            "ACRES": rng.uniform(2e5, 2e6, n).round(),
+            "LANDOWN": "Mixed",
+            "HUNT": "Yes",
+            "AGFDLink": [f"https://www.azgfd.com/hunting/units/{i}" for i in range(n)],
+        },
+        geometry=cells,
+        crs="EPSG:4326",
+    )
+
+
+def terrain_elevation(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    # Rolling hills rising from the low desert in the southwest to the plateau in the northeast
+    base = 300 + 2000 * (lon - AZ_BBOX["xmin"]) / (AZ_BBOX["xmax"] - AZ_BBOX["xmin"]) * (lat - AZ_BBOX["ymin"]) / (AZ_BBOX["ymax"] - AZ_BBOX["ymin"])
+    return base + 250 * np.sin(lon * 9.0) * np.cos(lat * 11.0) + 60 * np.sin(lon * 53.0 + lat * 47.0)
+
+
+def terrain_tiles():
+    n = 1 << TERRAIN_ZOOM
+    xmin = int((AZ_BBOX["xmin"] + 180) / 360 * n)
+    xmax = int((AZ_BBOX["xmax"] + 180) / 360 * n)
+    ymin = int((1 - np.arcsinh(np.tan(np.radians(AZ_BBOX["ymax"]))) / np.pi) / 2 * n)
+    ymax = int((1 - np.arcsinh(np.tan(np.radians(AZ_BBOX["ymin"]))) / np.pi) / 2 * n)
+    pixels = (np.arange(TERRAIN_TILE_SIZE) + 0.5) / TERRAIN_TILE_SIZE
+    for x in range(xmin, xmax + 1):
+        for y in range(ymin, ymax + 1):
+            west, _, east, _ = tile_bounds(x, y, TERRAIN_ZOOM)
+            lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixels) / n))))
+            lon, lat = np.meshgrid(west + pixels * (east - west), lat)
+            yield x, y, np.round(terrain_elevation(lon, lat))
+
+
+def generate(data_dir: Path, roads: int, seed: int = 0):
+    raw = data_dir / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    (data_dir / "processed").mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    gpd.GeoDataFrame({"NAME": ["Arizona"], "STUSPS": ["AZ"]}, geometry=[shapely.Polygon(AZ_OUTLINE)], crs="EPSG:4326").to_file(
+        raw / "az_boundary.geojson", driver="GeoJSON"
+    )
+    gmu_frame(rng).to_file(raw / "azgfd_gmu.geojson", driver="GeoJSON")
+    pq.write_table(sma_table(rng), raw / "blm_sma_az.parquet")
+    write_chunked(raw / "overture_transportation_az.parquet", road_chunk, roads, rng)
+    write_chunked(raw / "overture_places_az.parquet", place_chunk, max(roads // 5, 1), rng)
+    write_chunked(raw / "overture_water_az.parquet", water_chunk, max(roads // 10, 1), rng)
+    bounds = (AZ_BBOX["xmin"], AZ_BBOX["ymin"], AZ_BBOX["xmax"], AZ_BBOX["ymax"])
+    write_dem(raw / "terrain.pmtiles", TERRAIN_ZOOM, terrain_tiles(), bounds)
+
+
+# Raw layer -> (dataset path in an Overture release, chunk generator for new features)
+RELEASE_DATASETS = {
+    "overture_transportation_az": ("theme=transportation/type=segment", road_chunk),
+    "overture_places_az": ("theme=places/type=place", place_chunk),
+    "overture_water_az": ("theme=base/type=water", water_chunk),
+}
+
+
+def write_release(release_dir: Path, data_dir: Path):
+    # Lays the raw synthetic layers out like an Overture release mirror, then replaces them with
+    # what the download step extracts from that mirror, so a later update diffs like for like
+    for name, (dataset, _) in RELEASE_DATASETS.items():
+        (release_dir / dataset).mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(data_dir / "raw" / f"{name}.parquet", release_dir / dataset / "part-00000.parquet")
+    con = connect(str(release_dir))
+    for theme in OVERTURE_THEMES:
+        extract_theme(con, theme, str(release_dir), data_dir / "raw" / f"overture_{theme.name}_az.parquet", AZ_BBOX)
+    con.close()
+
+
+def _renamed(names: pa.StructArray, renamed: np.ndarray) -> pa.StructArray:
+    primary = names.field("primary").to_numpy(zero_copy_only=False).copy()
+    primary[renamed] = [f"{p or 'Unnamed'} (renamed)" for p in primary[renamed]]
+    missing = names.is_null().to_numpy(zero_copy_only=False) & ~renamed
+    return pa.StructArray.from_arrays([pa.array(primary, type=pa.string())], fields=list(names.type), mask=pa.array(missing))
+
+
+def evolve_release(previous_dir: Path, release_dir: Path, seed: int = 1, fraction: float = 0.01):
+    # The next release: fraction of the features each moved, renamed and removed, and as many added
+    rng = np.random.default_rng(seed)
+    for dataset, make_chunk in RELEASE_DATASETS.values():
+        table = pq.read_table(previous_dir / dataset / "part-00000.parquet")
+        n = table.num_rows
+        k = int(n * fraction)
+        order = rng.permutation(n)
+        moved, renamed, removed = (np.zeros(n, dtype=bool) for _ in range(3))
+        moved[order[:k]], renamed[order[k:2 * k]], removed[order[2 * k:3 * k]] = True, True, True
+
+        geoms = shapely.from_wkb(table.column("geometry").to_numpy(zero_copy_only=False))
+        geoms[moved] = shapely.transform(geoms[moved], lambda coords: coords + 0.002)
+        table = table.set_column(table.schema.get_field_index("geometry"), "geometry", pa.array(shapely.to_wkb(geoms), type=pa.binary()))
+        table = table.set_column(table.schema.get_field_index("bbox"), "bbox", _bbox(geoms))
+        table = table.set_column(table.schema.get_field_index("names"), "names", _renamed(table.column("names").combine_chunks(), renamed))
+
+        next_id = max(int(i[1:]) for i in table.column("id").to_pylist()) + 1
+        added = make_chunk(rng, next_id, k).cast(table.schema)
+        (release_dir / dataset).mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.concat_tables([table.filter(pa.array(~removed)), added]), release_dir / dataset / "part-00000.parquet")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Overture releases for testing incremental updates")
+    commands = parser.add_subparsers(dest="command", required=True)
+    release = commands.add_parser("release", help="Generate a data tree and a release mirror of its Overture layers")
+    release.add_argument("data_dir", type=Path)
+    release.add_argument("release_dir", type=Path)
+    release.add_argument("--roads", default="100k", help="Road count, e.g. 100k or 1M")
+    release.add_argument("--seed", type=int, default=0)
+    evolve = commands.add_parser("evolve", help="Derive the next release from a previous mirror")
+    evolve.add_argument("previous_dir", type=Path)
+    evolve.add_argument("release_dir", type=Path)
+    evolve.add_argument("--seed", type=int, default=1)
+    evolve.add_argument("--fraction", type=float, default=0.01, help="Share of features moved, renamed, removed and added")
+    args = parser.parse_args()
+
+    if args.command == "release":
+        generate(args.data_dir, parse_scale(args.roads), args.seed)
+        write_release(args.release_dir, args.data_dir)
+    else:
+        evolve_release(args.previous_dir, args.release_dir, args.seed, args.fraction)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import WaypointDialog from './components/WaypointDialog'
 import WaypointPanel from './components/WaypointPanel'
 import MeasurePanel from './components/MeasurePanel'
 import PathPanel from './components/PathPanel'
+import SearchBox from './components/SearchBox'
 import './App.css'
 
 export default function App() {
@@ -140,6 +141,7 @@ export default function App() {
         collapsed={layerPanelCollapsed}
         onToggleCollapse={() => setLayerPanelCollapsed(!layerPanelCollapsed)}
       />
+      <SearchBox map={map} />
       <WaypointPanel
         waypoints={waypoints}
         onSelect={handleSelectWaypoint}
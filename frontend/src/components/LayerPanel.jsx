@@ -5,6 +5,7 @@ const LAYER_CONFIG = [
   { key: 'huntUnits', label: 'Hunt Units', color: '#d32f2f' },
   { key: 'roads', label: 'Roads & Trails', color: '#555' },
   { key: 'landOwnership', label: 'Land Ownership', color: '#4caf50' },
+  { key: 'landlocked', label: 'Landlocked Public Land', color: '#b71c1c' },
   { key: 'water', label: 'Water Features', color: '#2196f3' },
   { key: 'places', label: 'Trailheads / POIs', color: '#1565c0' },
 ]
@@ -31,6 +32,11 @@ const LAND_OWNERSHIP_ITEMS = [
   { color: '#ff9800', label: 'Tribal' },
 ]
 
+const LANDLOCKED_ITEMS = [
+  { color: '#b71c1c', label: 'Landlocked (no public road)' },
+  { color: '#ff6f00', label: 'Corner-locked (corner crossing only)' },
+]
+
 export default function LayerPanel({ layers, setLayers, opacity, setOpacity, collapsed, onToggleCollapse }) {
   return (
     <div className={`layer-panel ${collapsed ? 'collapsed' : ''}`}>
@@ -84,6 +90,15 @@ export default function LayerPanel({ layers, setLayers, opacity, setOpacity, col
               </div>
             ))}
           </div>
+
+          <div className="legend">
+            <h4>Landlocked Public Land</h4>
+            {LANDLOCKED_ITEMS.map(({ color, label }) => (
+              <div key={label}>
+                <span className="swatch" style={{ background: color }} /> {label}
+              </div>
+            ))}
+          </div>
         </>
       )}
     </div>
@@ -0,0 +1,59 @@
+import React, { useEffect, useState } from 'react'
+import { loadSearchIndex, search } from '../utils/searchIndex'
+
+const KIND_LABELS = {
+  unit: 'Hunt unit',
+  road: 'Road',
+  place: 'Place',
+  water: 'Water',
+}
+
+export default function SearchBox({ map }) {
+  const [index, setIndex] = useState(null)
+  const [query, setQuery] = useState('')
+
+  useEffect(() => {
+    let cancelled = false
+    loadSearchIndex().then((loaded) => {
+      if (!cancelled) setIndex(loaded)
+    })
+    return () => {
+      cancelled = true
+    }
+  }, [])
+
+  if (!index) return null
+  const results = search(index, query, 8)
+
+  const handleSelect = ({ bbox }) => {
+    if (map) {
+      map.fitBounds([[bbox[0], bbox[1]], [bbox[2], bbox[3]]], { padding: 60, maxZoom: 14 })
+    }
+    setQuery('')
+  }
+
+  return (
+    <div className="search-box">
+      <input
+        type="search"
+        placeholder="Search roads, places, water, units"
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        onKeyDown={(e) => {
+          if (e.key === 'Enter' && results.length) handleSelect(results[0])
+          if (e.key === 'Escape') setQuery('')
+        }}
+      />
+      {results.length > 0 && (
+        <ul className="search-results">
+          {results.map((result, i) => (
+            <li key={i} onClick={() => handleSelect(result)}>
+              <span className="search-name">{result.name}</span>
+              <span className="search-kind">{KIND_LABELS[result.kind]}</span>
+            </li>
+          ))}
+        </ul>
+      )}
+    </div>
+  )
+}
@@ -1,10 +1,77 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
+import { TILE_BASE } from '../config/sources'
+
+const LAND_STATUS_LABELS = {
+  public_usfs: 'USFS',
+  public_blm: 'BLM',
+  public_nps: 'NPS',
+  public_fws: 'FWS',
+  public_bor: 'BOR',
+  restricted_military: 'Military',
+  state_trust: 'State Trust',
+  tribal: 'Tribal',
+  private_or_unknown: 'Private / Unknown',
+}
+
+// Per-unit statistics from the pipeline's compute_unit_stats stage, fetched once for all units
+let unitStats = null
+function loadUnitStats() {
+  if (!unitStats) {
+    unitStats = fetch(`${TILE_BASE}/unit_stats.json`)
+      .then((response) => (response.ok ? response.json() : { units: {} }))
+      .catch(() => ({ units: {} }))
+  }
+  return unitStats
+}
+
+function totals(nested) {
+  const byStatus = {}
+  const bySurface = {}
+  for (const [status, surfaces] of Object.entries(nested)) {
+    for (const [surface, miles] of Object.entries(surfaces)) {
+      byStatus[status] = (byStatus[status] || 0) + miles
+      bySurface[surface] = (bySurface[surface] || 0) + miles
+    }
+  }
+  const sorted = (obj) => Object.entries(obj).sort((a, b) => b[1] - a[1])
+  return { byStatus: sorted(byStatus), bySurface: sorted(bySurface) }
+}
+
+function StatRows({ rows, format }) {
+  return (
+    <table className="stat-table">
+      <tbody>
+        {rows.map(([label, value]) => (
+          <tr key={label}>
+            <td>{label}</td>
+            <td>{format(value)}</td>
+          </tr>
+        ))}
+      </tbody>
+    </table>
+  )
+}
 
 export default function UnitInfoPanel({ unit, onClose }) {
   const gmuName = unit.GMUNAME || 'Unknown'
   const regName = unit.REG_NAME || '—'
   const acres = unit.ACRES ? Number(unit.ACRES).toLocaleString() : '—'
   const agfdLink = unit.AGFDLink || `https://www.azgfd.com/hunting/units/${gmuName}/`
+  const [stats, setStats] = useState(null)
+
+  useEffect(() => {
+    let current = true
+    loadUnitStats().then((data) => {
+      if (current) setStats(data.units[gmuName] || null)
+    })
+    return () => {
+      current = false
+    }
+  }, [gmuName])
+
+  const roads = stats ? totals(stats.road_miles) : null
+  const miles = (value) => `${value.toFixed(1)} mi`
+  const landAcres = (value) => `${value.toLocaleString()} ac (${Math.round((100 * value) / stats.acres)}%)`
 
   return (
     <div className="unit-info-panel">
@@ -18,6 +85,35 @@ export default function UnitInfoPanel({ unit, onClose }) {
         <p>Acreage: {acres}</p>
       </div>
 
+      {roads && roads.byStatus.length > 0 && (
+        <div className="info-section">
+          <h4>Road Miles by Land Status</h4>
+          <StatRows
+            rows={roads.byStatus.map(([status, value]) => [LAND_STATUS_LABELS[status] || status, value])}
+            format={miles}
+          />
+          <h4>Road Miles by Surface</h4>
+          <StatRows rows={roads.bySurface} format={miles} />
+        </div>
+      )}
+
+      {stats && Object.keys(stats.agency_acres).length > 0 && (
+        <div className="info-section">
+          <h4>Land by Agency</h4>
+          <StatRows rows={Object.entries(stats.agency_acres)} format={landAcres} />
+        </div>
+      )}
+
+      {stats && Object.keys(stats.poi_counts).length > 0 && (
+        <div className="info-section">
+          <h4>Hunt POIs</h4>
+          <StatRows
+            rows={Object.entries(stats.poi_counts).map(([category, count]) => [category.replace('_', ' '), count])}
+            format={(count) => count}
+          />
+        </div>
+      )}
+
       <div className="info-section">
         <h4>Access Notes</h4>
         <p>
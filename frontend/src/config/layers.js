@@ -2,6 +2,7 @@ export const LAYER_GROUPS = {
   terrain: ['hillshade', 'contour-lines'],
   roads: ['roads-line', 'roads-labels'],
   landOwnership: ['land-ownership-fill', 'land-ownership-outline'],
+  landlocked: ['landlocked-fill', 'landlocked-outline'],
   huntUnits: ['hunt-units-fill', 'hunt-units-outline', 'hunt-units-labels'],
   places: ['places-circle', 'places-labels'],
   water: ['water-line', 'water-labels'],
@@ -11,6 +12,7 @@ export const DEFAULT_VISIBILITY = {
   terrain: true,
   roads: true,
   landOwnership: true,
+  landlocked: true,
   huntUnits: true,
   places: true,
   water: true,
@@ -20,6 +22,7 @@ export const DEFAULT_OPACITY = {
   terrain: 30,
   roads: 80,
   landOwnership: 25,
+  landlocked: 50,
   huntUnits: 5,
   places: 100,
   water: 100,
@@ -76,6 +79,39 @@ export const OVERLAY_LAYERS = [
       'line-opacity': 0.5,
     },
   },
+  {
+    id: 'landlocked-fill',
+    type: 'fill',
+    source: 'landlocked',
+    'source-layer': 'landlocked',
+    group: 'landlocked',
+    minzoom: 8,
+    paint: {
+      'fill-color': [
+        'match', ['get', 'access'],
+        'corner_locked', '#ff6f00',
+        '#b71c1c'
+      ],
+      'fill-opacity': 0.5,
+      'fill-antialias': false,
+    },
+  },
+  {
+    id: 'landlocked-outline',
+    type: 'line',
+    source: 'landlocked',
+    'source-layer': 'landlocked',
+    group: 'landlocked',
+    minzoom: 8,
+    paint: {
+      'line-color': [
+        'match', ['get', 'access'],
+        'corner_locked', '#ff6f00',
+        '#b71c1c'
+      ],
+      'line-width': 1.5,
+    },
+  },
   {
     id: 'hunt-units-fill',
     type: 'fill',
@@ -242,4 +278,4 @@ export const OVERLAY_LAYERS = [
   },
 ]
 
-export const INTERACTIVE_LAYERS = ['hunt-units-fill', 'roads-line', 'places-circle']
+export const INTERACTIVE_LAYERS = ['hunt-units-fill', 'landlocked-fill', 'roads-line', 'places-circle']
@@ -1,4 +1,4 @@
-const TILE_BASE = '/data'
+export const TILE_BASE = '/data'
 
 export const SOURCES = {
   basemap: {
@@ -26,4 +26,8 @@ export const SOURCES = {
     type: 'vector',
     url: `pmtiles://${TILE_BASE}/land-ownership.pmtiles`,
   },
+  landlocked: {
+    type: 'vector',
+    url: `pmtiles://${TILE_BASE}/landlocked.pmtiles`,
+  },
 }
@@ -2,6 +2,8 @@ import { useEffect, useState } from 'react'
 import maplibregl from 'maplibre-gl'
 import { INTERACTIVE_LAYERS } from '../config/layers'
 
+const FEET_PER_METER = 3.28084
+
 export function useMapInteractions(map, isLoaded) {
   const [selectedUnit, setSelectedUnit] = useState(null)
 
@@ -15,6 +17,9 @@ export function useMapInteractions(map, isLoaded) {
 
     const handleRoadClick = (e) => {
       const props = e.features[0].properties
+      // Elevation stats are only present when the pipeline had a DEM
+      const hasElevation = props.elevation_min_m != null && props.elevation_max_m != null
+      const feet = (meters) => Math.round(meters * FEET_PER_METER).toLocaleString()
       new maplibregl.Popup()
         .setLngLat(e.lngLat)
         .setHTML(`
@@ -23,6 +28,20 @@ export function useMapInteractions(map, isLoaded) {
           Surface: ${props.surface || 'unknown'}<br/>
           Land: ${props.land_status || 'unknown'}<br/>
           Unit: ${props.GMUNAME || 'N/A'}
+          ${hasElevation ? `<br/>Elevation: ${feet(props.elevation_min_m)}–${feet(props.elevation_max_m)} ft` : ''}
+          ${props.max_grade_pct != null ? `<br/>Max grade: ${props.max_grade_pct}%` : ''}
+        `)
+        .addTo(map)
+    }
+
+    const handleLandlockedClick = (e) => {
+      const props = e.features[0].properties
+      new maplibregl.Popup()
+        .setLngLat(e.lngLat)
+        .setHTML(`
+          <strong>${props.access === 'corner_locked' ? 'Corner-locked' : 'Landlocked'} public land</strong><br/>
+          ${Math.round(props.acres).toLocaleString()} acres in unit ${props.GMUNAME}<br/>
+          ${Math.round(props.component_acres).toLocaleString()} acres in all
         `)
         .addTo(map)
     }
@@ -37,6 +56,7 @@ export function useMapInteractions(map, isLoaded) {
 
     map.on('click', 'hunt-units-fill', handleHuntUnitClick)
     map.on('click', 'roads-line', handleRoadClick)
+    map.on('click', 'landlocked-fill', handleLandlockedClick)
 
     INTERACTIVE_LAYERS.forEach(layerId => {
       map.on('mouseenter', layerId, handleMouseEnter)
@@ -46,6 +66,7 @@ export function useMapInteractions(map, isLoaded) {
     return () => {
       map.off('click', 'hunt-units-fill', handleHuntUnitClick)
       map.off('click', 'roads-line', handleRoadClick)
+      map.off('click', 'landlocked-fill', handleLandlockedClick)
       INTERACTIVE_LAYERS.forEach(layerId => {
         map.off('mouseenter', layerId, handleMouseEnter)
         map.off('mouseleave', layerId, handleMouseLeave)
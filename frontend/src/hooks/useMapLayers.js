@@ -161,6 +161,12 @@ export function useMapLayers(map, isLoaded, visibility, opacity) {
     if (map.getLayer('land-ownership-outline')) {
       map.setPaintProperty('land-ownership-outline', 'line-opacity', opacityValue('landOwnership'))
     }
+    if (map.getLayer('landlocked-fill')) {
+      map.setPaintProperty('landlocked-fill', 'fill-opacity', opacityValue('landlocked'))
+    }
+    if (map.getLayer('landlocked-outline')) {
+      map.setPaintProperty('landlocked-outline', 'line-opacity', opacityValue('landlocked'))
+    }
     if (map.getLayer('hunt-units-fill')) {
       map.setPaintProperty('hunt-units-fill', 'fill-opacity', opacityValue('huntUnits') * 0.2)
     }
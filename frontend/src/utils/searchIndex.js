@@ -0,0 +1,93 @@
+import { TILE_BASE } from '../config/sources'
+
+// Reader for search.bin from the pipeline's build_search_index stage; the layout and the key
+// normalization mirror pipeline/search_index.py
+const MAGIC = 'AZSI'
+const VERSION = 1
+const HEADER_BYTES = 24
+export const KINDS = ['unit', 'road', 'place', 'water']
+
+// Case, accents and runs of whitespace do not matter: "Cañon  Tank" -> "canon tank"
+export function searchKey(name) {
+  return name.normalize('NFKD').replace(/\p{M}/gu, '').toLowerCase().split(/\s+/).filter(Boolean).join(' ')
+}
+
+export function readSearchIndex(buffer) {
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4))
+  const [, version, strings, entries, words, namesBytes] = new Uint32Array(buffer, 0, HEADER_BYTES / 4)
+  if (magic !== MAGIC || version !== VERSION) {
+    throw new Error(`Not a version ${VERSION} search index`)
+  }
+
+  let position = HEADER_BYTES
+  const take = (Type, count) => {
+    const array = new Type(buffer, position, count)
+    position += array.byteLength
+    return array
+  }
+  const nameOffsets = take(Uint32Array, strings + 1)
+  const entryStarts = take(Uint32Array, strings + 1)
+  const wordStrings = take(Uint32Array, words)
+  const boxes = take(Float32Array, entries * 4)
+  const centers = take(Float32Array, entries * 2)
+  const wordOffsets = take(Uint16Array, words)
+  const kinds = take(Uint8Array, entries)
+  const blob = new Uint8Array(buffer, position, namesBytes)
+
+  const decoder = new TextDecoder()
+  const names = new Array(strings)
+  for (let i = 0; i < strings; i++) {
+    names[i] = decoder.decode(blob.subarray(nameOffsets[i], nameOffsets[i + 1]))
+  }
+  const keys = names.map(searchKey)
+  return { names, keys, entryStarts, wordStrings, wordOffsets, kinds, boxes, centers }
+}
+
+// Fetched once for the whole session; null when the pipeline has not built it
+let searchIndex = null
+export function loadSearchIndex() {
+  if (!searchIndex) {
+    searchIndex = fetch(`${TILE_BASE}/search.bin`)
+      .then((response) => (response.ok ? response.arrayBuffer() : null))
+      .then((buffer) => (buffer ? readSearchIndex(buffer) : null))
+      .catch(() => null)
+  }
+  return searchIndex
+}
+
+// Names with a word starting with the query; names that start with it come first
+export function search(index, query, limit = 10) {
+  const q = searchKey(query)
+  if (!q) return []
+  const { keys, wordStrings, wordOffsets, entryStarts, kinds, boxes, centers } = index
+
+  let lo = 0
+  let hi = wordStrings.length
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1
+    if (keys[wordStrings[mid]].slice(wordOffsets[mid]) < q) lo = mid + 1
+    else hi = mid
+  }
+
+  const leading = []
+  const inner = []
+  for (let i = lo; i < wordStrings.length && leading.length < limit; i++) {
+    const string = wordStrings[i]
+    if (!keys[string].startsWith(q, wordOffsets[i])) break
+    ;(wordOffsets[i] ? inner : leading).push(string)
+  }
+
+  const matches = []
+  for (const string of new Set([...leading, ...inner])) {
+    for (let e = entryStarts[string]; e < entryStarts[string + 1]; e++) {
+      if (matches.length === limit) return matches
+      matches.push({
+        name: index.names[string],
+        kind: KINDS[kinds[e]],
+        bbox: Array.from(boxes.subarray(e * 4, e * 4 + 4)),
+        center: Array.from(centers.subarray(e * 2, e * 2 + 2)),
+      })
+    }
+  }
+  return matches
+}
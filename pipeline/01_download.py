@@ -1,15 +1,25 @@
+import argparse
+import asyncio
+import shutil
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-import duckdb
 import httpx
 import json
 import zipfile
 import geopandas as gpd
+import pyarrow as pa
+import shapely
+from pipeline import instrument
+from pipeline.arcgis import LayerQuery, download_layers, esri_to_shapely, merge_checkpoint
+from pipeline.geoparquet import wkb_geo_metadata
+from pipeline.manifest import is_fresh, record
+from pipeline.overture import THEMES as OVERTURE_THEMES, ThemeQuery, connect, extract_themes
 from pipeline.utils import (
     AZ_BBOX,
+    OVERTURE_RELEASE,
     OVERTURE_S3_BASE,
     RAW_DIR,
     AZGFD_GMU_URL,
@@ -20,107 +30,58 @@ from pipeline.utils import (
 
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 
+PIPELINE_DIR = Path(__file__).parent
+BLM_SMA_CHECKPOINT_DIR = RAW_DIR / "blm_sma_tiles"
+BLM_SMA_OUT_FIELDS = "OBJECTID,SMA_ID,ADMIN_DEPT_CODE,ADMIN_AGENCY_CODE,ADMIN_UNIT_NAME"
+BLM_SMA_AGENCY_CODES = {"USFS": "FS", "STATE": "STP"}
+BLM_SMA_SCHEMA = pa.schema(
+    [
+        ("OBJECTID", pa.int64()),
+        ("SMA_ID", pa.string()),
+        ("ADMIN_DEPT_CODE", pa.string()),
+        ("ADMIN_AGENCY_CODE", pa.string()),
+        ("ADMIN_UNIT_NAME", pa.string()),
+        ("geometry", pa.binary()),
+    ],
+    metadata={b"geo": json.dumps(wkb_geo_metadata()).encode()},
+)
 
-def file_exists(path: Path, min_size_mb: float = 0.001) -> bool:
-    if not path.exists():
-        return False
-    if path.stat().st_size < min_size_mb * 1_000_000:
-        return False
-    return True
-
-
-def download_overture_transportation():
-    output_path = RAW_DIR / "overture_transportation_az.parquet"
-    if file_exists(output_path, min_size_mb=1):
-        print("  Transportation already downloaded, skipping.")
-        return
-
-    print("Downloading Overture transportation segments...")
-    con = duckdb.connect()
-    con.execute("INSTALL spatial; LOAD spatial;")
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    con.execute("SET s3_region = 'us-west-2';")
-
-    con.execute(f"""
-        COPY (
-            SELECT id, geometry, subtype, class, subclass, names,
-                   road_surface, road_flags, access_restrictions
-            FROM read_parquet(
-                '{OVERTURE_S3_BASE}/theme=transportation/type=segment/*',
-                hive_partitioning=true
-            )
-            WHERE bbox.xmin >= {AZ_BBOX['xmin']}
-              AND bbox.xmax <= {AZ_BBOX['xmax']}
-              AND bbox.ymin >= {AZ_BBOX['ymin']}
-              AND bbox.ymax <= {AZ_BBOX['ymax']}
-        ) TO '{output_path}'
-        (FORMAT PARQUET);
-    """)
-    print("  Transportation segments saved.")
-
-
-def download_overture_places():
-    output_path = RAW_DIR / "overture_places_az.parquet"
-    if file_exists(output_path, min_size_mb=1):
-        print("  Places already downloaded, skipping.")
-        return
 
-    print("Downloading Overture places...")
-    con = duckdb.connect()
-    con.execute("INSTALL spatial; LOAD spatial;")
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    con.execute("SET s3_region = 'us-west-2';")
-
-    con.execute(f"""
-        COPY (
-            SELECT id, geometry, names, categories, confidence
-            FROM read_parquet(
-                '{OVERTURE_S3_BASE}/theme=places/type=place/*',
-                hive_partitioning=true
-            )
-            WHERE bbox.xmin >= {AZ_BBOX['xmin']}
-              AND bbox.xmax <= {AZ_BBOX['xmax']}
-              AND bbox.ymin >= {AZ_BBOX['ymin']}
-              AND bbox.ymax <= {AZ_BBOX['ymax']}
-        ) TO '{output_path}'
-        (FORMAT PARQUET);
-    """)
-    print("  Places saved.")
-
-
-def download_overture_water():
-    output_path = RAW_DIR / "overture_water_az.parquet"
-    if file_exists(output_path, min_size_mb=1):
-        print("  Water already downloaded, skipping.")
+def overture_stage(theme: ThemeQuery, source: str) -> dict:
+    return {
+        "params": {"OVERTURE_RELEASE": OVERTURE_RELEASE, "source": source, "AZ_BBOX": AZ_BBOX, "theme": theme._asdict()},
+        "code": [download_overture, PIPELINE_DIR / "overture.py"],
+    }
+
+
+@instrument.stage
+def download_overture(source: str = OVERTURE_S3_BASE):
+    pending = []
+    for theme in OVERTURE_THEMES:
+        output_path = RAW_DIR / f"overture_{theme.name}_az.parquet"
+        stage = overture_stage(theme, source)
+        if is_fresh(output_path, **stage):
+            print(f"  Overture {theme.name} already downloaded, skipping.")
+            continue
+        pending.append((theme, output_path, stage))
+    if not pending:
         return
 
-    print("Downloading Overture water features...")
-    con = duckdb.connect()
-    con.execute("INSTALL spatial; LOAD spatial;")
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    con.execute("SET s3_region = 'us-west-2';")
-
-    con.execute(f"""
-        COPY (
-            SELECT id, geometry, names, subtype, class, is_intermittent
-            FROM read_parquet(
-                '{OVERTURE_S3_BASE}/theme=base/type=water/*',
-                hive_partitioning=true
-            )
-            WHERE bbox.xmin >= {AZ_BBOX['xmin']}
-              AND bbox.xmax <= {AZ_BBOX['xmax']}
-              AND bbox.ymin >= {AZ_BBOX['ymin']}
-              AND bbox.ymax <= {AZ_BBOX['ymax']}
-              AND names IS NOT NULL
-        ) TO '{output_path}'
-        (FORMAT PARQUET);
-    """)
-    print("  Water features saved.")
+    print(f"Downloading Overture {', '.join(t.name for t, _, _ in pending)} from {source}...")
+    stages = {theme.name: stage for theme, _, stage in pending}
+    con = connect(source)
+    for theme, output_path, rows in extract_themes(con, [(t, p) for t, p, _ in pending], source, AZ_BBOX):
+        record(output_path, **stages[theme.name])
+        instrument.rows(rows_out=rows)
+        print(f"  Overture {theme.name} saved ({rows} features).")
+    con.close()
 
 
+@instrument.stage
 def download_azgfd_gmus():
     output_path = RAW_DIR / "azgfd_gmu.geojson"
-    if file_exists(output_path, min_size_mb=1):
+    stage = {"params": {"AZGFD_GMU_URL": AZGFD_GMU_URL}, "code": [download_azgfd_gmus]}
+    if is_fresh(output_path, **stage):
         print("  GMU boundaries already downloaded, skipping.")
         return
 
@@ -130,122 +91,63 @@ def download_azgfd_gmus():
         response.raise_for_status()
         with open(output_path, "w") as f:
             f.write(response.text)
+    record(output_path, **stage)
     print("  GMU boundaries saved.")
 
 
-def download_blm_sma():
-    output_path = RAW_DIR / "blm_sma_az.geojson"
-    if file_exists(output_path, min_size_mb=0.1):
+def sma_features_to_table(agency_name: str, features: list) -> pa.Table:
+    agency_code = BLM_SMA_AGENCY_CODES.get(agency_name, agency_name)
+    attrs = [f.get("attributes") or {} for f in features]
+    geometries = esri_to_shapely([f.get("geometry") for f in features])
+    columns = {
+        "OBJECTID": [a.get("OBJECTID") for a in attrs],
+        "SMA_ID": [None if a.get("SMA_ID") is None else str(a["SMA_ID"]) for a in attrs],
+        "ADMIN_DEPT_CODE": [a.get("ADMIN_DEPT_CODE") for a in attrs],
+        "ADMIN_AGENCY_CODE": [agency_code] * len(attrs),
+        "ADMIN_UNIT_NAME": [a.get("ADMIN_UNIT_NAME") for a in attrs],
+        "geometry": shapely.to_wkb(geometries),
+    }
+    return pa.table(columns, schema=BLM_SMA_SCHEMA)
+
+
+@instrument.stage
+def download_blm_sma(base_url: str = BLM_SMA_BASE_URL):
+    output_path = RAW_DIR / "blm_sma_az.parquet"
+    stage = {
+        "params": {"BLM_SMA_BASE_URL": base_url, "BLM_SMA_FEATURES_LAYERS": BLM_SMA_FEATURES_LAYERS, "AZ_BBOX": AZ_BBOX},
+        "code": [download_blm_sma, sma_features_to_table, PIPELINE_DIR / "arcgis.py"],
+    }
+    if is_fresh(output_path, **stage):
         print("  BLM SMA already downloaded, skipping.")
         return
 
     print("Downloading BLM Surface Management Agency data (FEATURES layers)...")
-    all_features = []
-    page_size = 500
-    
-    xmin, ymin, xmax, ymax = AZ_BBOX['xmin'], AZ_BBOX['ymin'], AZ_BBOX['xmax'], AZ_BBOX['ymax']
-    
-    tiled_bboxes_2x2 = [
-        f"{xmin},{ymin},{(xmin+xmax)/2},{(ymin+ymax)/2}",
-        f"{(xmin+xmax)/2},{ymin},{xmax},{(ymin+ymax)/2}",
-        f"{xmin},{(ymin+ymax)/2},{(xmin+xmax)/2},{ymax}",
-        f"{(xmin+xmax)/2},{(ymin+ymax)/2},{xmax},{ymax}",
+
+    def report_tile(layer_name, tile, count):
+        print(f"    {layer_name} tile q{tile.key}: {count} features")
+
+    layers = [
+        LayerQuery(agency_name, f"{base_url}/{layer_id}/query", BLM_SMA_OUT_FIELDS)
+        for agency_name, layer_id in BLM_SMA_FEATURES_LAYERS.items()
     ]
-    
-    full_bbox = f"{xmin},{ymin},{xmax},{ymax}"
-
-    def convert_arcgis_to_geojson(arcgis_geom):
-        if not arcgis_geom:
-            return None
-        if 'rings' in arcgis_geom:
-            rings = arcgis_geom['rings']
-            if len(rings) == 1:
-                return {'type': 'Polygon', 'coordinates': rings}
-            else:
-                return {'type': 'MultiPolygon', 'coordinates': [[ring] for ring in rings]}
-        if 'x' in arcgis_geom and 'y' in arcgis_geom:
-            return {'type': 'Point', 'coordinates': [arcgis_geom['x'], arcgis_geom['y']]}
-        if 'paths' in arcgis_geom:
-            paths = arcgis_geom['paths']
-            if len(paths) == 1:
-                return {'type': 'LineString', 'coordinates': paths[0]}
-            else:
-                return {'type': 'MultiLineString', 'coordinates': paths}
-        return arcgis_geom
+    with instrument.step("download tiles"):
+        asyncio.run(download_layers(layers, AZ_BBOX, BLM_SMA_CHECKPOINT_DIR, sma_features_to_table, progress=report_tile))
 
-    with httpx.Client(timeout=120) as client:
-        for agency_name, layer_id in BLM_SMA_FEATURES_LAYERS.items():
-            print(f"  Querying {agency_name} layer ({layer_id})...")
-            agency_count = 0
-            
-            use_tiled = agency_name in ["BLM", "STATE"]
-            bboxes = tiled_bboxes_2x2 if use_tiled else [full_bbox]
-            
-            for bbox in bboxes:
-                offset = 0
-                while True:
-                    url = f"{BLM_SMA_BASE_URL}/{layer_id}/query"
-                    params = {
-                        "geometry": bbox,
-                        "geometryType": "esriGeometryEnvelope",
-                        "inSR": "4326",
-                        "spatialRel": "esriSpatialRelIntersects",
-                        "outFields": "SMA_ID,ADMIN_DEPT_CODE,ADMIN_AGENCY_CODE,ADMIN_UNIT_NAME",
-                        "f": "json",
-                        "resultOffset": offset,
-                        "resultRecordCount": page_size,
-                        "outSR": "4326",
-                    }
-                    try:
-                        response = client.get(url, params=params)
-                        response.raise_for_status()
-                        data = response.json()
-                    except Exception as e:
-                        print(f"    Error on bbox: {e}")
-                        break
-
-                    if data.get("error"):
-                        if use_tiled:
-                            print(f"    Tile error: {data['error'].get('message', 'unknown')}")
-                        break
-
-                    features = data.get("features", [])
-                    if not features:
-                        break
-
-                    for f in features:
-                        attrs = f.get("attributes", {})
-                        agency_code = agency_name
-                        if agency_name == "USFS":
-                            agency_code = "FS"
-                        elif agency_name == "STATE":
-                            agency_code = "STP"
-                        attrs["ADMIN_AGENCY_CODE"] = agency_code
-                        
-                        geojson_geom = convert_arcgis_to_geojson(f.get("geometry"))
-                        
-                        all_features.append({
-                            "type": "Feature",
-                            "geometry": geojson_geom,
-                            "properties": attrs,
-                        })
-                        agency_count += 1
-
-                    if len(features) < page_size:
-                        break
-                    offset += page_size
-            
-            print(f"    {agency_name}: {agency_count} features")
-
-    geojson = {"type": "FeatureCollection", "features": all_features}
-    with open(output_path, "w") as f:
-        json.dump(geojson, f)
-    print(f"  BLM SMA saved ({len(all_features)} total features).")
+    with instrument.step("merge checkpoint"):
+        counts = merge_checkpoint(BLM_SMA_CHECKPOINT_DIR, layers, output_path, BLM_SMA_SCHEMA)
+    instrument.rows(rows_out=sum(counts.values()))
+    for agency_name, count in counts.items():
+        print(f"    {agency_name}: {count} features")
+    record(output_path, **stage)
+    shutil.rmtree(BLM_SMA_CHECKPOINT_DIR, ignore_errors=True)
+    print(f"  BLM SMA saved ({sum(counts.values())} total features).")
 
 
+@instrument.stage
 def download_az_boundary():
     output_path = RAW_DIR / "az_boundary.geojson"
-    if file_exists(output_path, min_size_mb=0.001):
+    stage = {"params": {"AZ_BOUNDARY_URL": AZ_BOUNDARY_URL}, "code": [download_az_boundary]}
+    if is_fresh(output_path, **stage):
         print("  Arizona boundary already downloaded, skipping.")
         return
 
@@ -271,28 +173,41 @@ def download_az_boundary():
     az_gdf = states_gdf[states_gdf["STUSPS"] == "AZ"]
     az_gdf = az_gdf.to_crs("EPSG:4326")
     az_gdf.to_file(output_path, driver="GeoJSON")
+    instrument.rows(rows_in=len(states_gdf), rows_out=len(az_gdf))
 
     zip_path.unlink()
     for f in extract_dir.glob("*"):
         f.unlink()
     extract_dir.rmdir()
+    record(output_path, **stage)
     print("  Arizona boundary saved.")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Download all data sources")
+    parser.add_argument(
+        "--overture-source",
+        default=OVERTURE_S3_BASE,
+        help="Overture release prefix: the S3 bucket path or a local mirror with theme=*/type=* Parquet",
+    )
+    parser.add_argument("--blm-sma-url", default=BLM_SMA_BASE_URL, help="ArcGIS MapServer base URL for BLM SMA layers")
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of each stage in the run report")
+    args = parser.parse_args()
+    if args.profile:
+        instrument.enable_profiling()
+
     print("=" * 60)
     print("AZ Hunt Planner - Data Download Pipeline")
     print("=" * 60)
 
     download_az_boundary()
     download_azgfd_gmus()
-    download_blm_sma()
-    download_overture_transportation()
-    download_overture_places()
-    download_overture_water()
+    download_blm_sma(args.blm_sma_url)
+    download_overture(args.overture_source)
 
     print("=" * 60)
     print("Download complete!")
+    print(f"Run report: {instrument.write_report()}")
     print("=" * 60)
 
 
@@ -1,15 +1,34 @@
-import shutil
+import argparse
+import json
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import geopandas as gpd
+from pipeline import instrument
+from pipeline.clip_engine import clip_batch, clip_parquet, clip_parquet_partitioned
+from pipeline.manifest import is_fresh, record
+from pipeline.partitions import (
+    PARTITION_ZOOM,
+    QUADKEY,
+    SUCCESS_MARKER,
+    area,
+    partition_files,
+    partition_path,
+    prune_partitions,
+    remove_partitions,
+    row_quadkeys,
+)
 from pipeline.utils import RAW_DIR, PROCESSED_DIR
 
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
-LARGE_LAYER_THRESHOLD = 100_000_000
+CLIP_LAYERS = [
+    ("overture_transportation_az", "overture_transportation_clipped"),
+    ("overture_places_az", "overture_places_clipped"),
+    ("overture_water_az", "overture_water_clipped"),
+]
 
 
 def load_az_boundary():
@@ -18,7 +37,15 @@ def load_az_boundary():
     return az_gdf
 
 
-def clip_layer(input_name: str, output_name: str, az_boundary: gpd.GeoDataFrame):
+def clip_stage(input_name: str) -> dict:
+    return {
+        "inputs": [RAW_DIR / f"{input_name}.parquet", RAW_DIR / "az_boundary.geojson"],
+        "code": [clip_layer, clip_parquet, clip_batch],
+    }
+
+
+@instrument.stage
+def clip_layer(input_name: str, output_name: str, az_boundary: gpd.GeoDataFrame | None = None):
     input_path = RAW_DIR / f"{input_name}.parquet"
     output_path = PROCESSED_DIR / f"{output_name}.parquet"
 
@@ -26,31 +53,93 @@ def clip_layer(input_name: str, output_name: str, az_boundary: gpd.GeoDataFrame)
         print(f"  Skipping {input_name} (not found)")
         return
 
-    if output_path.exists():
-        print(f"  {output_name} already exists, skipping.")
+    stage = clip_stage(input_name)
+    if is_fresh(output_path, **stage):
+        print(f"  {output_name} is up to date, skipping.")
         return
 
     file_size = input_path.stat().st_size
-    if file_size > LARGE_LAYER_THRESHOLD:
-        print(f"  Copying {input_name} ({file_size / 1_000_000:.1f} MB - too large for clip)...")
-        shutil.copy(input_path, output_path)
-        print(f"    Copied without clipping")
-        return
-
     print(f"  Clipping {input_name} ({file_size / 1_000_000:.1f} MB)...")
-    gdf = gpd.read_parquet(input_path)
-    gdf = gdf.set_crs("EPSG:4326", allow_override=True)
+    if az_boundary is None:
+        az_boundary = load_az_boundary()
+    boundary = az_boundary.geometry.union_all()
+    rows_in, rows_out = clip_parquet(input_path, output_path, boundary)
+    instrument.rows(rows_in, rows_out)
+
+    if rows_out > 0:
+        remove_partitions(output_name)
+        record(output_path, **stage)
+        print(f"    {rows_in} -> {rows_out} features")
+    else:
+        print(f"    No features after clipping")
+
+
+@instrument.stage
+def clip_layer_partitioned(
+    input_name: str,
+    output_name: str,
+    az_boundary: gpd.GeoDataFrame | None = None,
+    region: str | None = None,
+    unit: str | None = None,
+):
+    input_path = RAW_DIR / f"{input_name}.parquet"
+    marker = PROCESSED_DIR / output_name / SUCCESS_MARKER
 
-    clipped = gpd.clip(gdf, az_boundary)
+    if not input_path.exists():
+        print(f"  Skipping {input_name} (not found)")
+        return
+
+    stage = {
+        "inputs": [input_path, RAW_DIR / "az_boundary.geojson"],
+        "params": {"zoom": PARTITION_ZOOM},
+        "code": [clip_layer_partitioned, clip_parquet_partitioned, clip_batch, row_quadkeys],
+    }
+    if is_fresh(marker, **stage):
+        print(f"  {output_name} partitions are up to date, skipping.")
+        return
 
-    if len(clipped) > 0:
-        clipped.to_parquet(output_path)
-        print(f"    {len(gdf)} -> {len(clipped)} features")
+    selected = area(region, unit)
+    scope = "all partitions" if selected is None else f"{len(selected.quadkeys)} partition(s)"
+    print(f"  Clipping {input_name} into {scope}...")
+    if az_boundary is None:
+        az_boundary = load_az_boundary()
+    boundary = az_boundary.geometry.union_all()
+    rows_in, written = clip_parquet_partitioned(
+        input_path, output_name, boundary, None if selected is None else selected.quadkeys
+    )
+    rows_out = sum(rows for _, rows in written.values())
+    instrument.rows(rows_in, rows_out)
+    (PROCESSED_DIR / f"{output_name}.parquet").unlink(missing_ok=True)
+
+    # Partitions in scope that no longer receive any rows
+    if selected is None:
+        kept = {path for path, _ in written.values()}
+        stale = [path for path in partition_files(output_name) if path not in kept]
     else:
-        print(f"    No features after clipping")
+        stale = [partition_path(output_name, QUADKEY, key, key) for key in selected.quadkeys - written.keys()]
+    for path in stale:
+        path.unlink(missing_ok=True)
+    prune_partitions(output_name)
+
+    # Only a full run vouches for the whole layer; a scoped run leaves the marker stale
+    if selected is None and written:
+        marker.write_text(json.dumps({key: rows for key, (_, rows) in sorted(written.items())}, indent=2) + "\n")
+        record(marker, **stage)
+    print(f"    {rows_in} -> {rows_out} features in {len(written)} partition(s)")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Clip Overture layers to the Arizona boundary")
+    parser.add_argument("--partitioned", action="store_true", help="Write quadkey-partitioned layers")
+    parser.add_argument("--region", help="With --partitioned, only rewrite partitions reaching this AZGFD region")
+    parser.add_argument("--unit", help="With --partitioned, only rewrite partitions reaching this hunt unit")
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of each stage in the run report")
+    args = parser.parse_args()
+    if (args.region or args.unit) and not args.partitioned:
+        parser.error("--region and --unit need --partitioned")
+    if args.profile:
+        instrument.enable_profiling()
+
     print("=" * 60)
     print("AZ Hunt Planner - Clip to Arizona Boundary")
     print("=" * 60)
@@ -59,17 +148,15 @@ def main():
     az_boundary = load_az_boundary()
     print(f"  Arizona boundary loaded ({len(az_boundary)} feature)")
 
-    layers = [
-        ("overture_transportation_az", "overture_transportation_clipped"),
-        ("overture_places_az", "overture_places_clipped"),
-        ("overture_water_az", "overture_water_clipped"),
-    ]
-
-    for input_name, output_name in layers:
-        clip_layer(input_name, output_name, az_boundary)
+    for input_name, output_name in CLIP_LAYERS:
+        if args.partitioned:
+            clip_layer_partitioned(input_name, output_name, az_boundary, args.region, args.unit)
+        else:
+            clip_layer(input_name, output_name, az_boundary)
 
     print("=" * 60)
     print("Clip complete!")
+    print(f"Run report: {instrument.write_report()}")
     print("=" * 60)
 
 
@@ -1,13 +1,68 @@
+import argparse
+import json
+import os
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import geopandas as gpd
-import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+from pipeline import enrich_sql, instrument
+from pipeline.access import (
+    ACCESSIBLE,
+    CORNER_LOCKED,
+    LANDLOCKED,
+    OPEN_LAND_STATUSES,
+    access_status,
+    open_components,
+    reached_components,
+    unit_pieces,
+)
+from pipeline.columns import (
+    first_surface,
+    hunt_relevant_categories,
+    hunt_relevant_class,
+    land_status,
+    primary_name,
+    read_columns,
+    to_numpy,
+)
+from pipeline.dissolve import dissolve, polygon_parts, simplify_coverage, union_groups, zoom_bands
+from pipeline.geoparquet import (
+    geodataframe_table,
+    geometry_column,
+    geoparquet_schema,
+    sort_geoparquet,
+    write_geoparquet,
+)
+from pipeline.lookup import write_layer
+from pipeline.manifest import is_fresh, record
+from pipeline.partitions import PARTITION_KEYS, QUADKEY, area, partition_files, remove_partitions, run_partitions
+from pipeline.road_graph import road_edges, write_graph
+from pipeline.search_index import merge_features, named_features, write_index
+from pipeline.spatial_join import (
+    PolygonIndex,
+    build_polygon_index,
+    left_join_within,
+    split_by_polygons,
+    take_attributes,
+)
+from pipeline.terrain import DEM_ZOOM, open_dem, road_elevation
+from pipeline.unit_stats import (
+    UNIT, acres, agency_acres, exclusive_polygons, poi_counts, road_miles, sum_by, unique_roads, unit_stats,
+)
 from pipeline.utils import (
     RAW_DIR,
     PROCESSED_DIR,
+    TERRAIN_PATH,
     AGENCY_ACCESS_MAP,
     HUNT_RELEVANT_ROAD_CLASSES,
     HUNT_POI_CATEGORIES,
@@ -15,50 +70,108 @@ from pipeline.utils import (
 
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+PIPELINE_DIR = Path(__file__).parent
+FRONTEND_DATA = PIPELINE_DIR.parent / "frontend" / "public" / "data"
+ROAD_BATCH_SIZE = 100_000
+# Enrichment engines; both write the same roads_enriched, places_hunt and water_named
+GEOPANDAS = "geopandas"
+DUCKDB = "duckdb"
+BACKENDS = [GEOPANDAS, DUCKDB]
+SMA_COLUMNS = ["ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME", "geometry"]
+# Zoom bands of the land-ownership tiles (8-14); each band carries its own simplified geometry
+LAND_OWNERSHIP_BANDS = [(8, 9), (10, 11), (12, 13), (14, 14)]
+# Search index kind: (processed layer, name column); hunt units come from hunt_units.geojson
+SEARCH_SOURCES = {"road": ("roads_enriched", "road_name"), "place": ("places_hunt", "name"), "water": ("water_named", "name")}
+
+
+def road_stage(exact: bool = False) -> dict:
+    return {
+        "inputs": [
+            PROCESSED_DIR / "overture_transportation_clipped.parquet",
+            RAW_DIR / "blm_sma_az.parquet",
+            RAW_DIR / "azgfd_gmu.geojson",
+            *terrain_inputs(),
+        ],
+        "params": {
+            "AGENCY_ACCESS_MAP": AGENCY_ACCESS_MAP,
+            "HUNT_RELEVANT_ROAD_CLASSES": HUNT_RELEVANT_ROAD_CLASSES,
+            "exact": exact,
+            "DEM_ZOOM": DEM_ZOOM,
+        },
+        "code": [
+            enrich_roads,
+            enrich_roads_streaming,
+            enrich_road_batch,
+            enrich_roads_sql,
+            PIPELINE_DIR / "columns.py",
+            PIPELINE_DIR / "spatial_join.py",
+            PIPELINE_DIR / "geoparquet.py",
+            PIPELINE_DIR / "terrain.py",
+            PIPELINE_DIR / "enrich_sql.py",
+        ],
+    }
+
+
+def terrain_inputs() -> list[Path]:
+    # The DEM is optional; roads enriched without one have no elevation columns
+    return [TERRAIN_PATH] if TERRAIN_PATH.exists() else []
+
 
+def load_dem():
+    return open_dem(TERRAIN_PATH) if TERRAIN_PATH.exists() else None
+
+
+@instrument.stage
 def enrich_roads():
     output_path = PROCESSED_DIR / "roads_enriched.parquet"
-    if output_path.exists() and output_path.stat().st_size > 1_000_000:
+    stage = road_stage()
+    if is_fresh(output_path, **stage):
         print("Roads already enriched, skipping.")
         return
 
     print("Enriching roads with land ownership and hunt unit data...")
 
     print("  Loading roads...")
-    roads = gpd.read_parquet(PROCESSED_DIR / "overture_transportation_clipped.parquet")
-    roads = roads.to_crs("EPSG:4326")
+    roads_path = PROCESSED_DIR / "overture_transportation_clipped.parquet"
+    with instrument.step("load roads"):
+        roads = gpd.read_parquet(roads_path)
+        roads = roads.to_crs("EPSG:4326")
+        road_attrs = read_columns(roads_path, ["class", "names", "road_surface"])
+    instrument.rows(rows_in=len(roads))
 
     print("  Loading BLM SMA...")
-    sma = gpd.read_file(RAW_DIR / "blm_sma_az.geojson")
-    sma = sma.to_crs("EPSG:4326")
+    with instrument.step("load sma"):
+        sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS)
+        sma = sma.to_crs("EPSG:4326")
 
     print("  Loading AZGFD GMUs...")
-    gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson")
-    gmus = gmus.to_crs("EPSG:4326")
+    with instrument.step("load gmus"):
+        gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson")
+        gmus = gmus.to_crs("EPSG:4326")
 
     sma_cols = ["geometry", "ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME"]
     sma_filtered = sma[[c for c in sma_cols if c in sma.columns]]
 
     print("  Creating representative points for roads...")
     roads_orig_geom = roads.geometry.copy()
-    roads["rep_point"] = roads.geometry.representative_point()
+    with instrument.step("representative points"):
+        roads["rep_point"] = roads.geometry.representative_point()
     roads_points = roads.set_geometry("rep_point")
 
     print("  Spatial join: roads x land ownership...")
-    roads_with_owner = gpd.sjoin(
-        roads_points,
-        sma_filtered,
-        how="left",
-        predicate="within",
-    )
-
-    def map_agency_code(row):
-        code = row.get("ADMIN_AGENCY_CODE")
-        if code is None or str(code) == "nan":
-            return "private_or_unknown"
-        return AGENCY_ACCESS_MAP.get(str(code), "private_or_unknown")
+    with instrument.step("sjoin land ownership"):
+        roads_with_owner = gpd.sjoin(
+            roads_points,
+            sma_filtered,
+            how="left",
+            predicate="within",
+        )
 
-    roads_with_owner["land_status"] = roads_with_owner.apply(map_agency_code, axis=1)
+    if "ADMIN_AGENCY_CODE" in roads_with_owner.columns:
+        agency_codes = roads_with_owner["ADMIN_AGENCY_CODE"]
+    else:
+        agency_codes = [None] * len(roads_with_owner)
+    roads_with_owner["land_status"] = to_numpy(land_status(agency_codes))
 
     roads_with_owner = roads_with_owner.drop(columns=["index_right"], errors="ignore")
 
@@ -66,202 +179,937 @@ def enrich_roads():
     gmu_cols = ["geometry", "GMUNAME", "REG_NAME", "ACRES", "AGFDLink"]
     gmus_filtered = gmus[[c for c in gmu_cols if c in gmus.columns]]
 
-    roads_points2 = roads_with_owner.set_geometry(
-        roads_with_owner.geometry.representative_point()
-    )
-    roads_enriched = gpd.sjoin(
-        roads_points2,
-        gmus_filtered,
-        how="left",
-        predicate="within",
-    )
+    with instrument.step("sjoin hunt units"):
+        roads_points2 = roads_with_owner.set_geometry(
+            roads_with_owner.geometry.representative_point()
+        )
+        roads_enriched = gpd.sjoin(
+            roads_points2,
+            gmus_filtered,
+            how="left",
+            predicate="within",
+        )
 
     roads_enriched = roads_enriched.set_geometry("rep_point")
     roads_enriched["geometry"] = roads_orig_geom.loc[roads_enriched.index].values
     roads_enriched = roads_enriched.set_geometry("geometry")
     roads_enriched = roads_enriched.drop(columns=["rep_point"], errors="ignore")
 
-    if "class" in roads_enriched.columns:
-        roads_enriched["hunt_relevant"] = roads_enriched["class"].apply(
-            lambda c: str(c).lower() in HUNT_RELEVANT_ROAD_CLASSES if c else False
-        )
+    # sjoin keeps the positional index of the loaded roads, so per-road arrays line up via take
+    positions = roads_enriched.index.to_numpy()
+    if "class" in road_attrs.column_names:
+        roads_enriched["hunt_relevant"] = to_numpy(hunt_relevant_class(road_attrs["class"]))[positions]
     else:
         roads_enriched["hunt_relevant"] = False
 
-    def extract_road_name(row):
-        names = row.get("names")
-        if names is None:
-            return None
-        if isinstance(names, dict):
-            return names.get("primary")
-        if isinstance(names, str):
-            try:
-                parsed = json.loads(names)
-                return parsed.get("primary")
-            except:
-                return names
-        return None
-
-    roads_enriched["road_name"] = roads_enriched.apply(extract_road_name, axis=1)
-
-    def extract_surface(row):
-        surface = row.get("road_surface")
-        if surface is None:
-            return "unknown"
-        if isinstance(surface, list) and len(surface) > 0:
-            first = surface[0]
-            if isinstance(first, dict):
-                return first.get("value", "unknown")
-        return "unknown"
-
-    roads_enriched["surface"] = roads_enriched.apply(extract_surface, axis=1)
+    if "names" in road_attrs.column_names:
+        roads_enriched["road_name"] = to_numpy(primary_name(road_attrs["names"]))[positions]
+    else:
+        roads_enriched["road_name"] = None
+
+    if "road_surface" in road_attrs.column_names:
+        roads_enriched["surface"] = to_numpy(first_surface(road_attrs["road_surface"]))[positions]
+    else:
+        roads_enriched["surface"] = "unknown"
 
     drop_cols = ["index_right", "index_right0"]
     roads_enriched = roads_enriched.drop(columns=[c for c in drop_cols if c in roads_enriched.columns], errors="ignore")
 
+    dem = load_dem()
+    if dem is not None:
+        print("  Sampling elevation along roads...")
+        with instrument.step("sample elevation"):
+            elevation = road_elevation(dem, roads_enriched.geometry.to_numpy())
+        for name in elevation.column_names:
+            roads_enriched[name] = elevation.column(name).to_pandas().to_numpy()
+
     output_path = PROCESSED_DIR / "roads_enriched.parquet"
-    roads_enriched.to_parquet(output_path)
+    with instrument.step("write"):
+        write_geoparquet(geodataframe_table(roads_enriched), output_path)
+    instrument.rows(rows_out=len(roads_enriched))
+    remove_partitions("roads_enriched")
+    record(output_path, **stage)
     print(f"  Saved {len(roads_enriched)} enriched road segments to {output_path}")
 
 
+def enrich_road_batch(table: pa.Table, geom_col: str, sma_index, gmu_index, exact: bool = False, dem=None) -> pa.Table:
+    geoms = shapely.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False))
+
+    if exact:
+        owner_rows, geoms, sma_rows = split_by_polygons(geoms, sma_index)
+        unit_rows, geoms, gmu_rows = split_by_polygons(geoms, gmu_index)
+    else:
+        points = shapely.point_on_surface(geoms)
+        owner_rows, sma_rows = left_join_within(points, sma_index)
+        unit_rows, gmu_rows = left_join_within(points[owner_rows], gmu_index)
+    rows = owner_rows[unit_rows]
+    sma_rows = sma_rows[unit_rows]
+
+    table = table.take(pa.array(rows))
+    if exact:
+        index = table.schema.get_field_index(geom_col)
+        field = table.schema.field(index)
+        table = table.set_column(index, field, pa.array(shapely.to_wkb(geoms), type=field.type))
+
+    owners = take_attributes(sma_index, sma_rows)
+    for name in owners.column_names:
+        table = table.append_column(name, owners.column(name))
+    if "ADMIN_AGENCY_CODE" in owners.column_names:
+        agency_codes = owners.column("ADMIN_AGENCY_CODE")
+    else:
+        agency_codes = pa.nulls(table.num_rows, type=pa.string())
+    table = table.append_column("land_status", land_status(agency_codes))
+
+    units = take_attributes(gmu_index, gmu_rows)
+    for name in units.column_names:
+        table = table.append_column(name, units.column(name))
+
+    if "class" in table.column_names:
+        table = table.append_column("hunt_relevant", hunt_relevant_class(table.column("class")))
+    else:
+        table = table.append_column("hunt_relevant", pa.repeat(False, table.num_rows))
+    if "names" in table.column_names:
+        table = table.append_column("road_name", primary_name(table.column("names")))
+    else:
+        table = table.append_column("road_name", pa.nulls(table.num_rows, type=pa.string()))
+    if "road_surface" in table.column_names:
+        table = table.append_column("surface", first_surface(table.column("road_surface")))
+    else:
+        table = table.append_column("surface", pa.repeat("unknown", table.num_rows))
+
+    if dem is not None:
+        # Split geometries already line up with the output rows; whole roads are taken like the table
+        elevation = road_elevation(dem, geoms if exact else geoms[rows])
+        for name in elevation.column_names:
+            table = table.append_column(name, elevation.column(name))
+    return table
+
+
+def load_polygon_indexes():
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS)
+    sma = sma.to_crs("EPSG:4326")
+    gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson")
+    gmus = gmus.to_crs("EPSG:4326")
+    sma_index = build_polygon_index(sma, ["ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME"])
+    gmu_index = build_polygon_index(gmus, ["GMUNAME", "REG_NAME", "ACRES", "AGFDLink"])
+    return sma_index, gmu_index
+
+
+_worker_state = {}
+
+
+def _init_enrich_worker(geom_col, sma_index, gmu_index, exact):
+    # Each worker maps the DEM itself; its tile cache is per process
+    _worker_state.update(geom_col=geom_col, sma_index=sma_index, gmu_index=gmu_index, exact=exact, dem=load_dem())
+
+
+def _enrich_partition(table: pa.Table) -> pa.Table:
+    return enrich_road_batch(
+        table,
+        _worker_state["geom_col"],
+        _worker_state["sma_index"],
+        _worker_state["gmu_index"],
+        _worker_state["exact"],
+        _worker_state["dem"],
+    )
+
+
+def _init_road_worker(exact: bool):
+    # Each partition worker builds its own indexes; nothing is loaded when every partition is fresh
+    _init_enrich_worker(None, *load_polygon_indexes(), exact)
+
+
+def enrich_road_partition(table: pa.Table, geom_col: str) -> pa.Table:
+    return enrich_road_batch(
+        table,
+        geom_col,
+        _worker_state["sma_index"],
+        _worker_state["gmu_index"],
+        _worker_state["exact"],
+        _worker_state["dem"],
+    )
+
+
+def spatial_partitions(table: pa.Table, geom_col: str, count: int) -> list[pa.Table]:
+    # Hilbert-ordered chunks keep each partition's polygon lookups spatially local
+    geoms = gpd.GeoSeries.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False))
+    valid = ~geoms.is_empty & geoms.notna()
+    distances = np.zeros(len(geoms), dtype=np.uint32)
+    if valid.any():
+        distances[valid.to_numpy()] = geoms[valid].hilbert_distance(total_bounds=geoms[valid].total_bounds)
+    order = np.argsort(distances, kind="stable")
+    return [table.take(pa.array(chunk)) for chunk in np.array_split(order, count) if len(chunk)]
+
+
+@instrument.stage
+def enrich_roads_streaming(batch_size: int = ROAD_BATCH_SIZE, exact: bool = False, workers: int = 1):
+    output_path = PROCESSED_DIR / "roads_enriched.parquet"
+    stage = road_stage(exact)
+    if is_fresh(output_path, **stage):
+        print("Roads already enriched, skipping.")
+        return
+
+    mode = "exact boundary splitting" if exact else "representative points"
+    print(f"Enriching roads in batches of {batch_size} ({mode}, {workers} worker(s))...")
+
+    print("  Loading BLM SMA and AZGFD GMUs into STRtree indexes...")
+    sma_index, gmu_index = load_polygon_indexes()
+    dem = load_dem()
+    if dem is None:
+        print(f"  No DEM at {TERRAIN_PATH} (make terrain); skipping elevation stats")
+
+    roads_file = pq.ParquetFile(PROCESSED_DIR / "overture_transportation_clipped.parquet")
+    geom_col = geometry_column(roads_file.schema_arrow)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_enrich_worker,
+            initargs=(geom_col, sma_index, gmu_index, exact),
+        )
+
+    schema = None
+    unsorted_path = output_path.with_suffix(".unsorted.parquet")
+    writer = None
+    rows_in = rows_out = 0
+    try:
+        for batch in roads_file.iter_batches(batch_size=batch_size):
+            table = pa.Table.from_batches([batch])
+            with instrument.step("enrich batches"):
+                if pool is None:
+                    results = [enrich_road_batch(table, geom_col, sma_index, gmu_index, exact, dem)]
+                else:
+                    results = list(pool.map(_enrich_partition, spatial_partitions(table, geom_col, workers * 4)))
+            for enriched in results:
+                if writer is None:
+                    schema = geoparquet_schema(roads_file.schema_arrow)
+                    schema = enriched.schema.with_metadata(schema.metadata)
+                    writer = pq.ParquetWriter(unsorted_path, schema)
+                with instrument.step("write"):
+                    writer.write_table(enriched.cast(schema))
+                rows_out += enriched.num_rows
+            rows_in += batch.num_rows
+            print(f"    {rows_in} roads read, {rows_out} enriched segments written")
+    finally:
+        if writer is not None:
+            writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    instrument.rows(rows_in, rows_out)
+    if writer is not None:
+        print("  Sorting output along a Hilbert curve...")
+        with instrument.step("hilbert sort"):
+            sort_geoparquet(unsorted_path, output_path)
+        unsorted_path.unlink()
+        remove_partitions("roads_enriched")
+        record(output_path, **stage)
+    print(f"  Saved {rows_out} enriched road segments to {output_path}")
+
+
+def poi_stage() -> dict:
+    return {
+        "inputs": [PROCESSED_DIR / "overture_places_clipped.parquet"],
+        "params": {"HUNT_POI_CATEGORIES": HUNT_POI_CATEGORIES},
+        "code": [
+            filter_hunt_pois, filter_hunt_pois_sql, PIPELINE_DIR / "columns.py", PIPELINE_DIR / "geoparquet.py",
+            PIPELINE_DIR / "enrich_sql.py",
+        ],
+    }
+
+
+def water_stage() -> dict:
+    return {
+        "inputs": [PROCESSED_DIR / "overture_water_clipped.parquet"],
+        "code": [
+            process_water_features, process_water_features_sql, PIPELINE_DIR / "columns.py",
+            PIPELINE_DIR / "geoparquet.py", PIPELINE_DIR / "enrich_sql.py",
+        ],
+    }
+
+
+@instrument.stage
 def filter_hunt_pois():
     output_path = PROCESSED_DIR / "places_hunt.parquet"
-    if output_path.exists() and output_path.stat().st_size > 10_000:
+    stage = poi_stage()
+    if is_fresh(output_path, **stage):
         print("Places already filtered, skipping.")
         return
 
     print("Filtering hunt-relevant POIs...")
 
     print("  Loading places...")
-    places = gpd.read_parquet(PROCESSED_DIR / "overture_places_clipped.parquet")
+    places_path = PROCESSED_DIR / "overture_places_clipped.parquet"
+    places = gpd.read_parquet(places_path)
     places = places.to_crs("EPSG:4326")
+    place_attrs = read_columns(places_path, ["categories", "names"])
 
-    def is_hunt_relevant(row):
-        categories = row.get("categories")
-        if categories is None:
-            return False
-
-        cat_str = ""
-        if isinstance(categories, dict):
-            primary = categories.get("primary", "")
-            alternate = categories.get("alternate", [])
-            alt_str = " ".join(alternate) if alternate is not None and len(alternate) > 0 else ""
-            cat_str = f"{primary} {alt_str}".lower()
-        elif isinstance(categories, str):
-            try:
-                parsed = json.loads(categories)
-                primary = parsed.get("primary", "")
-                alternate = parsed.get("alternate", [])
-                alt_str = " ".join(alternate) if alternate is not None and len(alternate) > 0 else ""
-                cat_str = f"{primary} {alt_str}".lower()
-            except:
-                cat_str = categories.lower()
-        elif isinstance(categories, list):
-            cat_str = " ".join(str(c) for c in categories).lower()
-
-        for hunt_cat in HUNT_POI_CATEGORIES:
-            if hunt_cat in cat_str:
-                return True
-        return False
-
-    places["hunt_relevant"] = places.apply(is_hunt_relevant, axis=1)
+    if "categories" in place_attrs.column_names:
+        places["hunt_relevant"] = to_numpy(hunt_relevant_categories(place_attrs["categories"]))
+    else:
+        places["hunt_relevant"] = False
     hunt_places = places[places["hunt_relevant"]].copy()
+    instrument.rows(len(places), len(hunt_places))
 
-    def extract_place_name(row):
-        names = row.get("names")
-        if names is None:
-            return None
-        if isinstance(names, dict):
-            return names.get("primary")
-        if isinstance(names, str):
-            try:
-                parsed = json.loads(names)
-                return parsed.get("primary")
-            except:
-                return names
-        return None
-
-    hunt_places["name"] = hunt_places.apply(extract_place_name, axis=1)
+    if "names" in place_attrs.column_names:
+        names = to_numpy(primary_name(place_attrs["names"]))
+        hunt_places["name"] = names[np.flatnonzero(places["hunt_relevant"].to_numpy())]
+    else:
+        hunt_places["name"] = None
 
     output_path = PROCESSED_DIR / "places_hunt.parquet"
-    hunt_places.to_parquet(output_path)
+    write_geoparquet(geodataframe_table(hunt_places), output_path)
+    remove_partitions("places_hunt")
+    record(output_path, **stage)
     print(f"  Saved {len(hunt_places)} hunt-relevant POIs to {output_path}")
 
 
+@instrument.stage
 def process_water_features():
     output_path = PROCESSED_DIR / "water_named.parquet"
-    if output_path.exists() and output_path.stat().st_size > 10_000:
+    input_path = PROCESSED_DIR / "overture_water_clipped.parquet"
+    stage = water_stage()
+    if is_fresh(output_path, **stage):
         print("Water already processed, skipping.")
         return
 
     print("Processing water features with names...")
 
-    input_path = PROCESSED_DIR / "overture_water_clipped.parquet"
     if not input_path.exists():
         print("  Water data not found, skipping.")
         return
 
     water = gpd.read_parquet(input_path)
     water = water.to_crs("EPSG:4326")
+    water_attrs = read_columns(input_path, ["names"])
 
-    def extract_water_name(row):
-        names = row.get("names")
-        if names is None:
-            return None
-        if isinstance(names, dict):
-            return names.get("primary")
-        if isinstance(names, str):
-            try:
-                parsed = json.loads(names)
-                return parsed.get("primary")
-            except:
-                return names
-        return None
-
-    water["name"] = water.apply(extract_water_name, axis=1)
+    if "names" in water_attrs.column_names:
+        water["name"] = to_numpy(primary_name(water_attrs["names"]))
+    else:
+        water["name"] = None
 
     water_named = water[water["name"].notna()].copy()
+    instrument.rows(len(water), len(water_named))
 
     if len(water_named) > 0:
-        water_named.to_parquet(output_path)
+        write_geoparquet(geodataframe_table(water_named), output_path)
+        remove_partitions("water_named")
+        record(output_path, **stage)
         print(f"  Saved {len(water_named)} named water features to {output_path}")
     else:
         print("  No named water features found.")
 
 
+def run_sql(sql: str, source_path: Path, output_path: Path, workers: int) -> int:
+    # One DuckDB query on workers threads into unsorted GeoParquet; the caller Hilbert-sorts it
+    con = enrich_sql.connect(workers, PROCESSED_DIR / "duckdb_tmp")
+    try:
+        return enrich_sql.copy_geoparquet(con, sql, source_path, output_path)
+    finally:
+        con.close()
+
+
+def append_road_elevation(path: Path, dem):
+    # Elevation columns go in front of the geometry, where enrich_roads puts them
+    source = pq.ParquetFile(path)
+    geom_col = geometry_column(source.schema_arrow)
+    tmp_path = path.with_suffix(".elevation.parquet")
+    writer = None
+    try:
+        for batch in source.iter_batches(batch_size=ROAD_BATCH_SIZE):
+            table = pa.Table.from_batches([batch])
+            elevation = road_elevation(dem, shapely.from_wkb(to_numpy(table.column(geom_col))))
+            for name in elevation.column_names:
+                table = table.add_column(table.schema.get_field_index(geom_col), name, elevation.column(name))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema.with_metadata(source.schema_arrow.metadata))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        tmp_path.replace(path)
+
+
+@instrument.stage
+def enrich_roads_sql(workers: int = 1):
+    output_path = PROCESSED_DIR / "roads_enriched.parquet"
+    stage = road_stage()
+    if is_fresh(output_path, **stage):
+        print("Roads already enriched, skipping.")
+        return
+
+    print(f"Enriching roads with DuckDB spatial joins ({workers} thread(s))...")
+    roads_path = PROCESSED_DIR / "overture_transportation_clipped.parquet"
+    unsorted_path = output_path.with_suffix(".unsorted.parquet")
+    sql = enrich_sql.road_sql(roads_path, RAW_DIR / "blm_sma_az.parquet", RAW_DIR / "azgfd_gmu.geojson")
+    with instrument.step("spatial joins"):
+        rows_out = run_sql(sql, roads_path, unsorted_path, workers)
+
+    dem = load_dem()
+    if dem is not None:
+        print("  Sampling elevation along roads...")
+        with instrument.step("sample elevation"):
+            append_road_elevation(unsorted_path, dem)
+
+    print("  Sorting output along a Hilbert curve...")
+    with instrument.step("hilbert sort"):
+        sort_geoparquet(unsorted_path, output_path)
+    unsorted_path.unlink()
+    instrument.rows(pq.ParquetFile(roads_path).metadata.num_rows, rows_out)
+    remove_partitions("roads_enriched")
+    record(output_path, **stage)
+    print(f"  Saved {rows_out} enriched road segments to {output_path}")
+
+
+@instrument.stage
+def filter_hunt_pois_sql(workers: int = 1):
+    output_path = PROCESSED_DIR / "places_hunt.parquet"
+    stage = poi_stage()
+    if is_fresh(output_path, **stage):
+        print("Places already filtered, skipping.")
+        return
+
+    print(f"Filtering hunt-relevant POIs with DuckDB ({workers} thread(s))...")
+    places_path = PROCESSED_DIR / "overture_places_clipped.parquet"
+    unsorted_path = output_path.with_suffix(".unsorted.parquet")
+    rows_out = run_sql(enrich_sql.poi_sql(places_path), places_path, unsorted_path, workers)
+    sort_geoparquet(unsorted_path, output_path)
+    unsorted_path.unlink()
+    instrument.rows(pq.ParquetFile(places_path).metadata.num_rows, rows_out)
+    remove_partitions("places_hunt")
+    record(output_path, **stage)
+    print(f"  Saved {rows_out} hunt-relevant POIs to {output_path}")
+
+
+@instrument.stage
+def process_water_features_sql(workers: int = 1):
+    output_path = PROCESSED_DIR / "water_named.parquet"
+    input_path = PROCESSED_DIR / "overture_water_clipped.parquet"
+    stage = water_stage()
+    if is_fresh(output_path, **stage):
+        print("Water already processed, skipping.")
+        return
+
+    print(f"Processing water features with names with DuckDB ({workers} thread(s))...")
+    if not input_path.exists():
+        print("  Water data not found, skipping.")
+        return
+
+    unsorted_path = output_path.with_suffix(".unsorted.parquet")
+    rows_out = run_sql(enrich_sql.water_sql(input_path), input_path, unsorted_path, workers)
+    instrument.rows(pq.ParquetFile(input_path).metadata.num_rows, rows_out)
+    if rows_out > 0:
+        sort_geoparquet(unsorted_path, output_path)
+        remove_partitions("water_named")
+        record(output_path, **stage)
+        print(f"  Saved {rows_out} named water features to {output_path}")
+    else:
+        print("  No named water features found.")
+    unsorted_path.unlink()
+
+
+def hunt_poi_batch(table: pa.Table, geom_col: str) -> pa.Table:
+    if "categories" in table.column_names:
+        table = table.filter(hunt_relevant_categories(table.column("categories")))
+    else:
+        table = table.slice(0, 0)
+    table = table.append_column("hunt_relevant", pa.repeat(True, table.num_rows))
+    if "names" in table.column_names:
+        return table.append_column("name", primary_name(table.column("names")))
+    return table.append_column("name", pa.nulls(table.num_rows, type=pa.string()))
+
+
+def named_water_batch(table: pa.Table, geom_col: str) -> pa.Table:
+    if "names" not in table.column_names:
+        return table.slice(0, 0).append_column("name", pa.nulls(0, type=pa.string()))
+    names = primary_name(table.column("names"))
+    named = names.is_valid()
+    return table.filter(named).append_column("name", names.filter(named))
+
+
+@instrument.stage
+def enrich_roads_partitioned(
+    exact: bool = False, workers: int = 1, partition_by: str = QUADKEY, region: str | None = None, unit: str | None = None
+):
+    mode = "exact boundary splitting" if exact else "representative points"
+    print(f"Enriching road partitions by {partition_by} ({mode}, {workers} worker(s))...")
+    stage = road_stage(exact)
+    # Each partition's own clipped file stands in for the monolithic clipped layer
+    stage["inputs"] = [RAW_DIR / "blm_sma_az.parquet", RAW_DIR / "azgfd_gmu.geojson", *terrain_inputs()]
+    stage["code"] += [enrich_road_partition, PIPELINE_DIR / "partitions.py"]
+    count, rows_in, rows_out = run_partitions(
+        enrich_road_partition, "overture_transportation_clipped", "roads_enriched", stage,
+        key=partition_by, selected=area(region, unit), workers=workers,
+        initializer=_init_road_worker, initargs=(exact,),
+    )
+    instrument.rows(rows_in, rows_out)
+    if count:
+        print(f"  Saved {rows_out} enriched road segments from {count} partition(s)")
+
+
+@instrument.stage
+def filter_hunt_pois_partitioned(workers: int = 1, region: str | None = None, unit: str | None = None):
+    print("Filtering hunt-relevant POI partitions...")
+    stage = {
+        "params": {"HUNT_POI_CATEGORIES": HUNT_POI_CATEGORIES},
+        "code": [hunt_poi_batch, PIPELINE_DIR / "columns.py", PIPELINE_DIR / "geoparquet.py", PIPELINE_DIR / "partitions.py"],
+    }
+    count, rows_in, rows_out = run_partitions(
+        hunt_poi_batch, "overture_places_clipped", "places_hunt", stage, selected=area(region, unit), workers=workers
+    )
+    instrument.rows(rows_in, rows_out)
+    if count:
+        print(f"  Saved {rows_out} hunt-relevant POIs from {count} partition(s)")
+
+
+@instrument.stage
+def process_water_features_partitioned(workers: int = 1, region: str | None = None, unit: str | None = None):
+    print("Processing named water feature partitions...")
+    stage = {
+        "code": [named_water_batch, PIPELINE_DIR / "columns.py", PIPELINE_DIR / "geoparquet.py", PIPELINE_DIR / "partitions.py"],
+    }
+    count, rows_in, rows_out = run_partitions(
+        named_water_batch, "overture_water_clipped", "water_named", stage, selected=area(region, unit), workers=workers
+    )
+    instrument.rows(rows_in, rows_out)
+    if count:
+        print(f"  Saved {rows_out} named water features from {count} partition(s)")
+
+
+@instrument.stage
 def prepare_static_layers():
     print("Preparing static layers for frontend...")
 
     frontend_data = Path(__file__).parent.parent / "frontend" / "public" / "data"
     frontend_data.mkdir(parents=True, exist_ok=True)
 
-    print("  Copying AZGFD GMUs...")
-    gmu_gdf = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson")
-    keep_cols = ["GMUNAME", "REG_NAME", "ACRES", "LANDOWN", "HUNT", "AGFDLink", "geometry"]
-    gmu_filtered = gmu_gdf[[c for c in keep_cols if c in gmu_gdf.columns]]
-    gmu_filtered.to_file(PROCESSED_DIR / "hunt_units.geojson", driver="GeoJSON")
-
-    print("  Copying BLM SMA...")
-    sma_gdf = gpd.read_file(RAW_DIR / "blm_sma_az.geojson")
-    keep_cols = ["ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME", "geometry"]
-    sma_filtered = sma_gdf[[c for c in keep_cols if c in sma_gdf.columns]]
-    sma_filtered.to_file(PROCESSED_DIR / "land_ownership.geojson", driver="GeoJSON")
+    gmu_output = PROCESSED_DIR / "hunt_units.geojson"
+    gmu_stage = {"inputs": [RAW_DIR / "azgfd_gmu.geojson"], "code": [prepare_static_layers]}
+    if is_fresh(gmu_output, **gmu_stage):
+        print("  AZGFD GMUs up to date, skipping.")
+    else:
+        print("  Copying AZGFD GMUs...")
+        gmu_gdf = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson")
+        keep_cols = ["GMUNAME", "REG_NAME", "ACRES", "LANDOWN", "HUNT", "AGFDLink", "geometry"]
+        gmu_filtered = gmu_gdf[[c for c in keep_cols if c in gmu_gdf.columns]]
+        with instrument.step("write hunt units"):
+            gmu_filtered.to_file(gmu_output, driver="GeoJSON")
+        instrument.rows(len(gmu_gdf), len(gmu_filtered))
+        record(gmu_output, **gmu_stage)
 
     print("  Static layers saved to processed/ for PMTiles generation.")
 
 
+@instrument.stage
+def prepare_land_ownership(workers: int = 1):
+    # Adjacent SMA parcels of one agency are dissolved into a single polygon, then written once per
+    # zoom band with coverage-simplified geometry and tippecanoe minzoom/maxzoom, so tippecanoe
+    # never has to drop or coalesce parcels to fit a tile
+    output_path = PROCESSED_DIR / "land_ownership.parquet"
+    stage = {
+        "inputs": [RAW_DIR / "blm_sma_az.parquet"],
+        "params": {"bands": LAND_OWNERSHIP_BANDS},
+        "code": [prepare_land_ownership, PIPELINE_DIR / "dissolve.py", PIPELINE_DIR / "geoparquet.py"],
+    }
+    if is_fresh(output_path, **stage):
+        print("BLM SMA land ownership up to date, skipping.")
+        return
+
+    print(f"Dissolving BLM SMA land ownership by agency ({workers} worker(s))...")
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS).to_crs("EPSG:4326")
+    sma = sma[sma.geometry.notna() & ~sma.geometry.is_empty]
+    agencies = sma["ADMIN_AGENCY_CODE"].fillna("UNK").to_numpy(dtype=object)
+    with instrument.step("dissolve"):
+        agencies, polygons = dissolve(sma.geometry.to_numpy(), agencies, workers)
+    print(f"  {len(sma)} parcels dissolved into {len(polygons)} polygons")
+
+    bands = []
+    for band in zoom_bands(LAND_OWNERSHIP_BANDS):
+        with instrument.step(f"simplify z{band.minzoom}-{band.maxzoom}"):
+            simplified = simplify_coverage(polygons, band.tolerance)
+        print(f"    z{band.minzoom}-{band.maxzoom}: {shapely.get_num_coordinates(simplified).sum()} vertices")
+        bands.append(gpd.GeoDataFrame({
+            "ADMIN_AGENCY_CODE": agencies,
+            "tippecanoe_minzoom": np.full(len(polygons), band.minzoom, dtype=np.int8),
+            "tippecanoe_maxzoom": np.full(len(polygons), band.maxzoom, dtype=np.int8),
+        }, geometry=simplified, crs="EPSG:4326"))
+    land = gpd.GeoDataFrame(pd.concat(bands, ignore_index=True), crs="EPSG:4326")
+
+    with instrument.step("write land ownership"):
+        write_geoparquet(geodataframe_table(land), output_path)
+    (PROCESSED_DIR / "land_ownership.geojson").unlink(missing_ok=True)
+    instrument.rows(len(sma), len(land))
+    record(output_path, **stage)
+    print(f"  Saved {len(land)} land-ownership features to {output_path}")
+
+
+def _layer_files(name: str) -> list[Path]:
+    if (PROCESSED_DIR / name).is_dir():
+        return partition_files(name)
+    return [PROCESSED_DIR / f"{name}.parquet"]
+
+
+def unit_stats_stage() -> dict:
+    return {
+        "inputs": [
+            *_layer_files("roads_enriched"),
+            *_layer_files("places_hunt"),
+            RAW_DIR / "blm_sma_az.parquet",
+            RAW_DIR / "azgfd_gmu.geojson",
+        ],
+        "params": {"AGENCY_ACCESS_MAP": AGENCY_ACCESS_MAP, "HUNT_POI_CATEGORIES": HUNT_POI_CATEGORIES},
+        "code": [
+            compute_unit_stats,
+            PIPELINE_DIR / "unit_stats.py",
+            PIPELINE_DIR / "columns.py",
+            PIPELINE_DIR / "spatial_join.py",
+            PIPELINE_DIR / "dissolve.py",
+        ],
+    }
+
+
+@instrument.stage
+def compute_unit_stats(workers: int = 1):
+    # Per-unit road miles by land status and surface, acres by agency and hunt POI counts, written
+    # as one JSON lookup the frontend's unit panel loads once
+    output_path = PROCESSED_DIR / "unit_stats.json"
+    stage = unit_stats_stage()
+    if is_fresh(output_path, **stage):
+        print("Unit statistics up to date, skipping.")
+        return
+
+    print("Computing per-unit access statistics...")
+    gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson").to_crs("EPSG:4326")
+    gmu_index = build_polygon_index(gmus, [UNIT])
+    # Every point belongs to one unit and one agency, so nothing is counted twice where polygons overlap
+    gmu_polygons = exclusive_polygons(gmu_index.geometries)
+    gmu_index = PolygonIndex(shapely.STRtree(gmu_polygons), gmu_polygons, gmu_index.attributes)
+    unit_acres = sum_by(pa.table({
+        UNIT: gmu_index.attributes.column(UNIT).cast(pa.string()),
+        "acres": acres(gmu_index.geometries),
+    }), [UNIT], "acres")
+
+    # Same-agency parcels are dissolved first so overlapping parcels are not counted twice
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS).to_crs("EPSG:4326")
+    sma = sma[sma.geometry.notna() & ~sma.geometry.is_empty]
+    with instrument.step("dissolve land ownership"):
+        agencies, polygons = dissolve(
+            sma.geometry.to_numpy(), sma["ADMIN_AGENCY_CODE"].fillna("UNK").to_numpy(dtype=object), workers
+        )
+        polygons = exclusive_polygons(polygons)
+    sma_index = PolygonIndex(
+        shapely.STRtree(polygons), polygons, pa.table({"ADMIN_AGENCY_CODE": pa.array(agencies, type=pa.string())})
+    )
+    with instrument.step("agency acres"):
+        land = agency_acres(polygons, agencies, gmu_index)
+
+    rows_in = 0
+    miles = []
+    with instrument.step("road miles"):
+        for path in _layer_files("roads_enriched"):
+            source = pq.ParquetFile(path)
+            geom_col = geometry_column(source.schema_arrow)
+            carried = None
+            for batch in source.iter_batches(batch_size=ROAD_BATCH_SIZE, columns=["id", geom_col, "surface"]):
+                rows_in += batch.num_rows
+                batch, carried = unique_roads(pa.Table.from_batches([batch]), geom_col, carried)
+                geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+                miles.append(road_miles(geoms, batch.column("surface"), sma_index, gmu_index))
+    miles = sum_by(pa.concat_tables(miles), [UNIT, "land_status", "surface"], "miles")
+
+    pois = []
+    with instrument.step("poi counts"):
+        for path in _layer_files("places_hunt"):
+            source = pq.ParquetFile(path)
+            geom_col = geometry_column(source.schema_arrow)
+            for batch in source.iter_batches(columns=[geom_col, "categories"]):
+                geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+                pois.append(poi_counts(geoms, batch.column("categories"), gmu_index))
+                rows_in += batch.num_rows
+    pois = sum_by(pa.concat_tables(pois), [UNIT, "category"], "count")
+
+    units = unit_stats(unit_acres, miles, land, pois)
+    tmp_path = output_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps({"units": units}, separators=(",", ":")))
+    tmp_path.replace(output_path)
+    FRONTEND_DATA.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(output_path, FRONTEND_DATA / output_path.name)
+    instrument.rows(rows_in, len(units))
+    record(output_path, **stage)
+    print(f"  Saved statistics for {len(units)} units to {output_path} ({output_path.stat().st_size // 1024} KB)")
+
+
+def road_graph_stage() -> dict:
+    return {
+        "inputs": [RAW_DIR / "overture_transportation_az.parquet", RAW_DIR / "blm_sma_az.parquet"],
+        "params": {"AGENCY_ACCESS_MAP": AGENCY_ACCESS_MAP},
+        "code": [
+            build_road_graph,
+            PIPELINE_DIR / "road_graph.py",
+            PIPELINE_DIR / "columns.py",
+            PIPELINE_DIR / "spatial_join.py",
+            PIPELINE_DIR / "unit_stats.py",
+            PIPELINE_DIR / "dissolve.py",
+        ],
+    }
+
+
+@instrument.stage
+def build_road_graph(workers: int = 1):
+    # Routable graph of the Overture road segments cut at their connectors, with the land status of
+    # every edge, saved as memory-mappable CSR arrays for pipeline/route.py. It is built from the
+    # raw segments: clipping moves segment ends away from the connectors' linear positions.
+    graph_dir = PROCESSED_DIR / "road_graph"
+    output_path = graph_dir / "graph.json"
+    stage = road_graph_stage()
+    if is_fresh(output_path, **stage):
+        print("Road graph up to date, skipping.")
+        return
+
+    roads_path = RAW_DIR / "overture_transportation_az.parquet"
+    source = pq.ParquetFile(roads_path)
+    if "connectors" not in source.schema_arrow.names:
+        raise RuntimeError(f"{roads_path} has no connectors column; download the transportation theme again")
+    print("Building the road graph...")
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS).to_crs("EPSG:4326")
+    sma_index = build_polygon_index(sma, ["ADMIN_AGENCY_CODE"])
+
+    geom_col = geometry_column(source.schema_arrow)
+    columns = [c for c in (geom_col, "subtype", "connectors", "access_restrictions") if c in source.schema_arrow.names]
+    batches = []
+    rows_in = 0
+    with instrument.step("cut edges"):
+        for batch in source.iter_batches(batch_size=ROAD_BATCH_SIZE, columns=columns):
+            rows_in += batch.num_rows
+            if "subtype" in batch.schema.names:
+                batch = batch.filter(pc.fill_null(pc.equal(batch.column("subtype"), "road"), False))
+            geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+            restrictions = batch.column("access_restrictions") if "access_restrictions" in batch.schema.names else None
+            edges = road_edges(geoms, batch.column("connectors"), sma_index, restrictions)
+            if len(edges.counts):
+                batches.append(edges)
+    if not batches:
+        raise RuntimeError(f"No road segments with connectors in {roads_path}")
+
+    with instrument.step("write graph"):
+        nodes, edges = write_graph(graph_dir, batches, workers)
+    instrument.rows(rows_in, edges)
+    record(output_path, **stage)
+    print(f"  Saved a graph of {nodes} nodes and {edges} edges to {graph_dir}")
+
+
+def landlocked_stage() -> dict:
+    return {
+        "inputs": [*_layer_files("roads_enriched"), RAW_DIR / "blm_sma_az.parquet", RAW_DIR / "azgfd_gmu.geojson"],
+        "params": {"AGENCY_ACCESS_MAP": AGENCY_ACCESS_MAP, "OPEN_LAND_STATUSES": OPEN_LAND_STATUSES},
+        "code": [
+            find_landlocked_land,
+            PIPELINE_DIR / "access.py",
+            PIPELINE_DIR / "columns.py",
+            PIPELINE_DIR / "dissolve.py",
+            PIPELINE_DIR / "unit_stats.py",
+            PIPELINE_DIR / "geoparquet.py",
+        ],
+    }
+
+
+@instrument.stage
+def find_landlocked_land(workers: int = 1):
+    # Open (public and state trust) parcels joined through shared edges into components; a
+    # component no road on open land reaches is landlocked, or corner-locked when corner crossings
+    # lead to one that is reached. Only those two are dissolved and written, cut per unit.
+    output_path = PROCESSED_DIR / "landlocked.parquet"
+    stage = landlocked_stage()
+    if is_fresh(output_path, **stage):
+        print("Landlocked land up to date, skipping.")
+        return
+
+    print("Finding landlocked public land...")
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS).to_crs("EPSG:4326")
+    sma = sma[sma.geometry.notna() & ~sma.geometry.is_empty]
+    is_open = np.isin(to_numpy(land_status(sma["ADMIN_AGENCY_CODE"])), OPEN_LAND_STATUSES)
+    parcels, _ = polygon_parts(shapely.make_valid(sma.geometry.to_numpy()[is_open]))
+    with instrument.step("components"):
+        labels, corner_left, corner_right = open_components(parcels)
+    count = labels.max() + 1 if len(labels) else 0
+
+    tree = shapely.STRtree(parcels)
+    reached = np.zeros(count, dtype=bool)
+    rows_in = 0
+    with instrument.step("road access"):
+        for path in _layer_files("roads_enriched"):
+            source = pq.ParquetFile(path)
+            geom_col = geometry_column(source.schema_arrow)
+            for batch in source.iter_batches(batch_size=ROAD_BATCH_SIZE, columns=[geom_col, "land_status"]):
+                rows_in += batch.num_rows
+                batch = batch.filter(pc.is_in(batch.column("land_status"), pa.array(OPEN_LAND_STATUSES)))
+                geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+                reached[reached_components(geoms, tree, labels)] = True
+    access = access_status(reached, corner_left, corner_right)
+
+    locked = np.flatnonzero(access != ACCESSIBLE)
+    order = np.argsort(labels, kind="stable")
+    starts = np.searchsorted(labels[order], np.arange(count + 1))
+    with instrument.step("dissolve"):
+        components, polygons = union_groups(parcels, [(c, order[starts[c]:starts[c + 1]]) for c in locked], workers)
+    gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson").to_crs("EPSG:4326")
+    with instrument.step("unit pieces"):
+        rows, pieces, units = unit_pieces(polygons, build_polygon_index(gmus, [UNIT]))
+    components = components[rows].astype(np.int64)
+    component_acres = np.bincount(components, weights=units.column("acres").to_numpy(), minlength=count)
+    landlocked = gpd.GeoDataFrame({
+        "access": access[components],
+        UNIT: units.column(UNIT).to_numpy(zero_copy_only=False),
+        "acres": np.round(units.column("acres").to_numpy(), 1),
+        "component_acres": np.round(component_acres[components], 1),
+    }, geometry=pieces, crs="EPSG:4326")
+
+    with instrument.step("write landlocked"):
+        write_geoparquet(geodataframe_table(landlocked), output_path)
+    instrument.rows(len(sma) + rows_in, len(landlocked))
+    record(output_path, **stage)
+    for status in (LANDLOCKED, CORNER_LOCKED):
+        chosen = landlocked["access"] == status
+        print(f"  {status}: {landlocked[chosen]['acres'].sum():,.0f} acres in {np.sum(access == status)} of {count} components")
+    print(f"  Saved {len(landlocked)} per-unit pieces to {output_path}")
+
+
+def search_stage() -> dict:
+    return {
+        "inputs": [
+            *_layer_files("roads_enriched"),
+            *_layer_files("places_hunt"),
+            *_layer_files("water_named"),
+            PROCESSED_DIR / "hunt_units.geojson",
+        ],
+        "params": {"SEARCH_SOURCES": SEARCH_SOURCES},
+        "code": [build_search_index, PIPELINE_DIR / "search_index.py", PIPELINE_DIR / "dissolve.py"],
+    }
+
+
+@instrument.stage
+def build_search_index():
+    # Road, place, water and unit names with a box and center per nearby group of same-name
+    # features, as one compact binary the frontend fetches once and searches by prefix
+    output_path = PROCESSED_DIR / "search.bin"
+    stage = search_stage()
+    if is_fresh(output_path, **stage):
+        print("Search index up to date, skipping.")
+        return
+
+    print("Building the name search index...")
+    gmus = gpd.read_file(PROCESSED_DIR / "hunt_units.geojson").to_crs("EPSG:4326")
+    features = {"unit": [named_features(pa.array(gmus[UNIT].astype(str)), gmus.geometry.to_numpy())]}
+    rows_in = len(gmus)
+    with instrument.step("read names"):
+        for kind, (layer, name_col) in SEARCH_SOURCES.items():
+            for path in _layer_files(layer):
+                source = pq.ParquetFile(path)
+                geom_col = geometry_column(source.schema_arrow)
+                for batch in source.iter_batches(batch_size=ROAD_BATCH_SIZE, columns=[geom_col, name_col]):
+                    geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+                    features.setdefault(kind, []).append(named_features(batch.column(name_col), geoms))
+                    rows_in += batch.num_rows
+    with instrument.step("merge names"):
+        index = merge_features(features)
+    size = write_index(output_path, index)
+    FRONTEND_DATA.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(output_path, FRONTEND_DATA / output_path.name)
+    instrument.rows(rows_in, len(index.kinds))
+    record(output_path, **stage)
+    print(f"  Saved {len(index.keys)} names with {len(index.kinds)} entries to {output_path} ({size // 1024} KB)")
+
+
+def lookup_stage() -> dict:
+    return {
+        "inputs": [RAW_DIR / "blm_sma_az.parquet", PROCESSED_DIR / "hunt_units.geojson"],
+        "params": {"AGENCY_ACCESS_MAP": AGENCY_ACCESS_MAP},
+        "code": [prepare_lookup_index, PIPELINE_DIR / "lookup.py", PIPELINE_DIR / "columns.py", PIPELINE_DIR / "dissolve.py"],
+    }
+
+
+@instrument.stage
+def prepare_lookup_index():
+    # Full-detail SMA parcels and hunt units as memory-mappable polygon layers for the point
+    # lookups of pipeline/lookup_service.py
+    sma_path = PROCESSED_DIR / "lookup_sma.arrow"
+    gmu_path = PROCESSED_DIR / "lookup_gmu.arrow"
+    stage = lookup_stage()
+    if is_fresh(sma_path, **stage) and is_fresh(gmu_path, **stage):
+        print("Lookup index up to date, skipping.")
+        return
+
+    print("Preparing the land status and hunt unit lookup index...")
+    sma = gpd.read_parquet(RAW_DIR / "blm_sma_az.parquet", columns=SMA_COLUMNS).to_crs("EPSG:4326")
+    sma = sma[sma.geometry.notna() & ~sma.geometry.is_empty]
+    gmus = gpd.read_file(PROCESSED_DIR / "hunt_units.geojson").to_crs("EPSG:4326")
+    with instrument.step("write layers"):
+        sma_rows = write_layer(sma_path, sma.geometry.to_numpy(), pa.table({
+            "land_status": land_status(sma["ADMIN_AGENCY_CODE"]),
+            "ADMIN_UNIT_NAME": pa.array(sma["ADMIN_UNIT_NAME"], type=pa.string(), from_pandas=True),
+        }))
+        gmu_rows = write_layer(gmu_path, gmus.geometry.to_numpy(), pa.table({
+            "GMUNAME": pa.array(gmus["GMUNAME"].astype(str), type=pa.string()),
+        }))
+    instrument.rows(len(sma) + len(gmus), sma_rows + gmu_rows)
+    record(sma_path, **stage)
+    record(gmu_path, **stage)
+    print(f"  Saved {sma_rows} SMA and {gmu_rows} hunt unit polygons to {sma_path.name} and {gmu_path.name}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Enrich roads, POIs and water features")
+    parser.add_argument("--streaming", action="store_true", help="Enrich roads in Parquet batches with bounded memory")
+    parser.add_argument("--batch-size", type=int, default=ROAD_BATCH_SIZE, help="Roads per batch in streaming mode")
+    parser.add_argument("--exact", action="store_true", help="Split roads at land-ownership and GMU boundaries")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for batch partitions and the land-ownership dissolve")
+    parser.add_argument("--partitioned", action="store_true", help="Process partitioned clip outputs partition by partition")
+    parser.add_argument("--partition-by", choices=PARTITION_KEYS, default=QUADKEY, help="Key of partitioned road output")
+    parser.add_argument("--region", help="With --partitioned, only rebuild partitions reaching this AZGFD region")
+    parser.add_argument("--unit", help="With --partitioned, only rebuild partitions reaching this hunt unit")
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default=GEOPANDAS, help="Engine for the road, POI and water enrichment"
+    )
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of each stage in the run report")
+    args = parser.parse_args()
+    if (args.region or args.unit) and not args.partitioned:
+        parser.error("--region and --unit need --partitioned")
+    if args.backend == DUCKDB and (args.streaming or args.exact or args.partitioned):
+        parser.error("--backend duckdb runs in one query; it does not take --streaming, --exact or --partitioned")
+    if args.profile:
+        instrument.enable_profiling()
+
     print("=" * 60)
     print("AZ Hunt Planner - Data Enrichment")
     print("=" * 60)
 
-    enrich_roads()
-    filter_hunt_pois()
-    process_water_features()
+    if args.backend == DUCKDB:
+        enrich_roads_sql(args.workers)
+        filter_hunt_pois_sql(args.workers)
+        process_water_features_sql(args.workers)
+    elif args.partitioned:
+        enrich_roads_partitioned(args.exact, args.workers, args.partition_by, args.region, args.unit)
+        filter_hunt_pois_partitioned(args.workers, args.region, args.unit)
+        process_water_features_partitioned(args.workers, args.region, args.unit)
+    else:
+        if args.streaming or args.exact:
+            enrich_roads_streaming(args.batch_size, exact=args.exact, workers=args.workers)
+        else:
+            enrich_roads()
+        filter_hunt_pois()
+        process_water_features()
     prepare_static_layers()
+    prepare_lookup_index()
+    prepare_land_ownership(args.workers)
+    compute_unit_stats(args.workers)
+    build_road_graph(args.workers)
+    find_landlocked_land(args.workers)
+    build_search_index()
 
     print("=" * 60)
     print("Enrichment complete!")
+    print(f"Run report: {instrument.write_report()}")
     print("=" * 60)
 
 
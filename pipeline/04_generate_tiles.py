@@ -0,0 +1,164 @@
+import argparse
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline import instrument
+from pipeline.partitions import Area, area, partition_files
+from pipeline.tile_feed import TILE_LAYERS, build_tileset, update_tileset
+from pipeline.utils import PROCESSED_DIR, TILES_DIR
+
+FRONTEND_DATA = Path(__file__).parent.parent / "frontend" / "public" / "data"
+
+
+def area_dir(region: str | None = None, unit: str | None = None) -> Path:
+    # Area builds go to their own directory so they never replace the statewide tiles
+    parts = [f"{label}-{value}" for label, value in (("region", region), ("unit", unit)) if value]
+    return TILES_DIR / "areas" / re.sub(r"[^A-Za-z0-9_-]", "_", "-".join(parts))
+
+
+def layer_inputs(source: str, selected: Area | None = None) -> list[Path] | None:
+    # Partitioned layers are read partition by partition; the rest from their single file.
+    # None means the layer cannot be built for the selected area.
+    if (PROCESSED_DIR / source).is_dir():
+        return partition_files(source, selected)
+    if selected is not None:
+        return None
+    for suffix in (".parquet", ".geojson"):
+        if (PROCESSED_DIR / f"{source}{suffix}").exists():
+            return [PROCESSED_DIR / f"{source}{suffix}"]
+    return []
+
+
+@instrument.stage
+def generate_layer(
+    layer: str, region: str | None = None, unit: str | None = None, threads: int | None = None,
+    incremental: bool = False,
+):
+    tile_layer = TILE_LAYERS[layer]
+    inputs = layer_inputs(tile_layer.source, area(region, unit))
+    if inputs is None:
+        print(f"  Skipping {layer} ({tile_layer.source} is a statewide layer, not partitioned)")
+        return
+    if not inputs:
+        print(f"  Skipping {layer} (no {tile_layer.source} data found)")
+        return
+
+    filtered = bool(region or unit)
+    output_dir = area_dir(region, unit) if filtered else TILES_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{layer}.pmtiles"
+
+    print(f"  {layer} ({len(inputs)} input file{'s' if len(inputs) != 1 else ''})...", flush=True)
+    if incremental:
+        update = update_tileset(tile_layer, inputs, output_path, threads)
+        features = update.features
+        if update.rebuilt:
+            print(f"  {layer}: rebuilt in full ({update.rebuilt})", flush=True)
+        elif not update.changed:
+            print(f"  {layer}: no feature changes, {output_path} is up to date", flush=True)
+            return
+        else:
+            print(
+                f"  {layer}: {update.changed} changed features, {update.tiles} tiles regenerated "
+                f"from {features} nearby features", flush=True,
+            )
+    else:
+        features = build_tileset(tile_layer, inputs, output_path, threads)
+    instrument.rows(features, features)
+    print(f"  {layer}: {features} features -> {output_path}", flush=True)
+
+    if not filtered:
+        FRONTEND_DATA.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(output_path, FRONTEND_DATA / output_path.name)
+        print(f"  Copied {output_path.name} to frontend")
+
+
+def _line_buffered():
+    sys.stdout.reconfigure(line_buffering=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate PMTiles by streaming processed layers into tippecanoe")
+    parser.add_argument("layers", nargs="*", help=f"Layers to build ({', '.join(TILE_LAYERS)}); default is all")
+    parser.add_argument("--region", help="Only partitions reaching this AZGFD region (written under tiles/areas/)")
+    parser.add_argument("--unit", help="Only partitions reaching this hunt unit (written under tiles/areas/)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="CPU budget shared by all tippecanoe jobs")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Regenerate only the tiles reached by changed features and splice them into the existing archives",
+    )
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of each layer in the run report")
+    args = parser.parse_args()
+    layers = args.layers or list(TILE_LAYERS)
+    unknown = [layer for layer in layers if layer not in TILE_LAYERS]
+    if unknown:
+        parser.error(f"unknown layers: {', '.join(unknown)}")
+    try:
+        selected = area(args.region, args.unit)
+    except ValueError as e:
+        parser.error(str(e))
+    if shutil.which("tippecanoe") is None:
+        parser.error("tippecanoe not found on PATH")
+
+    instrument.run_id()
+    if args.profile:
+        instrument.enable_profiling()
+
+    print("=" * 60)
+    print("AZ Hunt Planner - Tile Generation")
+    print("=" * 60)
+
+    buildable = []
+    for layer in layers:
+        inputs = layer_inputs(TILE_LAYERS[layer].source, selected)
+        if inputs is None:
+            print(f"  Skipping {layer} ({TILE_LAYERS[layer].source} is a statewide layer, not partitioned)")
+        elif not inputs:
+            print(f"  Skipping {layer} (no {TILE_LAYERS[layer].source} data found)")
+        else:
+            buildable.append(layer)
+    if not buildable:
+        print("Nothing to build.")
+        return
+    layers = buildable
+
+    # Layers run side by side and split the CPU budget between their tippecanoe threads;
+    # cores left over go to the first (largest) layers
+    budget = max(args.jobs, 1)
+    concurrency = min(len(layers), budget)
+    threads = {layer: budget // concurrency + (i < budget % concurrency) for i, layer in enumerate(layers)}
+    print(f"Streaming {len(layers)} layer(s) into tippecanoe ({concurrency} at a time, {budget} threads)...")
+
+    failed = []
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(concurrency, mp_context=spawn, initializer=_line_buffered) as pool:
+        futures = {
+            layer: pool.submit(generate_layer, layer, args.region, args.unit, threads[layer], args.incremental)
+            for layer in layers
+        }
+        for layer, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(layer)
+                print(f"  {layer} FAILED: {e}")
+
+    print("=" * 60)
+    print(f"Run report: {instrument.write_report()}")
+    if failed:
+        print(f"Tile generation failed for: {', '.join(failed)}")
+        print("=" * 60)
+        sys.exit(1)
+    print("Tile generation complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import numpy as np
+import pyarrow as pa
+import shapely
+
+from pipeline.dissolve import connected_components
+from pipeline.road_graph import PUBLIC_LAND_STATUSES
+from pipeline.spatial_join import PolygonIndex, take_attributes
+from pipeline.unit_stats import UNIT, acres
+
+# Land open to hunters: federal public land, and state trust land with a recreation permit
+OPEN_LAND_STATUSES = PUBLIC_LAND_STATUSES + ["state_trust"]
+ACCESSIBLE = "accessible"
+CORNER_LOCKED = "corner_locked"
+LANDLOCKED = "landlocked"
+
+
+def parcel_contacts(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Every pair of parcels that meet, and whether they share an edge or overlap (True) or only
+    # touch at a corner (False), read off the DE-9IM matrices of one vectorized relate
+    left, right = shapely.STRtree(geoms).query(geoms, predicate="intersects")
+    keep = left < right
+    left, right = left[keep], right[keep]
+    matrix = np.array(shapely.relate(geoms[left], geoms[right]), dtype="U9").view("U1").reshape(-1, 9)
+    shared = (matrix[:, 0] != "F") | (matrix[:, 4] == "1")
+    return left, right, shared
+
+
+def open_components(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Component (0..n-1) of every parcel, parcels joining through shared edges, and the pairs of
+    # components that meet only at corners: the checkerboard, where crossing from one to the
+    # other means stepping over the corner of private land
+    left, right, shared = parcel_contacts(geoms)
+    _, labels = np.unique(connected_components(len(geoms), left[shared], right[shared]), return_inverse=True)
+    corner_left, corner_right = labels[left[~shared]], labels[right[~shared]]
+    apart = corner_left != corner_right
+    return labels, corner_left[apart], corner_right[apart]
+
+
+def reached_components(roads: np.ndarray, tree: shapely.STRtree, labels: np.ndarray) -> np.ndarray:
+    # Components any of the roads touches
+    _, parcels = tree.query(roads, predicate="intersects")
+    return np.unique(labels[parcels])
+
+
+def access_status(reached: np.ndarray, corner_left: np.ndarray, corner_right: np.ndarray) -> np.ndarray:
+    # accessible: a public road reaches it; corner_locked: none does, but a chain of corner
+    # crossings links it to a component one does; landlocked: neither
+    groups = connected_components(len(reached), corner_left, corner_right)
+    open_groups = np.zeros(len(reached), dtype=bool)
+    open_groups[groups[reached]] = True
+    return np.where(reached, ACCESSIBLE, np.where(open_groups[groups], CORNER_LOCKED, LANDLOCKED))
+
+
+def unit_pieces(polygons: np.ndarray, gmu_index: PolygonIndex) -> tuple[np.ndarray, np.ndarray, pa.Table]:
+    # Polygons cut at unit boundaries: (row of the polygon, piece, unit name and acres) per piece
+    left, right = gmu_index.tree.query(polygons, predicate="intersects")
+    pieces = shapely.intersection(polygons[left], gmu_index.geometries[right])
+    keep = shapely.area(pieces) > 0
+    left, right, pieces = left[keep], right[keep], pieces[keep]
+    table = pa.table({
+        UNIT: take_attributes(gmu_index, right).column(UNIT).cast(pa.string()),
+        "acres": acres(pieces),
+    })
+    return left, pieces, table
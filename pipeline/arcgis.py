@@ -0,0 +1,405 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+import httpx
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+PAGE_SIZE = 500
+MAX_DEPTH = 6
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 1.0
+
+
+class ArcGISError(Exception):
+    pass
+
+
+class Tile(NamedTuple):
+    key: str
+    xmin: float
+    ymin: float
+    xmax: float
+    ymax: float
+
+    @property
+    def depth(self) -> int:
+        return len(self.key)
+
+    @property
+    def envelope(self) -> str:
+        return f"{self.xmin},{self.ymin},{self.xmax},{self.ymax}"
+
+    def children(self) -> list["Tile"]:
+        xmid = (self.xmin + self.xmax) / 2
+        ymid = (self.ymin + self.ymax) / 2
+        return [
+            Tile(self.key + "0", self.xmin, ymid, xmid, self.ymax),
+            Tile(self.key + "1", xmid, ymid, self.xmax, self.ymax),
+            Tile(self.key + "2", self.xmin, self.ymin, xmid, ymid),
+            Tile(self.key + "3", xmid, self.ymin, self.xmax, ymid),
+        ]
+
+
+def root_tile(bbox: dict) -> Tile:
+    return Tile("", bbox["xmin"], bbox["ymin"], bbox["xmax"], bbox["ymax"])
+
+
+class TileCheckpoint:
+    # One Parquet part per finished quadtree leaf, plus a marker for tiles that were
+    # split, so an interrupted run resumes without re-querying either. A checkpoint left
+    # by a download with another fingerprint (URLs, fields, bbox) is discarded.
+    def __init__(self, directory: Path, fingerprint: str | None = None):
+        self.directory = Path(directory)
+        if fingerprint is None:
+            return
+        marker = self.directory / "fingerprint"
+        if marker.exists() and marker.read_text() != fingerprint:
+            shutil.rmtree(self.directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        marker.write_text(fingerprint)
+
+    def _path(self, layer: str, tile: Tile, suffix: str) -> Path:
+        return self.directory / layer / f"q{tile.key}{suffix}"
+
+    def rows(self, layer: str, tile: Tile) -> int | None:
+        path = self._path(layer, tile, ".parquet")
+        if not path.exists():
+            return None
+        return pq.ParquetFile(path).metadata.num_rows
+
+    def save(self, layer: str, tile: Tile, table: pa.Table):
+        path = self._path(layer, tile, ".parquet")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp_path)
+        tmp_path.replace(path)
+
+    def parts(self, layer: str) -> list[Path]:
+        return sorted((self.directory / layer).glob("q*.parquet"))
+
+    def is_split(self, layer: str, tile: Tile) -> bool:
+        return self._path(layer, tile, ".split").exists()
+
+    def mark_split(self, layer: str, tile: Tile):
+        path = self._path(layer, tile, ".split")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
+class HostLimits:
+    # Bounded concurrency per host, shared by every layer and tile in a download
+    def __init__(self, per_host: int):
+        self.per_host = per_host
+        self._semaphores = {}
+
+    def __call__(self, url: str) -> asyncio.Semaphore:
+        host = httpx.URL(url).host
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[host]
+
+
+class LayerQuery(NamedTuple):
+    name: str
+    url: str
+    out_fields: str
+
+
+def _is_client_error(error: Exception) -> bool:
+    # A 4xx other than 429 (wrong URL, no permission) will not go away by retrying or splitting
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.status_code < 500
+        and error.response.status_code != 429
+    )
+
+
+async def fetch_json(
+    client: httpx.AsyncClient, url: str, params: dict, limits: HostLimits, retries: int = MAX_RETRIES
+) -> dict:
+    for attempt in range(retries + 1):
+        try:
+            async with limits(url):
+                response = await client.get(url, params=params)
+            if response.status_code >= 500 or response.status_code == 429:
+                raise httpx.HTTPStatusError(
+                    f"{response.status_code} from {url}", request=response.request, response=response
+                )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("error"):
+                raise ArcGISError(data["error"].get("message", "unknown error"))
+            return data
+        except (httpx.TransportError, httpx.HTTPStatusError, ArcGISError, ValueError) as e:
+            if _is_client_error(e):
+                raise
+            if attempt == retries:
+                raise
+            await asyncio.sleep(BACKOFF_SECONDS * 2**attempt * (0.5 + random.random()))
+
+
+def _query_params(layer: LayerQuery, tile: Tile, offset: int) -> dict:
+    return {
+        "geometry": tile.envelope,
+        "geometryType": "esriGeometryEnvelope",
+        "inSR": "4326",
+        "spatialRel": "esriSpatialRelIntersects",
+        "outFields": layer.out_fields,
+        "f": "json",
+        "resultOffset": offset,
+        "resultRecordCount": PAGE_SIZE,
+        "outSR": "4326",
+    }
+
+
+async def _page_tile(client, layer: LayerQuery, tile: Tile, limits) -> list:
+    # Last resort at maximum depth: walk the tile with resultOffset
+    features = []
+    offset = 0
+    while True:
+        data = await fetch_json(client, layer.url, _query_params(layer, tile, offset), limits)
+        page = data.get("features", [])
+        features.extend(page)
+        if len(page) < PAGE_SIZE and not data.get("exceededTransferLimit"):
+            return features
+        offset += len(page)
+        if not page:
+            return features
+
+
+async def fetch_tile(client, layer: LayerQuery, tile: Tile, limits, checkpoint: TileCheckpoint, encode, progress=None) -> int:
+    if checkpoint.is_split(layer.name, tile):
+        return await _fetch_children(client, layer, tile, limits, checkpoint, encode, progress)
+    cached = checkpoint.rows(layer.name, tile)
+    if cached is not None:
+        return cached
+
+    # A tile that can still be split gets one retry; splitting is the better recovery
+    can_split = tile.depth < MAX_DEPTH
+    try:
+        data = await fetch_json(
+            client, layer.url, _query_params(layer, tile, 0), limits, retries=1 if can_split else MAX_RETRIES
+        )
+        features = data.get("features", [])
+        truncated = data.get("exceededTransferLimit") or len(features) >= PAGE_SIZE
+    except (httpx.HTTPError, ArcGISError, ValueError) as e:
+        # Only transport errors, 5xx/429, ArcGIS errors and bad JSON can be a tile asking too much
+        if not can_split or _is_client_error(e):
+            raise
+        features, truncated = [], True
+
+    if truncated:
+        if not can_split:
+            features = await _page_tile(client, layer, tile, limits)
+        else:
+            checkpoint.mark_split(layer.name, tile)
+            return await _fetch_children(client, layer, tile, limits, checkpoint, encode, progress)
+
+    checkpoint.save(layer.name, tile, encode(layer.name, features))
+    if progress is not None:
+        progress(layer.name, tile, len(features))
+    return len(features)
+
+
+async def _fetch_children(client, layer, tile, limits, checkpoint, encode, progress) -> int:
+    counts = await asyncio.gather(
+        *(fetch_tile(client, layer, child, limits, checkpoint, encode, progress) for child in tile.children())
+    )
+    return sum(counts)
+
+
+def query_fingerprint(layers: list[LayerQuery], bbox: dict) -> str:
+    payload = json.dumps({"layers": [list(layer) for layer in layers], "bbox": bbox}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def download_layers(
+    layers: list[LayerQuery],
+    bbox: dict,
+    checkpoint_dir: Path,
+    encode,
+    concurrency: int = MAX_CONCURRENCY,
+    timeout: float = 120,
+    progress=None,
+) -> dict[str, int]:
+    checkpoint = TileCheckpoint(checkpoint_dir, query_fingerprint(layers, bbox))
+    limits = HostLimits(concurrency)
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        counts = await asyncio.gather(
+            *(fetch_tile(client, layer, root_tile(bbox), limits, checkpoint, encode, progress) for layer in layers)
+        )
+    return dict(zip((layer.name for layer in layers), counts))
+
+
+def merge_checkpoint(
+    checkpoint_dir: Path, layers: list[LayerQuery], output_path: Path, schema: pa.Schema, id_field: str = "OBJECTID"
+) -> dict[str, int]:
+    # Stream every tile part into one file, one part in memory at a time. Features
+    # crossing tile edges come back once per tile they intersect, so repeats are dropped.
+    checkpoint = TileCheckpoint(checkpoint_dir)
+    counts = {}
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for layer in layers:
+            seen = set()
+            counts[layer.name] = 0
+            for part in checkpoint.parts(layer.name):
+                table = pq.read_table(part, schema=schema)
+                keep = []
+                for i, fid in enumerate(table.column(id_field).to_pylist()):
+                    if fid is None or fid not in seen:
+                        keep.append(i)
+                        if fid is not None:
+                            seen.add(fid)
+                table = table.take(pa.array(keep, type=pa.int64()))
+                writer.write_table(table)
+                counts[layer.name] += table.num_rows
+    tmp_path.replace(output_path)
+    return counts
+
+
+def _flat_coords(parts: list) -> tuple[np.ndarray, np.ndarray]:
+    # All vertices of all rings/paths in one (n, 2) array plus each part's vertex count
+    counts = np.fromiter((len(p) for p in parts), dtype=np.int64, count=len(parts))
+    total = int(counts.sum())
+    flat = np.fromiter(
+        itertools.chain.from_iterable(itertools.chain.from_iterable(parts)), dtype=np.float64
+    )
+    if len(flat) == 2 * total:
+        return flat.reshape(-1, 2), counts
+    # Some vertices carry z/m values; drop them
+    arrays = [np.asarray(p, dtype=np.float64)[:, :2] for p in parts if len(p)]
+    return (np.concatenate(arrays) if arrays else np.empty((0, 2))), counts
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def _ring_signed_areas(coords: np.ndarray, ring_offsets: np.ndarray) -> np.ndarray:
+    if len(coords) < 2:
+        return np.zeros(len(ring_offsets) - 1)
+    x, y = coords[:, 0], coords[:, 1]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    # Zero the terms that bridge one ring's last vertex to the next ring's first
+    ends = ring_offsets[1:-1] - 1
+    cross[ends[(ends >= 0) & (ends < len(cross))]] = 0.0
+    starts = ring_offsets[:-1]
+    areas = np.zeros(len(starts))
+    non_empty = np.diff(ring_offsets) > 1
+    if non_empty.any():
+        sums = np.add.reduceat(cross, np.minimum(starts[non_empty], len(cross) - 1))
+        areas[non_empty] = sums / 2.0
+    return areas
+
+
+def _assign_holes(coords, ring_offsets, ring_owner, is_shell) -> np.ndarray:
+    # Each ring gets the index of the shell it belongs to. Features with one shell take
+    # every hole; otherwise a hole goes to the smallest shell containing its first vertex.
+    ring_ids = np.arange(len(is_shell))
+    parent = np.where(is_shell, ring_ids, -1)
+    shell_count = np.bincount(ring_owner[is_shell], minlength=ring_owner.max() + 1 if len(ring_owner) else 0)
+    first_shell = np.full(len(shell_count), -1)
+    shell_ids = ring_ids[is_shell]
+    first_shell[ring_owner[shell_ids][::-1]] = shell_ids[::-1]
+
+    holes = ring_ids[~is_shell]
+    single = shell_count[ring_owner[holes]] == 1
+    parent[holes[single]] = first_shell[ring_owner[holes[single]]]
+
+    ambiguous = holes[~single & (shell_count[ring_owner[holes]] > 1)]
+    if len(ambiguous):
+        rings = shapely.linearrings(coords, indices=np.repeat(ring_ids, np.diff(ring_offsets)))
+        shells = shapely.polygons(rings[shell_ids])
+        shell_lookup = dict(zip(shell_ids, shells))
+        for hole in ambiguous:
+            x, y = coords[ring_offsets[hole]]
+            candidates = [s for s in shell_ids[ring_owner[shell_ids] == ring_owner[hole]]
+                          if shapely.contains_xy(shell_lookup[s], x, y)]
+            if candidates:
+                parent[hole] = min(candidates, key=lambda s: shapely.area(shell_lookup[s]))
+
+    # Holes with no shell at all (bad winding) become shells of their own
+    orphans = parent < 0
+    parent[orphans] = ring_ids[orphans]
+    return parent
+
+
+def _polygons(geometries: list[dict]) -> np.ndarray:
+    rings = [ring for g in geometries for ring in g["rings"]]
+    ring_owner = np.repeat(np.arange(len(geometries)), [len(g["rings"]) for g in geometries])
+    coords, counts = _flat_coords(rings)
+    ring_offsets = _offsets(counts)
+
+    # Esri rings: clockwise (negative shoelace area) are shells, counter-clockwise are holes
+    areas = _ring_signed_areas(coords, ring_offsets)
+    is_shell = areas <= 0
+    parent = _assign_holes(coords, ring_offsets, ring_owner, is_shell)
+
+    # Order rings as (feature, shell, shell-before-holes) so they form ragged polygons
+    order = np.lexsort((~is_shell, parent, ring_owner[parent]))
+    new_offsets = _offsets(counts[order])
+    shift = np.repeat(ring_offsets[:-1][order] - new_offsets[:-1], counts[order])
+    coords = coords[np.arange(len(shift)) + shift]
+    ring_offsets = new_offsets
+
+    ordered_parent = parent[order]
+    starts_polygon = np.r_[True, ordered_parent[1:] != ordered_parent[:-1]]
+    polygon_offsets = np.flatnonzero(np.r_[starts_polygon, True]).astype(np.int64)
+    polygon_owner = ring_owner[ordered_parent[starts_polygon]]
+    geom_offsets = _offsets(np.bincount(polygon_owner, minlength=len(geometries)))
+
+    result = shapely.from_ragged_array(
+        shapely.GeometryType.MULTIPOLYGON, coords, (ring_offsets, polygon_offsets, geom_offsets)
+    )
+    return _single_parts(result)
+
+
+def _lines(geometries: list[dict]) -> np.ndarray:
+    paths = [path for g in geometries for path in g["paths"]]
+    coords, counts = _flat_coords(paths)
+    geom_offsets = _offsets(np.array([len(g["paths"]) for g in geometries], dtype=np.int64))
+    result = shapely.from_ragged_array(
+        shapely.GeometryType.MULTILINESTRING, coords, (_offsets(counts), geom_offsets)
+    )
+    return _single_parts(result)
+
+
+def _single_parts(geoms: np.ndarray) -> np.ndarray:
+    single = shapely.get_num_geometries(geoms) == 1
+    geoms[single] = shapely.get_geometry(geoms[single], 0)
+    return geoms
+
+
+def esri_to_shapely(geometries: list[dict | None]) -> np.ndarray:
+    # Converts a whole page of Esri JSON geometries (rings, paths or x/y) in a few array calls
+    result = np.full(len(geometries), None, dtype=object)
+    kinds = {"rings": [], "paths": [], "point": []}
+    for i, g in enumerate(geometries):
+        if not g:
+            continue
+        if g.get("rings"):
+            kinds["rings"].append(i)
+        elif g.get("paths"):
+            kinds["paths"].append(i)
+        elif g.get("x") is not None and g.get("y") is not None:
+            kinds["point"].append(i)
+
+    if kinds["rings"]:
+        result[kinds["rings"]] = _polygons([geometries[i] for i in kinds["rings"]])
+    if kinds["paths"]:
+        result[kinds["paths"]] = _lines([geometries[i] for i in kinds["paths"]])
+    if kinds["point"]:
+        points = [geometries[i] for i in kinds["point"]]
+        result[kinds["point"]] = shapely.points([p["x"] for p in points], [p["y"] for p in points])
+    return result
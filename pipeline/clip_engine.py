@@ -0,0 +1,117 @@
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from pipeline.geoparquet import geometry_column, geoparquet_schema
+from pipeline.partitions import QUADKEY, partition_path, quadkey_bounds, row_groups_within, row_quadkeys
+
+DEFAULT_BATCH_SIZE = 65_536
+
+
+def clip_batch(table: pa.Table, geom_col: str, boundary) -> pa.Table:
+    index = table.schema.get_field_index(geom_col)
+    wkb = table.column(index).to_numpy(zero_copy_only=False)
+    geoms = shapely.from_wkb(wkb)
+
+    # Tier 1: bbox fully inside the boundary -> keep as-is, no geometry work
+    bounds = shapely.bounds(geoms)
+    keep = shapely.contains_properly(boundary, shapely.box(*bounds.T))
+
+    # Tier 2: only features that touch the boundary at all are candidates
+    candidates = ~keep & ~shapely.is_missing(geoms)
+    candidates[candidates] = shapely.intersects(boundary, geoms[candidates])
+
+    # Tier 3: geometry containment, then real intersection for border crossers
+    crossing = candidates.copy()
+    crossing[crossing] = ~shapely.contains_properly(boundary, geoms[crossing])
+    if crossing.any():
+        clipped = shapely.intersection(geoms[crossing], boundary)
+        empty = shapely.is_empty(clipped)
+        wkb = wkb.copy()
+        wkb[crossing] = shapely.to_wkb(clipped)
+        candidates[np.flatnonzero(crossing)[empty]] = False
+        field = table.schema.field(index)
+        table = table.set_column(index, field, pa.array(wkb, type=field.type))
+
+    return table.filter(pa.array(keep | candidates))
+
+
+def clip_parquet(input_path: Path, output_path: Path, boundary, batch_size: int = DEFAULT_BATCH_SIZE):
+    source = pq.ParquetFile(input_path)
+    geom_col = geometry_column(source.schema_arrow)
+    schema = geoparquet_schema(source.schema_arrow)
+    shapely.prepare(boundary)
+
+    tmp_path = output_path.with_suffix(".parquet.tmp")
+    writer = None
+    rows_in = rows_out = 0
+    try:
+        for batch in source.iter_batches(batch_size=batch_size):
+            rows_in += batch.num_rows
+            clipped = clip_batch(pa.Table.from_batches([batch]), geom_col, boundary)
+            if clipped.num_rows == 0:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(clipped.replace_schema_metadata(schema.metadata))
+            rows_out += clipped.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if rows_out > 0:
+        tmp_path.replace(output_path)
+    return rows_in, rows_out
+
+
+def clip_parquet_partitioned(
+    input_path: Path, output_name: str, boundary, keys: set[str] | None = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> tuple[int, dict[str, tuple[Path, int]]]:
+    # Same clip, written as one file per quadkey partition. With keys, only those partitions
+    # are written and row groups whose bbox statistics miss them are never read.
+    source = pq.ParquetFile(input_path)
+    geom_col = geometry_column(source.schema_arrow)
+    schema = geoparquet_schema(source.schema_arrow)
+    shapely.prepare(boundary)
+
+    row_groups = None
+    if keys is not None:
+        corners = np.array([quadkey_bounds(key) for key in keys]).reshape(-1, 4)
+        extent = (*corners[:, :2].min(axis=0), *corners[:, 2:].max(axis=0))
+        row_groups = row_groups_within(source, extent)
+
+    writers = {}
+    rows = {}
+    rows_in = 0
+    try:
+        for batch in source.iter_batches(batch_size=batch_size, row_groups=row_groups):
+            rows_in += batch.num_rows
+            table = pa.Table.from_batches([batch])
+            # Keyed before clipping so a border crosser stays in the partition of its full extent
+            partitions = row_quadkeys(table, geom_col)
+            if keys is not None:
+                selected = np.isin(partitions, list(keys))
+                table, partitions = table.filter(pa.array(selected)), partitions[selected]
+            table = table.append_column("_partition", pa.array(partitions, type=pa.string()))
+            clipped = clip_batch(table, geom_col, boundary)
+            values = clipped.column("_partition").to_numpy(zero_copy_only=False)
+            clipped = clipped.drop_columns(["_partition"]).replace_schema_metadata(schema.metadata)
+            for value in np.unique(values):
+                if value not in writers:
+                    path = partition_path(output_name, QUADKEY, value, value)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    writers[value] = (path, pq.ParquetWriter(path.with_suffix(".parquet.tmp"), schema))
+                    rows[value] = 0
+                part = clipped.filter(pa.array(values == value))
+                writers[value][1].write_table(part)
+                rows[value] += part.num_rows
+    finally:
+        for _, writer in writers.values():
+            writer.close()
+
+    for path, _ in writers.values():
+        path.with_suffix(".parquet.tmp").replace(path)
+    return rows_in, {value: (path, rows[value]) for value, (path, _) in writers.items()}
@@ -0,0 +1,163 @@
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+from pipeline.utils import AGENCY_ACCESS_MAP, HUNT_POI_CATEGORIES, HUNT_RELEVANT_ROAD_CLASSES
+
+UNKNOWN_LAND_STATUS = "private_or_unknown"
+UNKNOWN_SURFACE = "unknown"
+
+
+def read_columns(path: Path, names: list[str]) -> pa.Table:
+    schema = pq.read_schema(path)
+    return pq.read_table(path, columns=[n for n in names if n in schema.names])
+
+
+def to_numpy(arr) -> np.ndarray:
+    return arr.to_numpy(zero_copy_only=False)
+
+
+def _combine(arr):
+    if isinstance(arr, pa.ChunkedArray):
+        return arr.combine_chunks() if arr.num_chunks else pa.array([], type=arr.type)
+    if isinstance(arr, pa.Array):
+        return arr
+    return pa.array(arr, from_pandas=True)
+
+
+def _is_string(arr) -> bool:
+    return pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)
+
+
+def _parse_json_objects(strings: pa.Array, fields: dict[str, pa.DataType]):
+    # Rows holding a JSON object are parsed in one pass; anything else is left to the caller.
+    trimmed = pc.utf8_ltrim_whitespace(strings)
+    is_object = pc.fill_null(pc.starts_with(trimmed, "{"), False)
+    positions = np.flatnonzero(to_numpy(is_object))
+    schema = pa.schema(fields)
+    if len(positions) == 0:
+        return is_object, pa.table({name: pa.nulls(0, type=t) for name, t in fields.items()}, schema=schema)
+
+    objects = to_numpy(strings.take(pa.array(positions)))
+    try:
+        parsed = pj.read_json(
+            io.BytesIO("\n".join(objects).encode()),
+            parse_options=pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore"),
+        )
+        if parsed.num_rows != len(objects):
+            raise ValueError("row count mismatch")
+    except (pa.ArrowInvalid, ValueError):
+        # Multi-line or malformed payloads: fall back to json.loads for this subset only
+        rows = []
+        for text in objects:
+            try:
+                value = json.loads(text)
+            except ValueError:
+                value = None
+            rows.append(value if isinstance(value, dict) else None)
+        mask = to_numpy(is_object).copy()
+        mask[positions[[r is None for r in rows]]] = False
+        is_object = pa.array(mask)
+        parsed = pa.Table.from_pylist([r for r in rows if r is not None], schema=schema)
+    return is_object, parsed
+
+
+def _scatter(base: pa.Array, mask: pa.Array, values: pa.Array) -> pa.Array:
+    if len(values) == 0:
+        return base
+    return pc.replace_with_mask(base, mask, values.cast(base.type))
+
+
+def primary_name(names) -> pa.Array:
+    names = _combine(names)
+    if pa.types.is_struct(names.type):
+        if names.type.get_field_index("primary") < 0:
+            return pa.nulls(len(names), type=pa.string())
+        return pc.struct_field(names, "primary").cast(pa.string())
+    if _is_string(names):
+        # JSON objects yield their "primary" key, other strings pass through unchanged
+        is_object, parsed = _parse_json_objects(names, {"primary": pa.string()})
+        return _scatter(names.cast(pa.string()), is_object, parsed.column("primary").combine_chunks())
+    return pa.nulls(len(names), type=pa.string())
+
+
+def first_surface(road_surface) -> pa.Array:
+    road_surface = _combine(road_surface)
+    if not pa.types.is_list(road_surface.type) and not pa.types.is_large_list(road_surface.type):
+        return pa.array([UNKNOWN_SURFACE] * len(road_surface), type=pa.string())
+    value_type = road_surface.type.value_type
+    if not pa.types.is_struct(value_type) or value_type.get_field_index("value") < 0:
+        return pa.array([UNKNOWN_SURFACE] * len(road_surface), type=pa.string())
+
+    has_first = pc.fill_null(pc.greater(pc.list_value_length(road_surface), 0), False)
+    non_empty = pc.if_else(has_first, road_surface, pa.scalar(None, road_surface.type))
+    value = pc.struct_field(pc.list_element(non_empty, 0), "value").cast(pa.string())
+    # An empty or missing list is "unknown"; a present first entry with a null value stays null
+    return pc.if_else(has_first, value, UNKNOWN_SURFACE)
+
+
+def hunt_relevant_class(classes, relevant=HUNT_RELEVANT_ROAD_CLASSES) -> pa.Array:
+    classes = _combine(classes)
+    if not _is_string(classes):
+        classes = classes.cast(pa.string())
+    value_set = pa.array(sorted(relevant), type=pa.string())
+    return pc.fill_null(pc.is_in(pc.utf8_lower(classes), value_set=value_set), False)
+
+
+def _category_text(categories: pa.Array) -> pa.Array:
+    if pa.types.is_struct(categories.type):
+        if categories.type.get_field_index("primary") >= 0:
+            primary = pc.struct_field(categories, "primary").cast(pa.string())
+        else:
+            primary = pa.nulls(len(categories), type=pa.string())
+        if categories.type.get_field_index("alternate") >= 0:
+            alternate = pc.binary_join(pc.struct_field(categories, "alternate"), " ")
+        else:
+            alternate = pa.nulls(len(categories), type=pa.string())
+        text = pc.binary_join_element_wise(pc.fill_null(primary, ""), pc.fill_null(alternate, ""), " ")
+        return pc.if_else(pc.is_valid(categories), text, pa.scalar(None, pa.string()))
+    if pa.types.is_list(categories.type) or pa.types.is_large_list(categories.type):
+        return pc.binary_join(categories.cast(pa.list_(pa.string())), " ")
+    if _is_string(categories):
+        categories = categories.cast(pa.string())
+        is_object, parsed = _parse_json_objects(
+            categories, {"primary": pa.string(), "alternate": pa.list_(pa.string())}
+        )
+        parsed_text = _category_text(pa.StructArray.from_arrays(
+            [parsed.column("primary").combine_chunks(), parsed.column("alternate").combine_chunks()],
+            names=["primary", "alternate"],
+        ))
+        return _scatter(categories, is_object, parsed_text)
+    return pa.nulls(len(categories), type=pa.string())
+
+
+def hunt_relevant_categories(categories, hunt_categories=HUNT_POI_CATEGORIES) -> pa.Array:
+    text = pc.utf8_lower(_category_text(_combine(categories)))
+    relevant = pa.array([False] * len(text), type=pa.bool_())
+    for hunt_cat in hunt_categories:
+        relevant = pc.or_(relevant, pc.fill_null(pc.match_substring(text, hunt_cat), False))
+    return relevant
+
+
+def hunt_category(categories, hunt_categories=HUNT_POI_CATEGORIES) -> pa.Array:
+    # The first hunt category each POI matches, null for none
+    text = pc.utf8_lower(_category_text(_combine(categories)))
+    category = pa.nulls(len(text), type=pa.string())
+    for hunt_cat in reversed(hunt_categories):
+        category = pc.if_else(pc.fill_null(pc.match_substring(text, hunt_cat), False), hunt_cat, category)
+    return category
+
+
+def land_status(codes, access_map=AGENCY_ACCESS_MAP) -> pa.Array:
+    codes = _combine(codes)
+    if not _is_string(codes):
+        codes = codes.cast(pa.string())
+    keys = pa.array(list(access_map.keys()), type=pa.string())
+    values = pa.array(list(access_map.values()), type=pa.string())
+    return pc.fill_null(values.take(pc.index_in(codes, value_set=keys)), UNKNOWN_LAND_STATUS)
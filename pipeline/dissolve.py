@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import shapely
+
+
+class ZoomBand(NamedTuple):
+    minzoom: int
+    maxzoom: int
+    # Simplification tolerance in degrees; 0 keeps full detail
+    tolerance: float
+
+
+def pixel_degrees(zoom: int) -> float:
+    # Width of one 256-pixel-tile screen pixel at zoom, in degrees of longitude
+    return 360 / (256 << zoom)
+
+
+def zoom_bands(bands: list[tuple[int, int]]) -> list[ZoomBand]:
+    # Each band is simplified to about a pixel at its highest zoom; the last keeps full detail
+    return [
+        ZoomBand(low, high, 0.0 if i == len(bands) - 1 else pixel_degrees(high))
+        for i, (low, high) in enumerate(bands)
+    ]
+
+
+def connected_components(count: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # Component label (its smallest member) of every node, by min-label hooking and pointer jumping
+    labels = np.arange(count)
+    while True:
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[left], labels[right])
+        np.minimum.at(hooked, labels[right], labels[left])
+        while not np.array_equal(hooked, hooked[hooked]):
+            hooked = hooked[hooked]
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def _union(geoms: np.ndarray) -> shapely.Geometry:
+    # Parcels cut from one coverage only share edges, which coverage union merges in linear time;
+    # anything else goes through GEOS's cascaded union
+    geoms = shapely.make_valid(geoms)
+    if shapely.coverage_is_valid(geoms):
+        return shapely.coverage_union_all(geoms)
+    return shapely.union_all(geoms)
+
+
+def dissolve(geoms: np.ndarray, keys: np.ndarray, workers: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    # Merges touching or overlapping polygons that share a key. Polygons are grouped into connected
+    # components with an STRtree, so every union only sees polygons that actually merge, and the
+    # components union in parallel. Returns (keys, polygons) with one row per resulting polygon.
+    groups = []
+    for key in np.unique(keys):
+        members = np.flatnonzero(keys == key)
+        left, right = shapely.STRtree(geoms[members]).query(geoms[members], predicate="intersects")
+        labels = connected_components(len(members), left, right)
+        order = np.argsort(labels, kind="stable")
+        starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+        groups += [(key, members[part]) for part in np.split(order, starts[1:])]
+    return union_groups(geoms, groups, workers)
+
+
+def union_groups(geoms: np.ndarray, groups: list[tuple], workers: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    # Unions the members of every (key, member rows) group, largest groups first and in parallel.
+    # Returns (keys, polygons) with one row per resulting polygon.
+    out_keys, out_geoms, tasks = [], [], []
+    for key, members in groups:
+        if len(members) == 1:
+            out_keys.append(key)
+            out_geoms.append(shapely.make_valid(geoms[members[0]]))
+        else:
+            tasks.append((key, geoms[members]))
+    # Largest components first so they do not end up running alone at the end
+    tasks.sort(key=lambda task: -len(task[1]))
+
+    jobs = [component for _, component in tasks]
+    if workers > 1 and jobs:
+        with ProcessPoolExecutor(workers) as pool:
+            # Most components are a handful of parcels; they go to the workers in batches
+            unions = list(pool.map(_union, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    else:
+        unions = [_union(component) for component in jobs]
+    out_keys += [key for key, _ in tasks]
+    out_geoms += unions
+
+    parts, index = polygon_parts(np.array(out_geoms, dtype=object))
+    return np.array(out_keys, dtype=object)[index], parts
+
+
+def polygon_parts(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Every polygon inside (multi)polygons and collections, with the position of its source geometry;
+    # stray lines and points that make_valid or union leave behind are dropped
+    parts, index = geoms, np.arange(len(geoms))
+    while True:
+        types = shapely.get_type_id(parts)
+        nested = types >= shapely.GeometryType.MULTIPOINT
+        if not nested.any():
+            polygonal = types == shapely.GeometryType.POLYGON
+            return parts[polygonal], index[polygonal]
+        exploded, source = shapely.get_parts(parts, return_index=True)
+        parts, index = exploded, index[source]
+
+
+def simplify_coverage(geoms: np.ndarray, tolerance: float) -> np.ndarray:
+    # Edges shared by neighbouring polygons are simplified once, so no gaps or overlaps open between
+    # them and no polygon disappears. Inputs that are not a clean coverage fall back to per-polygon
+    # topology-preserving simplification.
+    if tolerance <= 0:
+        return geoms
+    if shapely.coverage_is_valid(geoms):
+        return shapely.coverage_simplify(geoms, tolerance)
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
@@ -0,0 +1,187 @@
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+
+from pipeline.columns import UNKNOWN_LAND_STATUS, UNKNOWN_SURFACE
+from pipeline.geoparquet import geometry_column, geoparquet_schema
+from pipeline.utils import AGENCY_ACCESS_MAP, HUNT_POI_CATEGORIES, HUNT_RELEVANT_ROAD_CLASSES
+
+# The DuckDB counterparts of the columns.py extractors and the sjoin-based enrichment: every
+# expression mirrors its Arrow twin, null handling included, so both backends write the same rows
+SMA_ATTRIBUTES = ["ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME"]
+GMU_ATTRIBUTES = ["GMUNAME", "REG_NAME", "ACRES", "AGFDLink"]
+# Matches columns._parse_json_objects: strings starting with "{" that parse are JSON objects
+JSON_OBJECT = r"(regexp_matches({0}, '^\s*\{{') AND json_valid({0}))"
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def connect(threads: int, temp_dir: Path) -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.execute("INSTALL spatial; LOAD spatial;")
+    con.execute(f"SET threads = {max(threads, 1)}")
+    # Joins and sorts past the memory limit spill here instead of failing
+    con.execute(f"SET temp_directory = {literal(str(temp_dir))}")
+    # Rows are Hilbert-sorted afterwards, so scan order need not survive the parallel joins
+    con.execute("SET preserve_insertion_order = false")
+    # Geometry stays WKB bytes and is copied through untouched, as the Arrow path does
+    con.execute("SET enable_geoparquet_conversion = false")
+    return con
+
+
+def _struct_has(t: pa.DataType, field: str) -> bool:
+    return pa.types.is_struct(t) and t.get_field_index(field) >= 0
+
+
+def _is_string(t: pa.DataType) -> bool:
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+
+def _is_list(t: pa.DataType) -> bool:
+    return pa.types.is_list(t) or pa.types.is_large_list(t)
+
+
+def primary_name_sql(schema: pa.Schema, column: str = "names") -> str:
+    if column not in schema.names:
+        return "NULL::VARCHAR"
+    t, col = schema.field(column).type, quote(column)
+    if pa.types.is_struct(t):
+        return f"{col}.primary::VARCHAR" if _struct_has(t, "primary") else "NULL::VARCHAR"
+    if _is_string(t):
+        return f"CASE WHEN {JSON_OBJECT.format(col)} THEN json_extract_string({col}, '$.primary') ELSE {col} END"
+    return "NULL::VARCHAR"
+
+
+def first_surface_sql(schema: pa.Schema, column: str = "road_surface") -> str:
+    # An empty or missing list is "unknown"; a present first entry with a null value stays null
+    if column not in schema.names:
+        return literal(UNKNOWN_SURFACE)
+    t, col = schema.field(column).type, quote(column)
+    if not _is_list(t) or not _struct_has(t.value_type, "value"):
+        return literal(UNKNOWN_SURFACE)
+    return f"CASE WHEN len({col}) > 0 THEN {col}[1].value::VARCHAR ELSE {literal(UNKNOWN_SURFACE)} END"
+
+
+def hunt_relevant_class_sql(schema: pa.Schema, column: str = "class", relevant=HUNT_RELEVANT_ROAD_CLASSES) -> str:
+    if column not in schema.names:
+        return "false"
+    values = ", ".join(literal(c) for c in sorted(relevant))
+    return f"coalesce(lower({quote(column)}::VARCHAR) IN ({values}), false)"
+
+
+def land_status_sql(column: str | None, access_map=AGENCY_ACCESS_MAP) -> str:
+    if column is None:
+        return literal(UNKNOWN_LAND_STATUS)
+    cases = " ".join(f"WHEN {literal(code)} THEN {literal(status)}" for code, status in access_map.items())
+    return f"CASE {column}::VARCHAR {cases} ELSE {literal(UNKNOWN_LAND_STATUS)} END"
+
+
+def _joined_text(alternate: str) -> str:
+    # pc.binary_join yields null for a list holding a null; array_to_string would skip it
+    return f"CASE WHEN list_count({alternate}) = len({alternate}) THEN array_to_string({alternate}, ' ') END"
+
+
+def category_text_sql(schema: pa.Schema, column: str = "categories") -> str:
+    t, col = schema.field(column).type, quote(column)
+    if pa.types.is_struct(t):
+        primary = f"{col}.primary::VARCHAR" if _struct_has(t, "primary") else "NULL"
+        alternate = _joined_text(f"{col}.alternate") if _struct_has(t, "alternate") else "NULL"
+        return f"CASE WHEN {col} IS NOT NULL THEN coalesce({primary}, '') || ' ' || coalesce({alternate}, '') END"
+    if _is_list(t):
+        return _joined_text(f"{col}::VARCHAR[]")
+    if _is_string(t):
+        alternate = _joined_text(f"json_extract_string({col}, '$.alternate[*]')")
+        parsed = f"coalesce(json_extract_string({col}, '$.primary'), '') || ' ' || coalesce({alternate}, '')"
+        return f"CASE WHEN {JSON_OBJECT.format(col)} THEN {parsed} ELSE {col} END"
+    return "NULL::VARCHAR"
+
+
+def hunt_relevant_categories_sql(schema: pa.Schema, column: str = "categories", hunt_categories=HUNT_POI_CATEGORIES) -> str:
+    if column not in schema.names:
+        return "false"
+    text = f"lower({category_text_sql(schema, column)})"
+    return "(" + " OR ".join(f"coalesce(contains({text}, {literal(c)}), false)" for c in hunt_categories) + ")"
+
+
+def _source_columns(schema: pa.Schema) -> list[str]:
+    # Every input column but the geometry (re-appended last) and the bbox covering (rebuilt on write)
+    geom_col = geometry_column(schema)
+    return [f"src.{quote(n)}" for n in schema.names if n not in (geom_col, "bbox")]
+
+
+def road_sql(roads_path: Path, sma_path: Path, gmu_path: Path) -> str:
+    # Roads x SMA x GMU on each road's point on surface, LEFT joins like gpd.sjoin(how="left",
+    # predicate="within"): a point in overlapping polygons gets a row per polygon. DuckDB plans
+    # both as spatial joins probing an R-tree it builds over the polygon side.
+    schema = pq.read_schema(roads_path)
+    geom_col = quote(geometry_column(schema))
+    sma_schema = pq.read_schema(sma_path)
+    sma_columns = [c for c in SMA_ATTRIBUTES if c in sma_schema.names]
+    gmu_fields = set(pyogrio.read_info(gmu_path)["fields"])
+    gmu_columns = [c for c in GMU_ATTRIBUTES if c in gmu_fields]
+    agency = "sma.ADMIN_AGENCY_CODE" if "ADMIN_AGENCY_CODE" in sma_columns else None
+    selected = [
+        *_source_columns(schema),
+        *(f"sma.{quote(c)}" for c in sma_columns),
+        f"{land_status_sql(agency)} AS land_status",
+        *(f"units.{quote(c)}" for c in gmu_columns),
+        f"{hunt_relevant_class_sql(schema)} AS hunt_relevant",
+        f"{primary_name_sql(schema)} AS road_name",
+        f"{first_surface_sql(schema)} AS surface",
+        f"src.{geom_col}",
+    ]
+    return f"""
+        WITH src AS (
+            SELECT *, ST_PointOnSurface(ST_GeomFromWKB({geom_col})) AS _point
+            FROM read_parquet({literal(str(roads_path))})
+        ),
+        sma AS (
+            SELECT *, ST_GeomFromWKB({quote(geometry_column(sma_schema))}) AS _geom
+            FROM read_parquet({literal(str(sma_path))})
+        ),
+        units AS (SELECT *, geom::GEOMETRY AS _geom FROM ST_Read({literal(str(gmu_path))}))
+        SELECT {", ".join(selected)}
+        FROM src
+        LEFT JOIN sma ON ST_Within(src._point, sma._geom)
+        LEFT JOIN units ON ST_Within(src._point, units._geom)
+    """
+
+
+def poi_sql(places_path: Path) -> str:
+    schema = pq.read_schema(places_path)
+    selected = [*_source_columns(schema), "true AS hunt_relevant", f"{primary_name_sql(schema)} AS name"]
+    return f"""
+        SELECT {", ".join(selected)}, src.{quote(geometry_column(schema))}
+        FROM read_parquet({literal(str(places_path))}) AS src
+        WHERE {hunt_relevant_categories_sql(schema)}
+    """
+
+
+def water_sql(water_path: Path) -> str:
+    schema = pq.read_schema(water_path)
+    name = primary_name_sql(schema)
+    return f"""
+        SELECT {", ".join(_source_columns(schema))}, {name} AS name, src.{quote(geometry_column(schema))}
+        FROM read_parquet({literal(str(water_path))}) AS src
+        WHERE {name} IS NOT NULL
+    """
+
+
+def copy_geoparquet(con: duckdb.DuckDBPyConnection, sql: str, source_path: Path, output_path: Path) -> int:
+    # Parquet straight from DuckDB's parallel writer, carrying the source's GeoParquet metadata
+    geo = geoparquet_schema(pq.read_schema(source_path)).metadata[b"geo"].decode()
+    tmp_path = output_path.with_suffix(".parquet.tmp")
+    rows = con.execute(
+        f"COPY ({sql}) TO {literal(str(tmp_path))} (FORMAT PARQUET, COMPRESSION zstd, KV_METADATA {{geo: {literal(geo)}}})"
+    ).fetchone()[0]
+    tmp_path.replace(output_path)
+    return rows
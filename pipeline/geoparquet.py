@@ -0,0 +1,238 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from pipeline.utils import AZ_BBOX
+
+DEFAULT_GEOMETRY_COLUMN = "geometry"
+
+
+def wkb_geo_metadata(column: str = DEFAULT_GEOMETRY_COLUMN) -> dict:
+    # No "crs" key: GeoParquet then defaults to OGC:CRS84 (lon/lat WGS84)
+    return {
+        "version": "1.1.0",
+        "primary_column": column,
+        "columns": {column: {"encoding": "WKB", "geometry_types": []}},
+    }
+
+
+def geo_metadata(schema: pa.Schema) -> dict:
+    raw = (schema.metadata or {}).get(b"geo")
+    if raw is None:
+        return wkb_geo_metadata()
+    return json.loads(raw)
+
+
+def geometry_column(schema: pa.Schema) -> str:
+    geo = geo_metadata(schema)
+    name = geo["primary_column"]
+    encoding = geo["columns"][name].get("encoding", "WKB")
+    if encoding.upper() != "WKB":
+        raise ValueError(f"Unsupported geometry encoding {encoding!r} for column {name!r}")
+    return name
+
+
+def geoparquet_schema(schema: pa.Schema) -> pa.Schema:
+    # bbox, geometry_types and any pandas index metadata no longer hold once rows are dropped or cut
+    geo = geo_metadata(schema)
+    column = geo["columns"][geo["primary_column"]]
+    column.pop("bbox", None)
+    column["geometry_types"] = []
+    metadata = dict(schema.metadata or {})
+    metadata.pop(b"pandas", None)
+    metadata[b"geo"] = json.dumps(geo).encode()
+    return schema.with_metadata(metadata)
+
+
+BBOX_COLUMN = "bbox"
+BBOX_FIELDS = ("xmin", "ymin", "xmax", "ymax")
+BBOX_TYPE = pa.struct([(k, pa.float32()) for k in BBOX_FIELDS])
+HILBERT_EXTENT = (AZ_BBOX["xmin"], AZ_BBOX["ymin"], AZ_BBOX["xmax"], AZ_BBOX["ymax"])
+HILBERT_LEVEL = 16
+ROW_GROUP_BYTES = 16 << 20
+MIN_ROW_GROUP_ROWS = 5_000
+MAX_ROW_GROUP_ROWS = 200_000
+SORT_BUCKET_ROWS = 2_000_000
+CATEGORICAL_COLUMNS = [
+    "land_status", "surface", "class", "subtype", "subclass", "GMUNAME", "REG_NAME",
+    "AGFDLink", "ADMIN_AGENCY_CODE", "ADMIN_UNIT_NAME", "is_intermittent",
+]
+GEOMETRY_TYPE_NAMES = {
+    0: "Point", 1: "LineString", 3: "Polygon", 4: "MultiPoint",
+    5: "MultiLineString", 6: "MultiPolygon", 7: "GeometryCollection",
+}
+
+
+def hilbert_distance(bounds: np.ndarray, extent=HILBERT_EXTENT, level: int = HILBERT_LEVEL) -> np.ndarray:
+    # Position of each bbox center on a Hilbert curve over a fixed extent, so keys from
+    # separate batches and files order consistently. Missing geometries sort last.
+    n = 1 << level
+    xmin, ymin, xmax, ymax = extent
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2
+    missing = np.isnan(cx) | np.isnan(cy)
+    x = np.clip((np.nan_to_num(cx) - xmin) / (xmax - xmin) * (n - 1), 0, n - 1).astype(np.int64)
+    y = np.clip((np.nan_to_num(cy) - ymin) / (ymax - ymin) * (n - 1), 0, n - 1).astype(np.int64)
+
+    d = np.zeros(len(x), dtype=np.uint64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += np.uint64(s * s) * ((3 * rx.astype(np.uint64)) ^ ry.astype(np.uint64))
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    d[missing] = np.iinfo(np.uint64).max
+    return d
+
+
+def _geometry_info(wkb: np.ndarray) -> tuple[np.ndarray, np.ndarray, set[str]]:
+    geoms = shapely.from_wkb(wkb)
+    bounds = shapely.bounds(geoms)
+    type_ids = np.unique(shapely.get_type_id(geoms[~shapely.is_missing(geoms)]))
+    return hilbert_distance(bounds), bounds, {GEOMETRY_TYPE_NAMES[t] for t in type_ids if t in GEOMETRY_TYPE_NAMES}
+
+
+def _with_bbox(table: pa.Table, bounds: np.ndarray) -> pa.Table:
+    # float32 halves the covering's size; rounding outward keeps every box containing its geometry
+    missing = np.isnan(bounds[:, 0])
+    lower = bounds[:, :2].astype(np.float32)
+    lower = np.where(lower > bounds[:, :2], np.nextafter(lower, np.float32(-np.inf)), lower)
+    upper = bounds[:, 2:].astype(np.float32)
+    upper = np.where(upper < bounds[:, 2:], np.nextafter(upper, np.float32(np.inf)), upper)
+    bbox = pa.StructArray.from_arrays(
+        [pa.array(a) for a in (lower[:, 0], lower[:, 1], upper[:, 0], upper[:, 1])],
+        fields=list(BBOX_TYPE), mask=pa.array(missing),
+    )
+    if BBOX_COLUMN in table.column_names:
+        table = table.drop_columns([BBOX_COLUMN])
+    return table.append_column(pa.field(BBOX_COLUMN, BBOX_TYPE), bbox)
+
+
+def output_schema(schema: pa.Schema, geometry_types: set[str]) -> pa.Schema:
+    # GeoParquet 1.1 bbox covering: per-row-group min/max stats on bbox.* let readers skip row groups
+    schema = geoparquet_schema(schema)
+    geo = geo_metadata(schema)
+    column = geo["columns"][geo["primary_column"]]
+    column["geometry_types"] = sorted(geometry_types)
+    column["covering"] = {"bbox": {k: [BBOX_COLUMN, k] for k in BBOX_FIELDS}}
+    return schema.with_metadata({**schema.metadata, b"geo": json.dumps(geo).encode()})
+
+
+def row_group_rows(table: pa.Table) -> int:
+    row_bytes = max(table.nbytes // max(table.num_rows, 1), 1)
+    return int(np.clip(ROW_GROUP_BYTES // row_bytes, MIN_ROW_GROUP_ROWS, MAX_ROW_GROUP_ROWS))
+
+
+def _leaf_columns(schema: pa.Schema) -> list[str]:
+    names = []
+    for field in schema:
+        if pa.types.is_struct(field.type):
+            names += [f"{field.name}.{child.name}" for child in field.type]
+        else:
+            names.append(field.name)
+    return names
+
+
+def write_options(schema: pa.Schema) -> dict:
+    # Parquet dictionary pages for low-cardinality columns only; the Arrow type stays string
+    # because GDAL-based readers (QGIS, ogr2ogr) read Arrow dictionary columns as integer codes.
+    # Byte-stream-split lets zstd find the shared exponent bytes of neighbouring sorted boxes.
+    return {
+        "compression": "zstd",
+        "use_dictionary": [c for c in CATEGORICAL_COLUMNS if c in schema.names],
+        "column_encoding": {f"{BBOX_COLUMN}.{k}": "BYTE_STREAM_SPLIT" for k in BBOX_FIELDS},
+        # Min/max of WKB bytes is useless for filtering and bloats the footer
+        "write_statistics": [c for c in _leaf_columns(schema) if c != geometry_column(schema)],
+    }
+
+
+def geodataframe_table(gdf) -> pa.Table:
+    geom_col = gdf.geometry.name
+    table = pa.Table.from_pandas(pd.DataFrame(gdf.drop(columns=[geom_col])), preserve_index=False)
+    wkb = pa.array(shapely.to_wkb(gdf.geometry.values), type=pa.binary())
+    table = table.append_column(pa.field(geom_col, pa.binary()), wkb)
+    return table.replace_schema_metadata({b"geo": json.dumps(wkb_geo_metadata(geom_col)).encode()})
+
+
+def write_geoparquet(table: pa.Table, output_path: Path):
+    # Hilbert-sorted, bbox-covered, tuned row groups; written to a temp file then renamed
+    geom_col = geometry_column(table.schema)
+    keys, bounds, geometry_types = _geometry_info(table.column(geom_col).to_numpy(zero_copy_only=False))
+    order = np.argsort(keys, kind="stable")
+    table = _with_bbox(table, bounds).take(pa.array(order))
+    schema = output_schema(table.schema, geometry_types)
+
+    tmp_path = output_path.with_suffix(".parquet.tmp")
+    pq.write_table(
+        table.replace_schema_metadata(schema.metadata), tmp_path,
+        row_group_size=row_group_rows(table), **write_options(schema),
+    )
+    tmp_path.replace(output_path)
+
+
+def sort_geoparquet(input_path: Path, output_path: Path, bucket_rows: int = SORT_BUCKET_ROWS):
+    # External Hilbert sort with bounded memory: key every row, spill rows into key-range
+    # buckets of about bucket_rows each, then sort and append the buckets in order.
+    source = pq.ParquetFile(input_path)
+    if source.metadata.num_rows <= bucket_rows:
+        write_geoparquet(source.read(), output_path)
+        return
+    geom_col = geometry_column(source.schema_arrow)
+
+    keys, geometry_types = [], set()
+    for batch in source.iter_batches(columns=[geom_col]):
+        batch_keys, _, batch_types = _geometry_info(batch.column(0).to_numpy(zero_copy_only=False))
+        keys.append(batch_keys)
+        geometry_types |= batch_types
+    keys = np.concatenate(keys)
+    count = -(-len(keys) // bucket_rows)
+    edges = np.sort(keys)[np.arange(1, count) * len(keys) // count]
+    buckets = np.searchsorted(edges, keys, side="right")
+
+    bucket_dir = output_path.with_suffix(".buckets")
+    bucket_dir.mkdir(parents=True, exist_ok=True)
+    writers = {}
+    try:
+        offset = 0
+        for batch in source.iter_batches():
+            table = pa.Table.from_batches([batch])
+            table = table.append_column("_hilbert", pa.array(keys[offset:offset + table.num_rows]))
+            batch_buckets = buckets[offset:offset + table.num_rows]
+            offset += table.num_rows
+            for b in np.unique(batch_buckets):
+                if b not in writers:
+                    writers[b] = pq.ParquetWriter(bucket_dir / f"{b:05d}.parquet", table.schema)
+                writers[b].write_table(table.filter(pa.array(batch_buckets == b)))
+        for writer in writers.values():
+            writer.close()
+
+        tmp_path = output_path.with_suffix(".parquet.tmp")
+        writer = None
+        try:
+            for b in sorted(writers):
+                table = pq.read_table(bucket_dir / f"{b:05d}.parquet")
+                order = np.argsort(table.column("_hilbert").to_numpy(), kind="stable")
+                table = table.drop_columns(["_hilbert"]).take(pa.array(order))
+                bounds = shapely.bounds(shapely.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False)))
+                table = _with_bbox(table, bounds)
+                if writer is None:
+                    schema = output_schema(table.schema.with_metadata(source.schema_arrow.metadata), geometry_types)
+                    writer = pq.ParquetWriter(tmp_path, schema, **write_options(schema))
+                    group_rows = row_group_rows(table)
+                writer.write_table(table.cast(schema), row_group_size=group_rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        tmp_path.replace(output_path)
+    finally:
+        shutil.rmtree(bucket_dir, ignore_errors=True)
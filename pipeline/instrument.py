@@ -0,0 +1,227 @@
+import contextvars
+import cProfile
+import fcntl
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import resource
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline.utils import DATA_DIR
+
+REPORT_DIR = DATA_DIR / "reports"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+PROFILE_ENV = "PIPELINE_PROFILE"
+PROFILE_TOP = 25
+
+_current = contextvars.ContextVar("stage_record", default=None)
+
+
+def run_id() -> str:
+    # Shared through the environment so worker processes and tile jobs join the same report
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    return os.environ[RUN_ID_ENV]
+
+
+def enable_profiling():
+    os.environ[PROFILE_ENV] = "1"
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _proc_fields(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+
+
+def _io_bytes() -> tuple[int | None, int | None]:
+    # rchar/wchar count every read/write syscall (files, pipes and sockets), cache hits included
+    fields = _proc_fields("/proc/self/io")
+    if not fields:
+        return None, None
+    return int(fields["rchar"]), int(fields["wchar"])
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM so the next reading is this stage's peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes() -> int:
+    fields = _proc_fields("/proc/self/status")
+    if "VmHWM" in fields:
+        return int(fields["VmHWM"].split()[0]) * 1024
+    # Lifetime peak: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _append(record: dict):
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(record, sort_keys=True, default=str) + "\n"
+    with open(REPORT_DIR / f"{record['run_id']}.jsonl", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(line)
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _profile_summary(profiler: cProfile.Profile, name: str, record: dict):
+    profile_dir = REPORT_DIR / "profiles" / record["run_id"]
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    profile_path = profile_dir / f"{name}-{os.getpid()}.prof"
+    profiler.dump_stats(profile_path)
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({"function": f"{Path(filename).name}:{line}({func})", "calls": calls,
+                     "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)})
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    record["profile"] = {"path": str(profile_path), "top": rows[:PROFILE_TOP]}
+
+
+def stage(fn):
+    # Records wall/CPU time, peak RSS, I/O bytes and reported row counts for one stage call
+    name = fn.__name__
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs).arguments
+        # Scalar arguments tell repeated calls apart, e.g. clip_layer per layer
+        call_args = {k: v for k, v in bound.items() if isinstance(v, (str, int, float, bool))}
+        record = {"run_id": run_id(), "stage": name, "args": call_args, "pid": os.getpid(), "started_at": _now(),
+                  "rows_in": None, "rows_out": None, "steps": {}}
+        token = _current.set(record)
+        _reset_peak_rss()
+        read_before, written_before = _io_bytes()
+        cpu_before, children_before = time.process_time(), _children_cpu()
+        started = time.perf_counter()
+
+        profiler = None
+        if profiling_enabled():
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another stage in this process is already being profiled
+                profiler = None
+
+        status = "failed"
+        try:
+            result = fn(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            read_after, written_after = _io_bytes()
+            record.update(
+                status=status,
+                wall_seconds=round(time.perf_counter() - started, 3),
+                cpu_seconds=round(time.process_time() - cpu_before, 3),
+                children_cpu_seconds=round(_children_cpu() - children_before, 3),
+                peak_rss_bytes=_peak_rss_bytes(),
+                bytes_read=None if read_before is None else read_after - read_before,
+                bytes_written=None if written_before is None else written_after - written_before,
+            )
+            if profiler is not None:
+                _profile_summary(profiler, name, record)
+            _current.reset(token)
+            _append(record)
+
+    return wrapper
+
+
+def rows(rows_in: int | None = None, rows_out: int | None = None):
+    record = _current.get()
+    if record is None:
+        return
+    if rows_in is not None:
+        record["rows_in"] = (record["rows_in"] or 0) + int(rows_in)
+    if rows_out is not None:
+        record["rows_out"] = (record["rows_out"] or 0) + int(rows_out)
+
+
+@contextmanager
+def step(name: str):
+    # Wall time of a named sub-step, summed into the enclosing stage's record
+    record = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            steps = record["steps"]
+            steps[name] = round(steps.get(name, 0.0) + time.perf_counter() - started, 3)
+
+
+def _rss_bytes(usage) -> int:
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def wait(process: subprocess.Popen) -> int:
+    # Reaps a child with wait4 so its own peak RSS is kept in the current stage record;
+    # its CPU time already reaches children_cpu_seconds through RUSAGE_CHILDREN
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    record = _current.get()
+    if record is not None:
+        record["child_peak_rss_bytes"] = max(record.get("child_peak_rss_bytes", 0), _rss_bytes(usage))
+    return process.returncode
+
+
+def write_report(run: str | None = None) -> Path | None:
+    run = run or os.environ.get(RUN_ID_ENV)
+    records_path = REPORT_DIR / f"{run}.jsonl"
+    if not run or not records_path.exists():
+        return None
+    with open(records_path) as f:
+        records = sorted((json.loads(line) for line in f if line.strip()), key=lambda r: r["started_at"])
+
+    started = min(datetime.fromisoformat(r["started_at"]) for r in records)
+    finished = max(datetime.fromisoformat(r["started_at"]).timestamp() + r["wall_seconds"] for r in records)
+    report = {
+        "run_id": run,
+        "written_at": _now(),
+        "wall_seconds": round(finished - started.timestamp(), 3),
+        "cpu_seconds": round(sum(r["cpu_seconds"] + r["children_cpu_seconds"] for r in records), 3),
+        "failed": [r["stage"] for r in records if r["status"] != "ok"],
+        "stages": records,
+    }
+    report_path = REPORT_DIR / f"{run}.json"
+    tmp_path = report_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    tmp_path.replace(report_path)
+    return report_path
+
@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import shapely
+
+from pipeline.columns import UNKNOWN_LAND_STATUS
+from pipeline.dissolve import polygon_parts
+
+BOUNDS = ["xmin", "ymin", "xmax", "ymax"]
+
+
+class PolygonLayer(NamedTuple):
+    # Polygons of one layer in a memory-mapped Arrow IPC file. The tree indexes bounding boxes
+    # only; a polygon is parsed and prepared the first time a point falls in its box, so loading
+    # costs the same however detailed the polygons are.
+    tree: shapely.STRtree
+    table: pa.Table
+    area: np.ndarray
+    # Parsed, prepared polygons; None until first needed
+    geometries: np.ndarray
+
+
+def write_layer(path: Path, geoms: np.ndarray, attributes: pa.Table) -> int:
+    # One row per polygon part (tighter boxes than whole multipolygons), with its bounds, planar
+    # area, WKB and the attributes of its source row
+    parts, rows = polygon_parts(np.asarray(geoms, dtype=object))
+    bounds = shapely.bounds(parts)
+    table = attributes.take(pa.array(rows))
+    for i, name in enumerate(BOUNDS):
+        table = table.append_column(name, pa.array(bounds[:, i]))
+    table = table.append_column("area", pa.array(shapely.area(parts)))
+    table = table.append_column("geometry", pa.array(shapely.to_wkb(parts), type=pa.binary()))
+
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    tmp_path.replace(path)
+    return table.num_rows
+
+
+def load_layer(path: Path) -> PolygonLayer:
+    table = ipc.open_file(pa.memory_map(str(path))).read_all()
+    bounds = [table.column(name).to_numpy() for name in BOUNDS]
+    tree = shapely.STRtree(shapely.box(*bounds))
+    return PolygonLayer(tree, table, table.column("area").to_numpy(), np.full(table.num_rows, None, dtype=object))
+
+
+def _polygons(layer: PolygonLayer, rows: np.ndarray) -> np.ndarray:
+    missing = np.unique(rows[shapely.is_missing(layer.geometries[rows])])
+    if len(missing):
+        wkb = layer.table.column("geometry").take(pa.array(missing)).to_numpy(zero_copy_only=False)
+        polygons = shapely.from_wkb(wkb)
+        shapely.prepare(polygons)
+        layer.geometries[missing] = polygons
+    return layer.geometries[rows]
+
+
+def locate(layer: PolygonLayer, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    # Row of the polygon each point lies in (boundary included), or -1. Where polygons overlap,
+    # the smallest wins: the inholding rather than the forest around it.
+    points = shapely.points(lon, lat)
+    left, right = layer.tree.query(points, predicate="intersects")
+    hit = shapely.intersects_xy(_polygons(layer, right), lon[left], lat[left])
+    left, right = left[hit], right[hit]
+    order = np.lexsort((layer.area[right], left))
+    left, right = left[order], right[order]
+    first = np.r_[True, left[1:] != left[:-1]] if len(left) else np.zeros(0, dtype=bool)
+    rows = np.full(len(points), -1, dtype=np.int64)
+    rows[left[first]] = right[first]
+    return rows
+
+
+def layer_attributes(layer: PolygonLayer, rows: np.ndarray, columns: list[str]) -> pa.Table:
+    return layer.table.select(columns).take(pa.array(rows, mask=rows < 0))
+
+
+def lookup(sma: PolygonLayer, gmu: PolygonLayer, lon, lat) -> pa.Table:
+    # land_status, ADMIN_UNIT_NAME and GMUNAME under every (lon, lat); points on no agency's
+    # land are private or unknown
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    owners = layer_attributes(sma, locate(sma, lon, lat), ["land_status", "ADMIN_UNIT_NAME"])
+    units = layer_attributes(gmu, locate(gmu, lon, lat), ["GMUNAME"])
+    return pa.table({
+        "lon": lon,
+        "lat": lat,
+        "land_status": pc.fill_null(owners.column("land_status"), UNKNOWN_LAND_STATUS),
+        "ADMIN_UNIT_NAME": owners.column("ADMIN_UNIT_NAME"),
+        "GMUNAME": units.column("GMUNAME"),
+    })
@@ -0,0 +1,122 @@
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pyarrow.csv as pcsv
+from pipeline.lookup import PolygonLayer, load_layer, lookup
+from pipeline.route import coordinate
+from pipeline.utils import PROCESSED_DIR
+
+# Points accepted per request
+MAX_POINTS = 100_000
+
+
+def load_layers(directory: Path) -> tuple[PolygonLayer, PolygonLayer]:
+    return load_layer(directory / "lookup_sma.arrow"), load_layer(directory / "lookup_gmu.arrow")
+
+
+def make_handler(sma: PolygonLayer, gmu: PolygonLayer):
+    class LookupHandler(BaseHTTPRequestHandler):
+        # GET /lookup?points=LAT,LON;LAT,LON or POST /lookup with {"coordinates": [[lon, lat], ...]}
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/lookup":
+                return self._reply(404, {"error": "not found"})
+            try:
+                points = [coordinate(p) for p in parse_qs(url.query).get("points", [""])[0].split(";") if p]
+            except argparse.ArgumentTypeError as e:
+                return self._reply(400, {"error": str(e)})
+            self._lookup(points)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/lookup":
+                return self._reply(404, {"error": "not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                points = [(float(lon), float(lat)) for lon, lat in body["coordinates"]]
+            except (ValueError, KeyError, TypeError) as e:
+                return self._reply(400, {"error": f"expected {{\"coordinates\": [[lon, lat], ...]}}: {e}"})
+            self._lookup(points)
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self._cors()
+            self.end_headers()
+
+        def _lookup(self, points: list[tuple[float, float]]):
+            if not points:
+                return self._reply(400, {"error": "no points"})
+            if len(points) > MAX_POINTS:
+                return self._reply(413, {"error": f"at most {MAX_POINTS} points per request"})
+            lon, lat = zip(*points)
+            self._reply(200, {"results": lookup(sma, gmu, lon, lat).to_pylist()})
+
+        def _cors(self):
+            # The map frontend runs on another port during development
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type")
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self._cors()
+            self.end_headers()
+            self.wfile.write(body)
+
+    return LookupHandler
+
+
+def read_points(path: str) -> list[tuple[float, float]]:
+    # One LAT,LON per line; "-" reads standard input
+    lines = sys.stdin if path == "-" else open(path)
+    with lines:
+        return [coordinate(line.strip()) for line in lines if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Land status, land unit and hunt unit at any coordinates")
+    parser.add_argument("--index", type=Path, default=PROCESSED_DIR, help="Directory holding lookup_*.arrow")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="Look points up and print CSV")
+    query.add_argument("points", nargs="*", type=coordinate, help="LAT,LON")
+    query.add_argument("--file", help="File with one LAT,LON per line, or - for standard input")
+    serve = commands.add_parser("serve", help="Answer lookups over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if not (args.index / "lookup_sma.arrow").exists():
+        parser.error(f"No lookup index in {args.index}; run the prepare_lookup_index stage first")
+
+    started = time.perf_counter()
+    sma, gmu = load_layers(args.index)
+    loaded = (time.perf_counter() - started) * 1000
+    print(f"Loaded {sma.table.num_rows} SMA and {gmu.table.num_rows} hunt unit polygons in {loaded:.0f} ms", file=sys.stderr)
+
+    if args.command == "serve":
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(sma, gmu))
+        print(f"Serving lookups on http://{args.host}:{args.port}/lookup", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    points = args.points + (read_points(args.file) if args.file else [])
+    if not points:
+        parser.error("give points as LAT,LON arguments or with --file")
+    lon, lat = zip(*points)
+    table = lookup(sma, gmu, lon, lat)
+    pcsv.write_csv(table.select(["lat", "lon", "land_status", "ADMIN_UNIT_NAME", "GMUNAME"]), sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import fcntl
+import hashlib
+import inspect
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pipeline.utils import DATA_DIR
+
+MANIFEST_PATH = DATA_DIR / "manifest.json"
+PROJECT_DIR = DATA_DIR.parent
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _locked():
+    # Stages may run in parallel threads and processes; both must serialize manifest updates
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with _lock, open(MANIFEST_PATH.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _key(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return str(path.relative_to(PROJECT_DIR.resolve()))
+    except ValueError:
+        return str(path)
+
+
+def _load() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {"version": 1, "artifacts": {}, "files": {}}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def _save(manifest: dict):
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(MANIFEST_PATH)
+
+
+def _stat(path: Path) -> dict:
+    st = Path(path).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_digest(path: Path, manifest: dict | None = None) -> str:
+    # Content hash, reused while size and mtime are unchanged so large inputs are hashed once
+    path = Path(path)
+    cache = manifest["files"] if manifest is not None else {}
+    stat = _stat(path)
+    cached = cache.get(_key(path))
+    if cached and cached["size"] == stat["size"] and cached["mtime_ns"] == stat["mtime_ns"]:
+        return cached["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    cache[_key(path)] = {**stat, "sha256": digest}
+    return digest
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def params_digest(params: dict | None) -> str:
+    payload = json.dumps(params or {}, sort_keys=True, default=_json_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def code_digest(code) -> str:
+    # Functions contribute their own source; paths contribute the whole file
+    h = hashlib.sha256()
+    for item in code:
+        if callable(item):
+            # Keyed by file, not __module__, which is "__main__" when a stage script runs directly
+            h.update(f"{_key(inspect.getsourcefile(item))}:{item.__qualname__}".encode())
+            h.update(inspect.getsource(item).encode())
+        else:
+            h.update(_key(item).encode())
+            h.update(Path(item).read_bytes())
+    return h.hexdigest()
+
+
+def fingerprint(inputs=(), params=None, code=(), manifest: dict | None = None) -> dict:
+    missing = [str(p) for p in inputs if not Path(p).exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing stage inputs: {', '.join(missing)}")
+    return {
+        "inputs": {_key(p): file_digest(p, manifest) for p in inputs},
+        "params": params_digest(params),
+        "code": code_digest(code),
+    }
+
+
+def is_fresh(output: Path, inputs=(), params=None, code=()) -> bool:
+    output = Path(output)
+    if not output.exists() or any(not Path(p).exists() for p in inputs):
+        return False
+    with _locked():
+        manifest = _load()
+        entry = manifest["artifacts"].get(_key(output))
+        if entry is None or entry.get("output") != _stat(output):
+            return False
+        current = fingerprint(inputs, params, code, manifest)
+        _save(manifest)
+    return all(entry.get(k) == v for k, v in current.items())
+
+
+def record(output: Path, inputs=(), params=None, code=()):
+    output = Path(output)
+    with _locked():
+        manifest = _load()
+        entry = fingerprint(inputs, params, code, manifest)
+        entry["output"] = _stat(output)
+        entry["recorded_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        manifest["artifacts"][_key(output)] = entry
+        _save(manifest)
+
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pipeline.utils import HUNT_POI_CATEGORIES
+
+
+class ThemeQuery(NamedTuple):
+    name: str
+    dataset: str
+    columns: list[str]
+    filters: list[str]
+
+
+class ReleaseDiff(NamedTuple):
+    added: pa.Array
+    geometry: pa.Array
+    attributes: pa.Array
+    removed: pa.Array
+
+
+def category_filter(categories: list[str]) -> str:
+    # Same test as columns.hunt_relevant_categories: substring match on primary + alternates
+    text = "lower(concat_ws(' ', categories.primary, array_to_string(categories.alternate, ' ')))"
+    matches = " OR ".join(f"contains({text}, '{c.lower()}')" for c in categories)
+    return f"({matches})"
+
+
+def bbox_filter(bbox: dict) -> str:
+    return (
+        f"bbox.xmin >= {bbox['xmin']} AND bbox.xmax <= {bbox['xmax']} "
+        f"AND bbox.ymin >= {bbox['ymin']} AND bbox.ymax <= {bbox['ymax']}"
+    )
+
+
+# Roads are not filtered by class: every segment is drawn, hunt relevance is only a flag
+THEMES = [
+    ThemeQuery(
+        "transportation",
+        "theme=transportation/type=segment",
+        [
+            "id", "geometry", "subtype", "class", "subclass", "names", "road_surface", "road_flags",
+            "access_restrictions", "connectors",
+        ],
+        [],
+    ),
+    ThemeQuery(
+        "places",
+        "theme=places/type=place",
+        ["id", "geometry", "names", "categories", "confidence"],
+        [category_filter(HUNT_POI_CATEGORIES)],
+    ),
+    ThemeQuery(
+        "water",
+        "theme=base/type=water",
+        ["id", "geometry", "names", "subtype", "class", "is_intermittent"],
+        ["names.primary IS NOT NULL"],
+    ),
+]
+
+
+def connect(source: str) -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.execute("INSTALL spatial; LOAD spatial;")
+    if source.startswith("s3://"):
+        con.execute("INSTALL httpfs; LOAD httpfs;")
+        con.execute("SET s3_region = 'us-west-2';")
+    return con
+
+
+def theme_sql(theme: ThemeQuery, source: str, bbox: dict) -> str:
+    where = " AND ".join([bbox_filter(bbox), *theme.filters])
+    return f"""
+        SELECT {', '.join(theme.columns)}
+        FROM read_parquet('{source}/{theme.dataset}/*', hive_partitioning=true)
+        WHERE {where}
+    """
+
+
+def extract_theme(con: duckdb.DuckDBPyConnection, theme: ThemeQuery, source: str, output_path: Path, bbox: dict) -> int:
+    tmp_path = output_path.with_suffix(".parquet.tmp")
+    cursor = con.cursor()
+    try:
+        rows = cursor.execute(
+            f"COPY ({theme_sql(theme, source, bbox)}) TO '{tmp_path}' (FORMAT PARQUET)"
+        ).fetchone()[0]
+    finally:
+        cursor.close()
+    tmp_path.replace(output_path)
+    return rows
+
+
+def extract_themes(con: duckdb.DuckDBPyConnection, jobs: list[tuple[ThemeQuery, Path]], source: str, bbox: dict):
+    # Themes scan concurrently on cursors of one connection; yields as each one lands
+    with ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as pool:
+        futures = {
+            pool.submit(extract_theme, con, theme, source, output_path, bbox): (theme, output_path)
+            for theme, output_path in jobs
+        }
+        for future in as_completed(futures):
+            theme, output_path = futures[future]
+            yield theme, output_path, future.result()
+
+
+def diff_sql(theme: ThemeQuery, old_path: Path, new_path: Path) -> str:
+    # Features are matched by Overture id; a geometry or attribute hash that differs marks a change
+    attributes = ", ".join(f'"{c}"' for c in theme.columns if c not in ("id", "geometry"))
+    hashes = f'id, hash(geometry) AS geometry_hash, hash({attributes}) AS attribute_hash'
+    return f"""
+        WITH old AS (SELECT {hashes} FROM read_parquet('{old_path}')),
+             new AS (SELECT {hashes} FROM read_parquet('{new_path}'))
+        SELECT
+            coalesce(new.id, old.id) AS id,
+            CASE
+                WHEN old.id IS NULL THEN 'added'
+                WHEN new.id IS NULL THEN 'removed'
+                WHEN old.geometry_hash <> new.geometry_hash THEN 'geometry'
+                ELSE 'attributes'
+            END AS change
+        FROM old FULL OUTER JOIN new ON old.id = new.id
+        WHERE old.id IS NULL OR new.id IS NULL
+            OR old.geometry_hash <> new.geometry_hash OR old.attribute_hash <> new.attribute_hash
+    """
+
+
+def diff_theme(con: duckdb.DuckDBPyConnection, theme: ThemeQuery, old_path: Path, new_path: Path) -> ReleaseDiff:
+    changes = con.execute(diff_sql(theme, old_path, new_path)).fetch_arrow_table()
+    ids = {
+        kind: pc.filter(changes["id"], pc.equal(changes["change"], kind)).combine_chunks()
+        for kind in ReleaseDiff._fields
+    }
+    return ReleaseDiff(**ids)
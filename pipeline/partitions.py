@@ -0,0 +1,298 @@
+import argparse
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple
+from urllib.parse import quote, unquote
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from pipeline.geoparquet import BBOX_COLUMN, BBOX_FIELDS, geometry_column, write_geoparquet
+from pipeline.manifest import is_fresh, record
+from pipeline.utils import PROCESSED_DIR, RAW_DIR
+
+# Zoom-8 web-mercator tiles split Arizona into ~30 partitions about 130 km on a side
+PARTITION_ZOOM = 8
+QUADKEY = "quadkey"
+UNIT = "GMUNAME"
+PARTITION_KEYS = [QUADKEY, UNIT]
+# Same name pyarrow and Spark use for a null hive partition value
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+SUCCESS_MARKER = "_SUCCESS"
+MAX_LATITUDE = 85.05112878
+
+
+class Area(NamedTuple):
+    units: set[str]
+    geometry: shapely.Geometry
+    quadkeys: set[str]
+
+
+def tile_coordinates(lon, lat, zoom: int):
+    # Fractional web-mercator tile coordinates; the integer part is the tile
+    n = 1 << zoom
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    return (np.asarray(lon) + 180) / 360 * n, (1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n
+
+
+def _tile_xy(lon, lat, zoom: int):
+    n = 1 << zoom
+    x, y = tile_coordinates(lon, lat, zoom)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, zoom: int):
+    n = 1 << zoom
+    west, east = x / n * 360 - 180, (x + 1) / n * 360 - 180
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def _quadkey_strings(x, y, zoom: int) -> np.ndarray:
+    codes = np.zeros(len(x), dtype=np.int64)
+    for bit in range(zoom - 1, -1, -1):
+        codes = codes * 4 + ((x >> bit) & 1) + 2 * ((y >> bit) & 1)
+    unique, inverse = np.unique(codes, return_inverse=True)
+    names = np.array([np.base_repr(code, 4).zfill(zoom) for code in unique], dtype=object)
+    return names[inverse]
+
+
+def quadkeys(bounds: np.ndarray, zoom: int = PARTITION_ZOOM) -> np.ndarray:
+    # Tile holding each bbox center, so a feature lands in exactly one partition
+    lon = (bounds[:, 0] + bounds[:, 2]) / 2
+    lat = (bounds[:, 1] + bounds[:, 3]) / 2
+    missing = np.isnan(lon) | np.isnan(lat)
+    keys = _quadkey_strings(*_tile_xy(np.nan_to_num(lon), np.nan_to_num(lat), zoom), zoom)
+    keys[missing] = NULL_PARTITION
+    return keys
+
+
+def row_quadkeys(table: pa.Table, geom_col: str, zoom: int = PARTITION_ZOOM) -> np.ndarray:
+    geoms = shapely.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False))
+    return quadkeys(shapely.bounds(geoms), zoom)
+
+
+def quadkey_bounds(key: str) -> tuple[float, float, float, float]:
+    x = y = 0
+    for digit in map(int, key):
+        x, y = x * 2 + (digit & 1), y * 2 + (digit >> 1)
+    return tile_bounds(x, y, len(key))
+
+
+def covering_quadkeys(geometry, zoom: int = PARTITION_ZOOM) -> set[str]:
+    xmin, ymin, xmax, ymax = geometry.bounds
+    (x0, x1), (y1, y0) = _tile_xy([xmin, xmax], [ymin, ymax], zoom)
+    xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    xs, ys = xs.ravel(), ys.ravel()
+    tiles = shapely.box(*tile_bounds(xs, ys, zoom))
+    hit = shapely.intersects(geometry, tiles)
+    return set(_quadkey_strings(xs[hit], ys[hit], zoom))
+
+
+def area(region: str | None = None, unit: str | None = None) -> Area | None:
+    # Hunt units selected by AZGFD region and/or unit name, and the partitions they reach.
+    # Partitions are keyed by bbox center, so a feature straddling a tile edge near the
+    # area is only included if its center tile touches the area.
+    if not region and not unit:
+        return None
+    import geopandas as gpd
+
+    gmus = gpd.read_file(RAW_DIR / "azgfd_gmu.geojson").to_crs("EPSG:4326")
+    selected = np.ones(len(gmus), dtype=bool)
+    for column, value in (("REG_NAME", region), ("GMUNAME", unit)):
+        if value:
+            selected &= gmus[column].astype(str).str.casefold().to_numpy() == value.casefold()
+    if not selected.any():
+        raise ValueError(f"No hunt units match region={region!r} unit={unit!r}")
+    geometry = shapely.union_all(gmus.geometry.to_numpy()[selected])
+    units = set(gmus["GMUNAME"].astype(str).to_numpy()[selected])
+    return Area(units, geometry, covering_quadkeys(geometry))
+
+
+def row_groups_within(source: pq.ParquetFile, bounds) -> list[int]:
+    # Row groups whose bbox.* statistics cannot reach bounds are skipped; without statistics all are read
+    meta = source.metadata
+    paths = {meta.schema.column(i).path: i for i in range(meta.num_columns)}
+    columns = [paths.get(f"{BBOX_COLUMN}.{k}") for k in BBOX_FIELDS]
+    groups = list(range(meta.num_row_groups))
+    if None in columns:
+        return groups
+    xmin, ymin, xmax, ymax = bounds
+    keep = []
+    for group in groups:
+        stats = [meta.row_group(group).column(c).statistics for c in columns]
+        if any(s is None or not s.has_min_max for s in stats):
+            keep.append(group)
+        elif stats[0].min <= xmax and stats[2].max >= xmin and stats[1].min <= ymax and stats[3].max >= ymin:
+            keep.append(group)
+    return keep
+
+
+def partition_path(name: str, key: str, value: str, source_key: str) -> Path:
+    # <layer>/<key>=<value>/part-<quadkey>.parquet: each file holds the rows of one source quadkey.
+    # GMUNAME partitions keep their GMUNAME column so every file stands alone for tippecanoe;
+    # read those as plain files (partitioning=None), not as a hive dataset.
+    return PROCESSED_DIR / name / f"{key}={quote(value, safe='')}" / f"part-{source_key}.parquet"
+
+
+def partition_files(name: str, selected: Area | None = None) -> list[Path]:
+    files = []
+    for directory in sorted((PROCESSED_DIR / name).glob("*=*")):
+        key, _, value = directory.name.partition("=")
+        value = unquote(value)
+        if selected is not None:
+            if key == QUADKEY and value not in selected.quadkeys:
+                continue
+            if key == UNIT and value not in selected.units:
+                continue
+        files += sorted(directory.glob("part-*.parquet"))
+    return files
+
+
+def source_partitions(name: str, selected: Area | None = None) -> dict[str, Path]:
+    return {path.stem.removeprefix("part-"): path for path in partition_files(name, selected)}
+
+
+def remove_partitions(name: str):
+    # A layer has one layout at a time; a monolithic write drops a stale partitioned copy
+    shutil.rmtree(PROCESSED_DIR / name, ignore_errors=True)
+
+
+def _remove_outputs(name: str, source_key: str):
+    for path in (PROCESSED_DIR / name).glob(f"*=*/part-{source_key}.parquet"):
+        path.unlink()
+
+
+def prune_partitions(name: str):
+    # Only once no worker is writing: another may be about to fill a directory that looks empty
+    for directory in (PROCESSED_DIR / name).glob("*=*"):
+        if not any(directory.iterdir()):
+            directory.rmdir()
+
+
+def outputs_for(name: str, source_key: str) -> list[Path]:
+    return sorted((PROCESSED_DIR / name).glob(f"*=*/part-{source_key}.parquet"))
+
+
+def write_outputs(table: pa.Table, name: str, key: str, source_key: str) -> list[Path]:
+    _remove_outputs(name, source_key)
+    if key == QUADKEY:
+        # Written even when empty, so the manifest can tell a partition with no rows is up to date
+        path = partition_path(name, key, source_key, source_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_geoparquet(table, path)
+        return [path]
+    values = table.column(key).to_numpy(zero_copy_only=False).astype(object)
+    values[[v is None for v in values]] = NULL_PARTITION
+    values = values.astype(str)
+    paths = []
+    for value in np.unique(values):
+        path = partition_path(name, key, value, source_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_geoparquet(table.filter(pa.array(values == value)), path)
+        paths.append(path)
+    return paths
+
+
+def _init_worker(initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_partition(fn, source_key: str, input_path: Path, output_name: str, key: str, stage: dict):
+    table = pq.read_table(input_path)
+    result = fn(table, geometry_column(table.schema))
+    outputs = write_outputs(result, output_name, key, source_key)
+    for output in outputs:
+        record(output, **{**stage, "inputs": [input_path, *stage.get("inputs", [])]})
+    return table.num_rows, result.num_rows
+
+
+def run_partitions(
+    fn: Callable,
+    input_name: str,
+    output_name: str,
+    stage: dict,
+    key: str = QUADKEY,
+    selected: Area | None = None,
+    workers: int = 1,
+    initializer: Callable | None = None,
+    initargs: tuple = (),
+) -> tuple[int, int, int]:
+    # Applies fn(table, geom_col) to every input partition independently, in worker processes.
+    # Outputs are tracked per source partition, so only partitions whose input, parameters
+    # or code changed are rebuilt. Returns (partitions run, rows in, rows out).
+    inputs = source_partitions(input_name, selected)
+    stage = {**stage, "params": {**stage.get("params", {}), "partition_key": key, "zoom": PARTITION_ZOOM}}
+
+    (PROCESSED_DIR / f"{output_name}.parquet").unlink(missing_ok=True)
+    root = PROCESSED_DIR / output_name
+    for directory in root.glob("*=*"):
+        if directory.name.partition("=")[0] != key:
+            shutil.rmtree(directory)
+    if selected is None:
+        # Outputs of source partitions that no longer exist
+        for path in root.glob("*=*/part-*.parquet"):
+            if path.stem.removeprefix("part-") not in inputs:
+                _remove_outputs(output_name, path.stem.removeprefix("part-"))
+        prune_partitions(output_name)
+
+    pending = []
+    for source_key, input_path in inputs.items():
+        outputs = outputs_for(output_name, source_key)
+        partition_stage = {**stage, "inputs": [input_path, *stage.get("inputs", [])]}
+        if not outputs or not all(is_fresh(o, **partition_stage) for o in outputs):
+            pending.append((source_key, input_path))
+    print(f"  {len(pending)} of {len(inputs)} partitions to rebuild")
+    if not pending:
+        return 0, 0, 0
+
+    args = [(fn, source_key, path, output_name, key, stage) for source_key, path in pending]
+    pool = None
+    if workers > 1 and len(pending) > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)), initializer=_init_worker, initargs=(initializer, initargs)
+        )
+        results = pool.map(_run_partition, *zip(*args))
+    else:
+        _init_worker(initializer, initargs)
+        results = (_run_partition(*arg) for arg in args)
+
+    rows_in = rows_out = 0
+    try:
+        for (source_key, _), (partition_in, partition_out) in zip(pending, results):
+            rows_in += partition_in
+            rows_out += partition_out
+            print(f"    {source_key}: {partition_in} -> {partition_out}")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        prune_partitions(output_name)
+    return len(pending), rows_in, rows_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the partition files of a processed layer")
+    parser.add_argument("command", choices=["files"])
+    parser.add_argument("layer", help="Processed layer name, e.g. roads_enriched")
+    parser.add_argument("--region", help="Only partitions reaching this AZGFD region")
+    parser.add_argument("--unit", help="Only partitions reaching this hunt unit (GMUNAME)")
+    args = parser.parse_args()
+
+    try:
+        selected = area(args.region, args.unit)
+    except ValueError as e:
+        parser.error(str(e))
+    for path in partition_files(args.layer, selected):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import gzip
+import hashlib
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+# PMTiles v3: https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+MAGIC = b"PMTiles"
+VERSION = 3
+HEADER_FORMAT = struct.Struct("<7sB11Q6B4iB2i")
+# The header and root directory must fit in the first 16 KiB so clients need one request
+ROOT_DIR_LIMIT = 16_384 - HEADER_FORMAT.size
+LEAF_SIZE = 4_096
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+TILE_TYPE_MVT = 1
+TILE_TYPE_PNG = 2
+TILE_TYPE_JPEG = 3
+TILE_TYPE_WEBP = 4
+
+
+class Header(NamedTuple):
+    root_offset: int = 0
+    root_length: int = 0
+    metadata_offset: int = 0
+    metadata_length: int = 0
+    leaf_offset: int = 0
+    leaf_length: int = 0
+    data_offset: int = 0
+    data_length: int = 0
+    addressed_tiles: int = 0
+    tile_entries: int = 0
+    tile_contents: int = 0
+    clustered: int = 1
+    internal_compression: int = COMPRESSION_GZIP
+    tile_compression: int = COMPRESSION_GZIP
+    tile_type: int = TILE_TYPE_MVT
+    min_zoom: int = 0
+    max_zoom: int = 0
+    min_lon_e7: int = 0
+    min_lat_e7: int = 0
+    max_lon_e7: int = 0
+    max_lat_e7: int = 0
+    center_zoom: int = 0
+    center_lon_e7: int = 0
+    center_lat_e7: int = 0
+
+
+class Entry(NamedTuple):
+    tile_id: int
+    offset: int
+    length: int
+    # 0 marks a pointer to a leaf directory
+    run_length: int
+
+
+def tile_ids(zoom: int, x, y) -> np.ndarray:
+    # Tiles of all lower zooms come first, then this zoom's tiles along a Hilbert curve
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    n = 1 << zoom
+    d = np.zeros(x.shape, dtype=np.uint64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += np.uint64(s * s) * ((3 * rx.astype(np.uint64)) ^ ry.astype(np.uint64))
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return np.uint64(((1 << (2 * zoom)) - 1) // 3) + d
+
+
+def _compress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_GZIP:
+        return gzip.compress(data, mtime=0)
+    if compression == COMPRESSION_NONE:
+        return data
+    raise ValueError(f"Unsupported PMTiles internal compression {compression}")
+
+
+def _decompress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(data)
+    if compression == COMPRESSION_NONE:
+        return data
+    raise ValueError(f"Unsupported PMTiles internal compression {compression}")
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def serialize_directory(entries: list[Entry]) -> bytes:
+    # Columns of varints: id deltas, run lengths, lengths, then offsets where 0 means "right after the previous"
+    out = bytearray()
+    _write_varint(out, len(entries))
+    last = 0
+    for entry in entries:
+        _write_varint(out, entry.tile_id - last)
+        last = entry.tile_id
+    for entry in entries:
+        _write_varint(out, entry.run_length)
+    for entry in entries:
+        _write_varint(out, entry.length)
+    for i, entry in enumerate(entries):
+        previous = entries[i - 1] if i else None
+        contiguous = previous is not None and entry.offset == previous.offset + previous.length
+        _write_varint(out, 0 if contiguous else entry.offset + 1)
+    return bytes(out)
+
+
+def deserialize_directory(data: bytes) -> list[Entry]:
+    count, pos = _read_varint(data, 0)
+    columns = []
+    for _ in range(4):
+        values = []
+        for _ in range(count):
+            value, pos = _read_varint(data, pos)
+            values.append(value)
+        columns.append(values)
+    deltas, run_lengths, lengths, offsets = columns
+
+    entries = []
+    tile_id = 0
+    for i in range(count):
+        tile_id += deltas[i]
+        if offsets[i] == 0 and i > 0:
+            offset = entries[-1].offset + entries[-1].length
+        else:
+            offset = offsets[i] - 1
+        entries.append(Entry(tile_id, offset, lengths[i], run_lengths[i]))
+    return entries
+
+
+def read_header(f: BinaryIO) -> Header:
+    f.seek(0)
+    magic, version, *fields = HEADER_FORMAT.unpack(f.read(HEADER_FORMAT.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a PMTiles v{VERSION} archive: {getattr(f, 'name', f)}")
+    return Header(*fields)
+
+
+def read_archive(f: BinaryIO) -> tuple[Header, bytes, list[Entry]]:
+    # Header, decompressed metadata JSON and every tile entry (leaf directories resolved)
+    header = read_header(f)
+    f.seek(header.metadata_offset)
+    metadata = _decompress(f.read(header.metadata_length), header.internal_compression)
+
+    entries = []
+    pending = [(header.root_offset, header.root_length)]
+    while pending:
+        offset, length = pending.pop()
+        f.seek(offset)
+        for entry in deserialize_directory(_decompress(f.read(length), header.internal_compression)):
+            if entry.run_length:
+                entries.append(entry)
+            else:
+                pending.append((header.leaf_offset + entry.offset, entry.length))
+    entries.sort(key=lambda e: e.tile_id)
+    return header, metadata, entries
+
+
+def read_tiles(f: BinaryIO, header: Header, entries: list[Entry]) -> Iterator[tuple[int, bytes]]:
+    # (tile id, tile bytes) for every addressed tile, runs expanded
+    for entry in entries:
+        f.seek(header.data_offset + entry.offset)
+        data = f.read(entry.length)
+        for i in range(entry.run_length):
+            yield entry.tile_id + i, data
+
+
+def _directories(entries: list[Entry], compression: int) -> tuple[bytes, bytes]:
+    root = _compress(serialize_directory(entries), compression)
+    if len(root) <= ROOT_DIR_LIMIT:
+        return root, b""
+    leaf_size = LEAF_SIZE
+    while True:
+        leaves = bytearray()
+        pointers = []
+        for start in range(0, len(entries), leaf_size):
+            leaf = _compress(serialize_directory(entries[start:start + leaf_size]), compression)
+            pointers.append(Entry(entries[start].tile_id, len(leaves), len(leaf), 0))
+            leaves += leaf
+        root = _compress(serialize_directory(pointers), compression)
+        if len(root) <= ROOT_DIR_LIMIT:
+            return root, bytes(leaves)
+        leaf_size *= 2
+
+
+def write_archive(path: Path, header: Header, metadata: bytes, tiles: Iterable[tuple[int, bytes]]):
+    # tiles must come in ascending tile id order. Identical tiles are stored once, and runs of
+    # consecutive ids with the same content share one entry. Directory offsets and counts in
+    # header are recomputed; zooms, bounds, center and compression are kept as given.
+    path = Path(path)
+    entries = []
+    stored = {}
+    data_length = addressed = 0
+    with tempfile.TemporaryFile(dir=path.parent) as data_file:
+        for tile_id, data in tiles:
+            key = hashlib.blake2b(data, digest_size=16).digest()
+            offset = stored.get(key)
+            if offset is None:
+                offset = stored[key] = data_length
+                data_file.write(data)
+                data_length += len(data)
+            addressed += 1
+            last = entries[-1] if entries else None
+            if last is not None and last.offset == offset and last.tile_id + last.run_length == tile_id:
+                entries[-1] = last._replace(run_length=last.run_length + 1)
+            elif last is not None and tile_id < last.tile_id + last.run_length:
+                raise ValueError("Tiles must be written in ascending tile id order")
+            else:
+                entries.append(Entry(tile_id, offset, len(data), 1))
+
+        root, leaves = _directories(entries, header.internal_compression)
+        metadata = _compress(metadata, header.internal_compression)
+        root_offset = HEADER_FORMAT.size
+        header = header._replace(
+            root_offset=root_offset,
+            root_length=len(root),
+            metadata_offset=root_offset + len(root),
+            metadata_length=len(metadata),
+            leaf_offset=root_offset + len(root) + len(metadata),
+            leaf_length=len(leaves),
+            data_offset=root_offset + len(root) + len(metadata) + len(leaves),
+            data_length=data_length,
+            addressed_tiles=addressed,
+            tile_entries=len(entries),
+            tile_contents=len(stored),
+            clustered=1,
+        )
+
+        tmp_path = path.with_suffix(".pmtiles.tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(HEADER_FORMAT.pack(MAGIC, VERSION, *header))
+            out.write(root)
+            out.write(metadata)
+            out.write(leaves)
+            data_file.seek(0)
+            shutil.copyfileobj(data_file, out, 1 << 20)
+        tmp_path.replace(path)
+
+
+def splice(base_path: Path, patch_path: Path, replaced: np.ndarray, output_path: Path) -> tuple[int, int]:
+    # Tiles whose ids are in replaced come from the patch archive (or disappear if it has none);
+    # every other tile is copied from the base. Returns (tiles copied, tiles replaced).
+    replaced = np.unique(np.asarray(replaced, dtype=np.uint64))
+    with open(base_path, "rb") as base, open(patch_path, "rb") as patch:
+        base_header, metadata, base_entries = read_archive(base)
+        patch_header, _, patch_entries = read_archive(patch)
+        for field in ("tile_type", "tile_compression"):
+            if getattr(base_header, field) != getattr(patch_header, field):
+                raise ValueError(f"Cannot splice {patch_path} into {base_path}: {field} differs")
+
+        counts = {"copied": 0, "replaced": 0}
+
+        def tiles():
+            kept = ((tile_id, data) for tile_id, data in read_tiles(base, base_header, base_entries)
+                    if not _contains(replaced, tile_id))
+            patched = ((tile_id, data) for tile_id, data in read_tiles(patch, patch_header, patch_entries)
+                       if _contains(replaced, tile_id))
+            kept_tile, patched_tile = next(kept, None), next(patched, None)
+            while kept_tile is not None or patched_tile is not None:
+                if patched_tile is None or (kept_tile is not None and kept_tile[0] < patched_tile[0]):
+                    counts["copied"] += 1
+                    yield kept_tile
+                    kept_tile = next(kept, None)
+                else:
+                    counts["replaced"] += 1
+                    yield patched_tile
+                    patched_tile = next(patched, None)
+
+        header = base_header._replace(
+            min_zoom=min(base_header.min_zoom, patch_header.min_zoom),
+            max_zoom=max(base_header.max_zoom, patch_header.max_zoom),
+            min_lon_e7=min(base_header.min_lon_e7, patch_header.min_lon_e7),
+            min_lat_e7=min(base_header.min_lat_e7, patch_header.min_lat_e7),
+            max_lon_e7=max(base_header.max_lon_e7, patch_header.max_lon_e7),
+            max_lat_e7=max(base_header.max_lat_e7, patch_header.max_lat_e7),
+        )
+        write_archive(output_path, header, metadata, tiles())
+    return counts["copied"], counts["replaced"]
+
+
+def _contains(sorted_ids: np.ndarray, tile_id: int) -> bool:
+    i = np.searchsorted(sorted_ids, np.uint64(tile_id))
+    return i < len(sorted_ids) and sorted_ids[i] == tile_id
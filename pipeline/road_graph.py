@@ -0,0 +1,490 @@
+import heapq
+import json
+import math
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import shapely
+
+from pipeline.columns import UNKNOWN_LAND_STATUS, land_status
+from pipeline.dissolve import connected_components
+from pipeline.spatial_join import PolygonIndex, split_by_polygons, take_attributes
+from pipeline.unit_stats import GEOD, geodesic_lengths
+from pipeline.utils import AGENCY_ACCESS_MAP
+
+GRAPH_VERSION = 2
+# Bit i of an arc's land mask is LAND_STATUSES[i]; the mask is a uint16
+LAND_STATUSES = sorted(set(AGENCY_ACCESS_MAP.values())) + [UNKNOWN_LAND_STATUS]
+PUBLIC_LAND_STATUSES = [s for s in LAND_STATUSES if s.startswith("public_")]
+# Set on arcs Overture denies motor vehicles; no land status maps to it, so no allowed set opens them
+ACCESS_DENIED_BIT = np.uint16(1 << 15)
+# Directions of an edge a restriction closes: along the segment's digitized direction, against it
+FORWARD, BACKWARD = 1, 2
+# Overture travel modes a denial must name (or leave unset) to close a road to a car or truck
+MOTOR_MODES = ["vehicle", "motor_vehicle", "car"]
+# Qualifiers that limit a denial to some users, vehicles or times; a permit or a season can lift
+# those, so they do not close the road
+CONDITIONS = ["during", "using", "recognized", "vehicle"]
+# Stretches shorter than this where an edge grazes another owner (roads drawn along a parcel
+# line) do not count against it, unless they are all the edge has
+MIN_CROSSING_METERS = 10.0
+# Nodes are stored in row-major order of a grid of these cells, which makes nearest-node lookups
+# a few binary searches on the memory-mapped arrays
+CELL_DEGREES = 0.01
+MAX_SNAP_METERS = 5_000.0
+# ALT landmarks: nodes whose distance to every other node is stored to tighten the A* bound
+LANDMARKS = 16
+# Landmark distances are float32; the bound gives up this much so rounding never overestimates
+LANDMARK_SLACK = 1.0
+ARRAYS = ["nodes", "cells", "offsets", "targets", "arc_edges", "lengths", "land_status", "land_mask",
+          "edge_offsets", "edge_coords", "landmarks"]
+
+
+class EdgeBatch(NamedTuple):
+    # One row per stretch of road between two consecutive connectors
+    start_ids: pa.Array
+    end_ids: pa.Array
+    counts: np.ndarray
+    coords: np.ndarray
+    lengths: np.ndarray
+    land_status: np.ndarray
+    land_mask: np.ndarray
+    # FORWARD and BACKWARD bits of the directions motor vehicles are denied
+    denied: np.ndarray
+
+
+class RoadGraph(NamedTuple):
+    # CSR adjacency: the arcs leaving node u are offsets[u]:offsets[u + 1] of the arc arrays.
+    # Every edge is stored as two arcs; arc_edges holds the edge, bit-inverted for the reverse arc.
+    nodes: np.ndarray
+    cells: np.ndarray
+    offsets: np.ndarray
+    targets: np.ndarray
+    arc_edges: np.ndarray
+    lengths: np.ndarray
+    land_status: np.ndarray
+    land_mask: np.ndarray
+    edge_offsets: np.ndarray
+    edge_coords: np.ndarray
+    # Meters from every node to each landmark (inf when unreachable), one row per node
+    landmarks: np.ndarray
+    meta: dict
+    # Subgraph per allowed land-status set, built on first use
+    cache: dict
+
+
+class Subgraph(NamedTuple):
+    # The arcs open under one set of allowed land statuses, as their own CSR; arcs maps each
+    # back to its position in the full graph
+    offsets: np.ndarray
+    targets: np.ndarray
+    lengths: np.ndarray
+    arcs: np.ndarray
+    usable: np.ndarray
+
+
+class Route(NamedTuple):
+    meters: float
+    nodes: np.ndarray
+    coordinates: np.ndarray
+    # Meters of the route per land status
+    land_status: dict[str, float]
+
+
+def status_bits(statuses) -> int:
+    unknown = set(statuses) - set(LAND_STATUSES)
+    if unknown:
+        raise ValueError(f"Unknown land status: {', '.join(sorted(unknown))}")
+    return sum(1 << LAND_STATUSES.index(s) for s in statuses)
+
+
+def _vertex_fractions(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Every vertex with its row and its share of the line's geodesic length up to that vertex
+    coords, rows = shapely.get_coordinates(geoms, return_index=True)
+    step = np.zeros(len(coords))
+    same = rows[1:] == rows[:-1]
+    if same.any():
+        start, end = coords[:-1][same], coords[1:][same]
+        step[1:][same] = GEOD.inv(start[:, 0], start[:, 1], end[:, 0], end[:, 1])[2]
+    totals = np.bincount(rows, weights=step, minlength=len(geoms))
+    firsts = np.flatnonzero(np.r_[True, ~same]) if len(coords) else np.zeros(0, dtype=np.int64)
+    cumulative = np.cumsum(step)
+    cumulative -= np.repeat(cumulative[firsts], np.diff(np.r_[firsts, len(coords)]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = np.nan_to_num(cumulative / totals[rows])
+    return coords, rows, fractions
+
+
+def connector_edges(geoms: np.ndarray, connectors: pa.Array):
+    # Cuts each segment at its connectors (Overture's linear "at" positions) into edges running
+    # from one connector to the next. Returns the connector ids at both ends, the vertex count of
+    # every edge, its flattened coordinates, and the segment row and linear span it was cut from.
+    connectors = connectors.combine_chunks() if isinstance(connectors, pa.ChunkedArray) else connectors
+    parents = pc.list_parent_indices(connectors).to_numpy()
+    flat = pc.list_flatten(connectors)
+    ids = flat.field("connector_id")
+    at = np.clip(flat.field("at").fill_null(0.0).to_numpy(zero_copy_only=False), 0.0, 1.0)
+    order = np.lexsort((at, parents))
+    parents, at, ids = parents[order], at[order], ids.take(pa.array(order))
+
+    pair = (parents[1:] == parents[:-1]) & (at[1:] > at[:-1])
+    pair &= shapely.get_type_id(geoms[parents[:-1]]) == shapely.GeometryType.LINESTRING
+    first = np.flatnonzero(pair)
+    rows, a, b = parents[first], at[first], at[first + 1]
+
+    coords, vertex_rows, fractions = _vertex_fractions(geoms)
+    # Rows are whole numbers two apart, so row * 2 + fraction orders vertices by row, then position
+    keys = vertex_rows * 2.0 + fractions
+    row_start = np.searchsorted(vertex_rows, rows, side="left")
+    row_end = np.searchsorted(vertex_rows, rows, side="right")
+
+    def point_at(fraction):
+        i = np.clip(np.searchsorted(keys, rows * 2.0 + fraction, side="right"), row_start + 1, row_end - 1)
+        span = fractions[i] - fractions[i - 1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(span > 0, (fraction - fractions[i - 1]) / span, 0.0)
+        return coords[i - 1] + (coords[i] - coords[i - 1]) * np.clip(t, 0.0, 1.0)[:, None]
+
+    lo = np.searchsorted(keys, rows * 2.0 + a, side="right")
+    hi = np.maximum(np.searchsorted(keys, rows * 2.0 + b, side="left"), lo)
+    interior = hi - lo
+    counts = interior + 2
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    edge_coords = np.empty((int(counts.sum()), 2))
+    edge_coords[starts] = point_at(a)
+    edge_coords[starts + counts - 1] = point_at(b)
+    k = np.arange(int(interior.sum())) - np.repeat(np.r_[0, np.cumsum(interior)[:-1]], interior)
+    edge_coords[np.repeat(starts + 1, interior) + k] = coords[np.repeat(lo, interior) + k]
+    return ids.take(pa.array(first)), ids.take(pa.array(first + 1)), counts, edge_coords, rows, a, b
+
+
+def _has_value(values: pa.Array) -> np.ndarray:
+    # Set and, for lists, not empty
+    if pa.types.is_list(values.type):
+        return pc.fill_null(pc.greater(pc.list_value_length(values), 0), False).to_numpy(zero_copy_only=False)
+    return values.is_valid().to_numpy(zero_copy_only=False)
+
+
+def edge_access(restrictions: pa.Array, rows: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # FORWARD and BACKWARD bits of every edge (segment row, linear span a to b) under an Overture
+    # denial for motor vehicles that holds for everyone at all times
+    denied = np.zeros(len(rows), dtype=np.uint8)
+    restrictions = restrictions.combine_chunks() if isinstance(restrictions, pa.ChunkedArray) else restrictions
+    if not (pa.types.is_list(restrictions.type) and pa.types.is_struct(restrictions.type.value_type)):
+        # Absent from the release (or an all-null column): nothing is restricted
+        return denied
+    parents = pc.list_parent_indices(restrictions).to_numpy()
+    flat = pc.list_flatten(restrictions)
+    fields = {f.name for f in flat.type}
+    if "access_type" not in fields or not len(flat):
+        return denied
+    applies = pc.fill_null(pc.equal(pc.struct_field(flat, "access_type"), "denied"), False).to_numpy(zero_copy_only=False)
+    directions = np.full(len(flat), FORWARD | BACKWARD, dtype=np.uint8)
+
+    if "when" in fields:
+        when = pc.struct_field(flat, "when")
+        conditions = {f.name for f in when.type}
+        for name in CONDITIONS:
+            if name in conditions:
+                applies &= ~_has_value(pc.struct_field(when, name))
+        if "mode" in conditions:
+            modes = pc.struct_field(when, "mode")
+            motor = np.zeros(len(flat), dtype=bool)
+            named = pc.list_parent_indices(modes).to_numpy()
+            is_motor = pc.fill_null(pc.is_in(pc.list_flatten(modes), value_set=pa.array(MOTOR_MODES)), False)
+            motor[named[is_motor.to_numpy(zero_copy_only=False)]] = True
+            applies &= motor | ~_has_value(modes)
+        if "heading" in conditions:
+            heading = pc.struct_field(when, "heading")
+            directions[pc.fill_null(pc.equal(heading, "forward"), False).to_numpy(zero_copy_only=False)] = FORWARD
+            directions[pc.fill_null(pc.equal(heading, "backward"), False).to_numpy(zero_copy_only=False)] = BACKWARD
+
+    low, high = np.zeros(len(flat)), np.ones(len(flat))
+    if "between" in fields:
+        between = pc.struct_field(flat, "between")
+        low = pc.fill_null(pc.list_element(between, 0), 0.0).to_numpy(zero_copy_only=False)
+        high = pc.fill_null(pc.list_element(between, 1), 1.0).to_numpy(zero_copy_only=False)
+
+    # Edges come sorted by segment row; each denial is checked against its own segment's edges
+    keep = np.flatnonzero(applies)
+    first = np.searchsorted(rows, parents[keep], side="left")
+    spans = np.searchsorted(rows, parents[keep], side="right") - first
+    owner = np.repeat(keep, spans)
+    edges = np.repeat(first, spans) + np.arange(int(spans.sum())) - np.repeat(np.cumsum(spans) - spans, spans)
+    overlap = (a[edges] < high[owner]) & (b[edges] > low[owner])
+    np.bitwise_or.at(denied, edges[overlap], directions[owner[overlap]])
+    return denied
+
+
+def edge_land(lines: np.ndarray, sma_index: PolygonIndex) -> tuple[np.ndarray, np.ndarray]:
+    # Status covering most of each edge, and the mask of every status it crosses for more than
+    # MIN_CROSSING_METERS (or the longest one when it crosses none for that long)
+    rows, pieces, sma_rows = split_by_polygons(lines, sma_index)
+    codes = take_attributes(sma_index, sma_rows).column("ADMIN_AGENCY_CODE")
+    statuses = pc.index_in(land_status(codes), value_set=pa.array(LAND_STATUSES)).to_numpy(zero_copy_only=False)
+    meters = geodesic_lengths(pieces)
+    per_status = np.zeros((len(lines), len(LAND_STATUSES)))
+    np.add.at(per_status, (rows, statuses), meters)
+    # Lines no piece survived for (too short to split) fall back to the unknown status
+    per_status[per_status.sum(axis=1) == 0, LAND_STATUSES.index(UNKNOWN_LAND_STATUS)] = 1.0
+    majority = per_status.argmax(axis=1).astype(np.uint8)
+    crossed = per_status > np.minimum(MIN_CROSSING_METERS, per_status.max(axis=1, keepdims=True) - 1e-9)
+    bits = (crossed * (1 << np.arange(len(LAND_STATUSES)))).sum(axis=1).astype(np.uint16)
+    return majority, bits
+
+
+def road_edges(
+    geoms: np.ndarray, connectors: pa.Array, sma_index: PolygonIndex, restrictions: pa.Array | None = None
+) -> EdgeBatch:
+    start_ids, end_ids, counts, coords, rows, a, b = connector_edges(geoms, connectors)
+    lines = shapely.linestrings(coords, indices=np.repeat(np.arange(len(counts)), counts))
+    majority, bits = edge_land(lines, sma_index)
+    denied = np.zeros(len(counts), dtype=np.uint8) if restrictions is None else edge_access(restrictions, rows, a, b)
+    return EdgeBatch(start_ids, end_ids, counts, coords, geodesic_lengths(lines), majority, bits, denied)
+
+
+def write_graph(directory: Path, batches: list[EdgeBatch], workers: int = 1) -> tuple[int, int]:
+    # Numbers the connectors as nodes in grid-cell order, lays both directions of every edge out as
+    # CSR arcs, measures the landmark distances and saves each array as .npy beside graph.json.
+    # The directory is replaced whole.
+    ids = pa.chunked_array([b.start_ids for b in batches] + [b.end_ids for b in batches], type=pa.string())
+    encoded = ids.combine_chunks().dictionary_encode()
+    node_of = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    node_count = len(encoded.dictionary)
+    counts = np.concatenate([b.counts for b in batches])
+    edge_count = len(counts)
+    start_nodes, end_nodes = node_of[:edge_count], node_of[edge_count:]
+    edge_offsets = np.r_[0, np.cumsum(counts)]
+    edge_coords = np.concatenate([b.coords for b in batches])
+
+    nodes = np.empty((node_count, 2))
+    nodes[end_nodes] = edge_coords[edge_offsets[1:] - 1]
+    nodes[start_nodes] = edge_coords[edge_offsets[:-1]]
+    origin = nodes.min(axis=0)
+    grid = np.floor((nodes - origin) / CELL_DEGREES).astype(np.int64)
+    columns = int(grid[:, 0].max()) + 1
+    cells = grid[:, 1] * columns + grid[:, 0]
+    order = np.argsort(cells, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(node_count)
+    start_nodes, end_nodes = rank[start_nodes], rank[end_nodes]
+
+    sources = np.concatenate([start_nodes, end_nodes])
+    arc_order = np.argsort(sources, kind="stable")
+    edge_ids = np.arange(edge_count, dtype=np.int32)
+    lengths = np.concatenate([b.lengths for b in batches])
+    statuses = np.concatenate([b.land_status for b in batches])
+    masks = np.concatenate([b.land_mask for b in batches])
+    denied = np.concatenate([b.denied for b in batches])
+    # Forward arcs run start to end, along the segment; a denied direction closes its arc
+    forward_masks = np.where(denied & FORWARD, masks | ACCESS_DENIED_BIT, masks)
+    backward_masks = np.where(denied & BACKWARD, masks | ACCESS_DENIED_BIT, masks)
+    arrays = {
+        "nodes": nodes[order],
+        "cells": cells[order],
+        "offsets": np.r_[0, np.cumsum(np.bincount(sources, minlength=node_count))],
+        "targets": np.concatenate([end_nodes, start_nodes])[arc_order].astype(np.int32),
+        "arc_edges": np.concatenate([edge_ids, ~edge_ids])[arc_order],
+        "lengths": np.tile(lengths, 2)[arc_order].astype(np.float32),
+        "land_status": np.tile(statuses, 2)[arc_order],
+        "land_mask": np.concatenate([forward_masks, backward_masks])[arc_order].astype(np.uint16),
+        "edge_offsets": edge_offsets,
+        "edge_coords": edge_coords,
+    }
+
+    tmp_dir = directory.with_name(f"{directory.name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name in ARRAYS[:-1]:
+        np.save(tmp_dir / f"{name}.npy", arrays[name])
+    landmarks = landmark_nodes(arrays["nodes"], arrays["offsets"], arrays["targets"], LANDMARKS).tolist()
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            distances = list(pool.map(partial(distances_from, tmp_dir), landmarks))
+    else:
+        distances = [distances_from(tmp_dir, landmark) for landmark in landmarks]
+    np.save(tmp_dir / "landmarks.npy", np.column_stack(distances).astype(np.float32))
+
+    meta = {
+        "version": GRAPH_VERSION,
+        "nodes": node_count,
+        "edges": edge_count,
+        "denied_arcs": int(np.count_nonzero(denied & FORWARD) + np.count_nonzero(denied & BACKWARD)),
+        "land_statuses": LAND_STATUSES,
+        "cell_degrees": CELL_DEGREES,
+        "origin": origin.tolist(),
+        "columns": columns,
+        "landmarks": landmarks,
+    }
+    (tmp_dir / "graph.json").write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp_dir.rename(directory)
+    return node_count, edge_count
+
+
+def landmark_nodes(nodes: np.ndarray, offsets: np.ndarray, targets: np.ndarray, count: int) -> np.ndarray:
+    # Nodes of the largest component nearest to points spread evenly around its convex hull;
+    # landmarks on the rim of the network sit behind most targets, where ALT bounds are tightest
+    sources = np.repeat(np.arange(len(nodes)), np.diff(offsets))
+    labels = connected_components(len(nodes), sources, np.asarray(targets, dtype=np.int64))
+    members = np.flatnonzero(labels == np.bincount(labels).argmax())
+    rim = shapely.boundary(shapely.convex_hull(shapely.multipoints(nodes[members])))
+    if shapely.get_type_id(rim) != shapely.GeometryType.LINESTRING:
+        # All nodes on one line: spread the landmarks along the component instead
+        return np.unique(members[np.linspace(0, len(members) - 1, count).astype(np.int64)])
+    points = shapely.get_coordinates(shapely.line_interpolate_point(rim, np.arange(count) / count, normalized=True))
+    scale = np.array([math.cos(math.radians(nodes[members, 1].mean())), 1.0])
+    picks = [members[np.argmin((((nodes[members] - point) * scale) ** 2).sum(axis=1))] for point in points]
+    return np.unique(picks)
+
+
+def distances_from(directory: Path, source: int) -> np.ndarray:
+    # Dijkstra over every arc of the graph saved in directory: meters from source, inf where unreachable
+    offsets = np.load(directory / "offsets.npy", mmap_mode="r").tolist()
+    targets = np.load(directory / "targets.npy", mmap_mode="r")
+    lengths = np.load(directory / "lengths.npy", mmap_mode="r")
+    best = [math.inf] * (len(offsets) - 1)
+    best[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        dist, u = heapq.heappop(heap)
+        if dist > best[u]:
+            continue
+        start, end = offsets[u], offsets[u + 1]
+        for v, weight in zip(targets[start:end].tolist(), lengths[start:end].tolist()):
+            candidate = dist + weight
+            if candidate < best[v]:
+                best[v] = candidate
+                heapq.heappush(heap, (candidate, v))
+    return np.array(best)
+
+
+def load_graph(directory: Path) -> RoadGraph:
+    # Arrays are memory-mapped, so loading is instant and only the pages a query touches are read.
+    # They are viewed as plain ndarrays: np.memmap indexing is several times slower.
+    meta = json.loads((Path(directory) / "graph.json").read_text())
+    if meta["version"] != GRAPH_VERSION or meta["land_statuses"] != LAND_STATUSES:
+        raise ValueError(f"Road graph in {directory} was built by another version of the pipeline; rebuild it")
+    arrays = [np.load(Path(directory) / f"{name}.npy", mmap_mode="r").view(np.ndarray) for name in ARRAYS]
+    return RoadGraph(*arrays, meta, {})
+
+
+def subgraph(graph: RoadGraph, allowed) -> Subgraph:
+    # CSR of the arcs crossing only allowed land and open to motor vehicles, built once per allowed
+    # set and kept on the graph
+    bits = status_bits(allowed)
+    if bits not in graph.cache:
+        arcs = np.flatnonzero((graph.land_mask & np.uint16(~bits & 0xFFFF)) == 0)
+        sources = np.searchsorted(graph.offsets, arcs, side="right") - 1
+        degrees = np.bincount(sources, minlength=len(graph.offsets) - 1)
+        graph.cache[bits] = Subgraph(
+            np.r_[0, np.cumsum(degrees)], graph.targets[arcs], graph.lengths[arcs].astype(np.float64), arcs, degrees > 0
+        )
+    return graph.cache[bits]
+
+
+def nearest_node(graph: RoadGraph, lon: float, lat: float, usable: np.ndarray, max_meters: float = MAX_SNAP_METERS) -> int:
+    # Closest usable node within max_meters, or -1; only the grid rows around the point are searched
+    cell = graph.meta["cell_degrees"]
+    x0, y0 = graph.meta["origin"]
+    columns = graph.meta["columns"]
+    col, row = math.floor((lon - x0) / cell), math.floor((lat - y0) / cell)
+    reach = math.ceil(max_meters / (cell * 111_320 * math.cos(math.radians(min(abs(lat), 89.0))))) + 1
+    first, last = max(col - reach, 0), min(col + reach, columns - 1)
+    if first > last:
+        return -1
+    ranges = []
+    for r in range(max(row - reach, 0), row + reach + 1):
+        lo = np.searchsorted(graph.cells, r * columns + first, side="left")
+        hi = np.searchsorted(graph.cells, r * columns + last, side="right")
+        ranges.append(np.arange(lo, hi))
+    candidates = np.concatenate(ranges)
+    candidates = candidates[usable[candidates]]
+    if not len(candidates):
+        return -1
+    points = graph.nodes[candidates]
+    meters = GEOD.inv(np.full(len(points), lon), np.full(len(points), lat), points[:, 0], points[:, 1])[2]
+    best = int(np.argmin(meters))
+    return int(candidates[best]) if meters[best] <= max_meters else -1
+
+
+def shortest_path(graph: RoadGraph, source: int, target: int, allowed: Subgraph) -> tuple[float, list[int]] | None:
+    # A* over the allowed arcs; returns (meters, arcs) or None. The remaining distance is bounded
+    # below by the triangle inequality over the landmark distances (ALT). Landmarks are measured
+    # on the whole graph, and leaving arcs out only makes routes longer, so the bound holds for
+    # any allowed set. A node a landmark reaches while the target is out of its reach is in
+    # another component and never queued.
+    offsets, targets, lengths, landmarks = allowed.offsets, allowed.targets, allowed.lengths, graph.landmarks
+    to_landmarks = landmarks[target].astype(np.float64)
+
+    def remaining(vs: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            # inf - inf (neither reachable) is nan, which fmax skips; one-sided inf prunes the node
+            bound = np.fmax.reduce(np.abs(landmarks[vs] - to_landmarks), axis=1) - LANDMARK_SLACK
+        return np.fmax(bound, 0.0)
+
+    best = {source: 0.0}
+    parents = {source: -1}
+    heap = [(float(remaining(np.array([source]))[0]), 0.0, source)]
+    while heap:
+        _, dist, u = heapq.heappop(heap)
+        if u == target:
+            break
+        if dist > best[u]:
+            continue
+        start, end = offsets[u], offsets[u + 1]
+        if start == end:
+            continue
+        neighbours = targets[start:end]
+        estimates = remaining(neighbours).tolist()
+        for arc, (v, weight, estimate) in enumerate(zip(neighbours.tolist(), lengths[start:end].tolist(), estimates), start):
+            candidate = dist + weight
+            if candidate < best.get(v, math.inf) and estimate < math.inf:
+                best[v] = candidate
+                parents[v] = arc
+                heapq.heappush(heap, (candidate + estimate, candidate, v))
+    else:
+        return None
+
+    arcs = []
+    node = target
+    while node != source:
+        arc = parents[node]
+        arcs.append(int(allowed.arcs[arc]))
+        node = int(np.searchsorted(offsets, arc, side="right")) - 1
+    arcs.reverse()
+    return best[target], arcs
+
+
+def route(graph: RoadGraph, start: tuple[float, float], end: tuple[float, float],
+          allowed=PUBLIC_LAND_STATUSES, max_snap: float = MAX_SNAP_METERS) -> Route | None:
+    # Shortest road route between two (lon, lat) points on roads crossing only allowed land, in
+    # directions Overture does not deny to motor vehicles. Both points snap to the nearest node with an allowed road; None when no such route exists.
+    allowed_arcs = subgraph(graph, allowed)
+    ends = []
+    for lon, lat in (start, end):
+        node = nearest_node(graph, lon, lat, allowed_arcs.usable, max_snap)
+        if node < 0:
+            raise ValueError(f"No road on {', '.join(allowed)} land within {max_snap:.0f} m of {lon}, {lat}")
+        ends.append(node)
+    found = shortest_path(graph, ends[0], ends[1], allowed_arcs)
+    if found is None:
+        return None
+    meters, arcs = found
+
+    pieces = [np.asarray(graph.nodes[[ends[0]]])]
+    by_status = {}
+    for arc in arcs:
+        edge = int(graph.arc_edges[arc])
+        coords = graph.edge_coords[graph.edge_offsets[max(edge, ~edge)]:graph.edge_offsets[max(edge, ~edge) + 1]]
+        pieces.append(np.asarray(coords[::-1] if edge < 0 else coords)[1:])
+        status = LAND_STATUSES[graph.land_status[arc]]
+        by_status[status] = by_status.get(status, 0.0) + float(graph.lengths[arc])
+    nodes = [ends[0]] + [int(graph.targets[arc]) for arc in arcs]
+    return Route(meters, np.array(nodes), np.concatenate(pieces), by_status)
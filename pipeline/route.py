@@ -0,0 +1,69 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline.road_graph import LAND_STATUSES, MAX_SNAP_METERS, PUBLIC_LAND_STATUSES, load_graph, route
+from pipeline.unit_stats import METERS_PER_MILE
+from pipeline.utils import PROCESSED_DIR
+
+
+def coordinate(text: str) -> tuple[float, float]:
+    # LAT,LON as maps copy them; a leading minus sign would read as an option to argparse
+    try:
+        lat, lon = (float(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LON, got {text!r}")
+    return lon, lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shortest road route between two points over public land")
+    parser.add_argument("start", type=coordinate, help="LAT,LON")
+    parser.add_argument("end", type=coordinate, help="LAT,LON")
+    parser.add_argument(
+        "--allow",
+        nargs="+",
+        default=[],
+        choices=[s for s in LAND_STATUSES if s not in PUBLIC_LAND_STATUSES],
+        help="Land statuses to route across besides public land, e.g. state_trust with a permit",
+    )
+    parser.add_argument("--graph", type=Path, default=PROCESSED_DIR / "road_graph", help="Road graph directory")
+    parser.add_argument("--max-snap", type=float, default=MAX_SNAP_METERS, help="Meters a point may be from an allowed road")
+    parser.add_argument("--geojson", type=Path, help="Write the route as a GeoJSON feature")
+    args = parser.parse_args()
+    if not (args.graph / "graph.json").exists():
+        parser.error(f"No road graph in {args.graph}; run the build_road_graph stage first")
+
+    graph = load_graph(args.graph)
+    allowed = PUBLIC_LAND_STATUSES + args.allow
+    started = time.perf_counter()
+    try:
+        found = route(graph, args.start, args.end, allowed, args.max_snap)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    elapsed = (time.perf_counter() - started) * 1000
+    if found is None:
+        raise SystemExit(f"No route over {', '.join(allowed)} land ({elapsed:.0f} ms)")
+
+    print(f"{found.meters / METERS_PER_MILE:.2f} mi over {len(found.nodes) - 1} edges ({elapsed:.0f} ms)")
+    for status, meters in sorted(found.land_status.items(), key=lambda item: -item[1]):
+        print(f"  {status}: {meters / METERS_PER_MILE:.2f} mi")
+    if args.geojson:
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": found.coordinates.tolist()},
+            "properties": {
+                "miles": round(found.meters / METERS_PER_MILE, 2),
+                "land_status_miles": {s: round(m / METERS_PER_MILE, 2) for s, m in found.land_status.items()},
+            },
+        }
+        args.geojson.write_text(json.dumps(feature))
+        print(f"  Saved route to {args.geojson}")
+
+
+if __name__ == "__main__":
+    main()
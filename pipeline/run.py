@@ -0,0 +1,291 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline import instrument
+from pipeline.partitions import PARTITION_KEYS, QUADKEY
+from pipeline.utils import BLM_SMA_BASE_URL, OVERTURE_S3_BASE
+
+
+class Task(NamedTuple):
+    name: str
+    deps: tuple[str, ...]
+    fn: Callable
+    args: tuple
+    process: bool = False
+    slots: int = 1
+
+
+def _line_buffered():
+    sys.stdout.reconfigure(line_buffering=True)
+
+
+def call(module: str, function: str, kwargs: dict):
+    return getattr(importlib.import_module(module), function)(**kwargs)
+
+
+def python_task(name, deps, module, function, process=False, slots=1, **kwargs) -> Task:
+    return Task(name, tuple(deps), call, (f"pipeline.{module}", function, kwargs), process, slots)
+
+
+def tile_task(layer: str, deps, threads: int, incremental: bool, **area) -> Task:
+    # Each tile task feeds one tippecanoe that runs threads threads, so it holds that many slots
+    return python_task(
+        f"tiles_{layer.replace('-', '_')}", deps, "04_generate_tiles", "generate_layer", process=True, slots=threads,
+        layer=layer, threads=threads, incremental=incremental, **area,
+    )
+
+
+def build_tasks(args) -> dict[str, Task]:
+    clip_layers = importlib.import_module("pipeline.02_clip_arizona").CLIP_LAYERS
+    enrich = importlib.import_module("pipeline.03_enrich")
+
+    # Listed in dependency order. Every stage runs in a worker process, even the I/O-bound downloads:
+    # stage records measure CPU, peak RSS and I/O for the whole process, so stages sharing one would
+    # count each other's usage
+    tasks = [
+        python_task("download_az_boundary", [], "01_download", "download_az_boundary", process=True),
+        python_task("download_azgfd_gmus", [], "01_download", "download_azgfd_gmus", process=True),
+        python_task(
+            "download_blm_sma", [], "01_download", "download_blm_sma", process=True, base_url=args.blm_sma_url
+        ),
+    ]
+    if args.incremental:
+        # Patches the clipped and enriched layers too, which then find themselves up to date
+        tasks.append(python_task(
+            "download_overture", ["download_az_boundary", "download_blm_sma", "download_azgfd_gmus"], "update_release",
+            "update_release", process=True, source=args.overture_source,
+        ))
+    else:
+        tasks.append(python_task(
+            "download_overture", [], "01_download", "download_overture", process=True, source=args.overture_source
+        ))
+    area = {"region": args.region, "unit": args.unit} if args.partitioned else {}
+    # Region and unit filters are resolved against the GMU polygons
+    area_deps = ["download_azgfd_gmus"] if args.region or args.unit else []
+    for input_name, output_name in clip_layers:
+        theme = input_name.removeprefix("overture_").removesuffix("_az")
+        tasks.append(python_task(
+            f"clip_{theme}", ["download_az_boundary", "download_overture", *area_deps], "02_clip_arizona",
+            "clip_layer_partitioned" if args.partitioned else "clip_layer",
+            process=True, input_name=input_name, output_name=output_name, **area,
+        ))
+
+    road_deps = ["clip_transportation", "download_blm_sma", "download_azgfd_gmus"]
+    if args.partitioned:
+        # Partitions fan out over enrich_workers processes inside each task
+        slots = args.enrich_workers
+        tasks += [
+            python_task(
+                "enrich_roads", road_deps, "03_enrich", "enrich_roads_partitioned", process=True, slots=slots,
+                exact=args.exact, workers=slots, partition_by=args.partition_by, **area,
+            ),
+            python_task(
+                "filter_hunt_pois", ["clip_places", *area_deps], "03_enrich", "filter_hunt_pois_partitioned", process=True,
+                slots=slots, workers=slots, **area,
+            ),
+            python_task(
+                "process_water_features", ["clip_water", *area_deps], "03_enrich", "process_water_features_partitioned",
+                process=True, slots=slots, workers=slots, **area,
+            ),
+        ]
+    elif args.backend == enrich.DUCKDB:
+        # DuckDB runs enrich_workers threads inside each task
+        slots = args.enrich_workers
+        tasks += [
+            python_task(
+                "enrich_roads", road_deps, "03_enrich", "enrich_roads_sql", process=True, slots=slots, workers=slots,
+            ),
+            python_task(
+                "filter_hunt_pois", ["clip_places"], "03_enrich", "filter_hunt_pois_sql", process=True, slots=slots,
+                workers=slots,
+            ),
+            python_task(
+                "process_water_features", ["clip_water"], "03_enrich", "process_water_features_sql", process=True,
+                slots=slots, workers=slots,
+            ),
+        ]
+    else:
+        if args.streaming or args.exact:
+            tasks.append(python_task(
+                "enrich_roads", road_deps, "03_enrich", "enrich_roads_streaming", process=True,
+                slots=args.enrich_workers, batch_size=args.batch_size, exact=args.exact, workers=args.enrich_workers,
+            ))
+        else:
+            tasks.append(python_task("enrich_roads", road_deps, "03_enrich", "enrich_roads", process=True))
+        tasks += [
+            python_task("filter_hunt_pois", ["clip_places"], "03_enrich", "filter_hunt_pois", process=True),
+            python_task("process_water_features", ["clip_water"], "03_enrich", "process_water_features", process=True),
+        ]
+
+    # The six tile layers share the worker budget
+    threads = max(1, args.workers // 6)
+    tasks += [
+        python_task("prepare_static_layers", ["download_azgfd_gmus"], "03_enrich", "prepare_static_layers", process=True),
+        python_task(
+            "prepare_lookup_index", ["prepare_static_layers", "download_blm_sma"], "03_enrich", "prepare_lookup_index",
+            process=True,
+        ),
+        python_task(
+            "prepare_land_ownership", ["download_blm_sma"], "03_enrich", "prepare_land_ownership", process=True,
+            slots=args.enrich_workers, workers=args.enrich_workers,
+        ),
+        python_task(
+            "compute_unit_stats", ["enrich_roads", "filter_hunt_pois", "download_blm_sma", "download_azgfd_gmus"],
+            "03_enrich", "compute_unit_stats", process=True, slots=args.enrich_workers, workers=args.enrich_workers,
+        ),
+        python_task(
+            "build_road_graph", ["download_overture", "download_blm_sma"], "03_enrich", "build_road_graph",
+            process=True, slots=args.enrich_workers, workers=args.enrich_workers,
+        ),
+        python_task(
+            "find_landlocked_land", ["enrich_roads", "download_blm_sma", "download_azgfd_gmus"], "03_enrich",
+            "find_landlocked_land", process=True, slots=args.enrich_workers, workers=args.enrich_workers,
+        ),
+        python_task(
+            "build_search_index", ["enrich_roads", "filter_hunt_pois", "process_water_features", "prepare_static_layers"],
+            "03_enrich", "build_search_index", process=True,
+        ),
+        tile_task("roads", ["enrich_roads"], threads, args.incremental, **area),
+        tile_task("places", ["filter_hunt_pois"], threads, args.incremental, **area),
+        tile_task("water", ["process_water_features"], threads, args.incremental, **area),
+        tile_task("hunt-units", ["prepare_static_layers"], threads, args.incremental),
+        tile_task("land-ownership", ["prepare_land_ownership"], threads, args.incremental),
+        tile_task("landlocked", ["find_landlocked_land"], threads, args.incremental),
+    ]
+    return {task.name: task for task in tasks}
+
+
+def select(tasks: dict[str, Task], targets: list[str]) -> dict[str, Task]:
+    unknown = [t for t in targets if t not in tasks]
+    if unknown:
+        raise SystemExit(f"Unknown tasks: {', '.join(unknown)}")
+    needed = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(tasks[name].deps)
+    return {name: task for name, task in tasks.items() if name in needed}
+
+
+def run(tasks: dict[str, Task], workers: int) -> dict[str, str]:
+    # Starts every task whose dependencies are done while the worker budget allows;
+    # a failure skips its dependents but independent branches keep going.
+    pending = dict(tasks)
+    status = {}
+    running = {}
+    free = workers
+    spawn = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(workers) as threads, ProcessPoolExecutor(
+        workers, mp_context=spawn, initializer=_line_buffered
+    ) as processes:
+        while pending or running:
+            for name, task in list(pending.items()):
+                if any(status.get(d) in ("failed", "skipped") for d in task.deps):
+                    status[name] = "skipped"
+                    del pending[name]
+                    print(f"[run] {name} skipped (dependency failed)", flush=True)
+                    continue
+                slots = min(task.slots, workers)
+                if slots > free or not all(status.get(d) == "done" for d in task.deps):
+                    continue
+                pool = processes if task.process else threads
+                running[pool.submit(task.fn, *task.args)] = (task, slots, time.perf_counter())
+                free -= slots
+                del pending[name]
+                print(f"[run] {name} started", flush=True)
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, slots, started = running.pop(future)
+                free += slots
+                elapsed = time.perf_counter() - started
+                try:
+                    future.result()
+                except Exception:
+                    status[task.name] = "failed"
+                    print(f"[run] {task.name} FAILED after {elapsed:.1f}s", flush=True)
+                    traceback.print_exc()
+                else:
+                    status[task.name] = "done"
+                    print(f"[run] {task.name} finished in {elapsed:.1f}s", flush=True)
+    return status
+
+
+def main():
+    enrich = importlib.import_module("pipeline.03_enrich")
+    parser = argparse.ArgumentParser(description="Run the pipeline as a dependency graph of parallel tasks")
+    parser.add_argument("targets", nargs="*", help="Tasks to run (with their dependencies); default is all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker budget shared by all tasks")
+    parser.add_argument("--list", action="store_true", help="Print the task graph and exit")
+    parser.add_argument("--overture-source", default=OVERTURE_S3_BASE, help="Overture release prefix or local mirror")
+    parser.add_argument("--blm-sma-url", default=BLM_SMA_BASE_URL, help="ArcGIS MapServer base URL for BLM SMA layers")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Move to a new Overture release by patching only changed features, and splice only changed tiles",
+    )
+    parser.add_argument("--streaming", action="store_true", help="Enrich roads in Parquet batches")
+    parser.add_argument("--exact", action="store_true", help="Split roads at land-ownership and GMU boundaries")
+    parser.add_argument("--batch-size", type=int, default=enrich.ROAD_BATCH_SIZE, help="Roads per batch in streaming mode")
+    parser.add_argument(
+        "--enrich-workers", type=int, default=1, help="Processes (DuckDB threads with --backend duckdb) used inside enrichment and the SMA dissolves"
+    )
+    parser.add_argument("--partitioned", action="store_true", help="Clip and enrich into quadkey-partitioned layers")
+    parser.add_argument("--partition-by", choices=PARTITION_KEYS, default=QUADKEY, help="Key of partitioned road output")
+    parser.add_argument("--region", help="With --partitioned, only rebuild partitions reaching this AZGFD region")
+    parser.add_argument("--unit", help="With --partitioned, only rebuild partitions reaching this hunt unit")
+    parser.add_argument(
+        "--backend", choices=enrich.BACKENDS, default=enrich.GEOPANDAS, help="Engine for the road, POI and water enrichment"
+    )
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of each Python stage in the run report")
+    args = parser.parse_args()
+    if (args.region or args.unit) and not args.partitioned:
+        parser.error("--region and --unit need --partitioned")
+    if args.backend == enrich.DUCKDB and (args.streaming or args.exact or args.partitioned):
+        parser.error("--backend duckdb runs in one query; it does not take --streaming, --exact or --partitioned")
+
+    tasks = build_tasks(args)
+    if args.list:
+        for task in tasks.values():
+            print(f"{task.name}: {', '.join(task.deps) or '-'}")
+        return
+
+    tasks = select(tasks, args.targets) if args.targets else tasks
+    # Worker processes inherit these and add their stages to the same report
+    instrument.run_id()
+    if args.profile:
+        instrument.enable_profiling()
+
+    print("=" * 60)
+    print(f"AZ Hunt Planner - Pipeline ({len(tasks)} tasks, {args.workers} workers)")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    status = run(tasks, max(args.workers, 1))
+    incomplete = [name for name in tasks if status.get(name) != "done"]
+
+    print("=" * 60)
+    print(f"Run report: {instrument.write_report()}")
+    if incomplete:
+        print(f"Pipeline incomplete after {time.perf_counter() - started:.1f}s: {', '.join(incomplete)}")
+        print("=" * 60)
+        sys.exit(1)
+    print(f"Pipeline complete in {time.perf_counter() - started:.1f}s")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
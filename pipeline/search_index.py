@@ -0,0 +1,222 @@
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import shapely
+
+from pipeline.columns import to_numpy
+from pipeline.dissolve import connected_components
+
+MAGIC = b"AZSI"
+VERSION = 1
+# Entry kinds by code; frontend/src/utils/searchIndex.js reads the same list
+KINDS = ["unit", "road", "place", "water"]
+# Same-name features of one kind closer than this (degrees, about 2 km) become one entry
+MERGE_DEGREES = 0.02
+# Every (name, kind) group is shifted this far in x, so one STRtree only pairs features of a group
+GROUP_SPACING = 1000.0
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u4"),
+    ("strings", "<u4"),
+    ("entries", "<u4"),
+    ("words", "<u4"),
+    ("names_bytes", "<u4"),
+])
+
+
+class Features(NamedTuple):
+    names: np.ndarray
+    bounds: np.ndarray
+    # A point on every feature, where the map centers on it
+    points: np.ndarray
+
+
+class SearchIndex(NamedTuple):
+    # Display names in the order of their distinct search keys; the entries of string i are
+    # entry_starts[i]:entry_starts[i + 1]. Words point at every word start of every key, sorted by
+    # the rest of the key from there. Keys are not stored: readers derive them with search_key.
+    names: list[str]
+    keys: list[str]
+    entry_starts: np.ndarray
+    word_strings: np.ndarray
+    word_offsets: np.ndarray
+    kinds: np.ndarray
+    boxes: np.ndarray
+    centers: np.ndarray
+
+
+class Match(NamedTuple):
+    name: str
+    kind: str
+    bbox: tuple[float, float, float, float]
+    center: tuple[float, float]
+
+
+def search_key(name: str) -> str:
+    # Case, accents and runs of whitespace do not matter: "Cañon  Tank" -> "canon tank"
+    decomposed = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(c for c in decomposed if not unicodedata.category(c).startswith("M")).lower().split())
+
+
+def word_starts(key: str) -> list[int]:
+    return [i for i, c in enumerate(key) if c.isalnum() and (i == 0 or not key[i - 1].isalnum())]
+
+
+def named_features(names: pa.Array, geoms: np.ndarray) -> Features:
+    names = names.cast(pa.string())
+    named = to_numpy(pc.fill_null(pc.not_equal(pc.utf8_trim_whitespace(names), ""), False))
+    keep = named & ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)
+    names, geoms = to_numpy(names)[keep], geoms[keep]
+    points = shapely.get_coordinates(shapely.point_on_surface(geoms))
+    return Features(names, shapely.bounds(geoms).reshape(-1, 4), points.reshape(-1, 2))
+
+
+def merge_features(features: dict[str, list[Features]]) -> SearchIndex:
+    names, bounds, points, kinds = [], [], [], []
+    for code, kind in enumerate(KINDS):
+        for part in features.get(kind, []):
+            names.append(part.names)
+            bounds.append(part.bounds)
+            points.append(part.points)
+            kinds.append(np.full(len(part.names), code, dtype=np.uint8))
+    if not names:
+        raise ValueError("no named features to index")
+    names, bounds, points, kinds = np.concatenate(names), np.concatenate(bounds), np.concatenate(points), np.concatenate(kinds)
+
+    distinct, name_ids = np.unique(names, return_inverse=True)
+    keys, key_ids = np.unique(np.array([search_key(n) for n in distinct], dtype=object)[name_ids], return_inverse=True)
+    _, groups = np.unique(key_ids * len(KINDS) + kinds, return_inverse=True)
+
+    # Features of a group whose boxes, grown by half the merge distance, touch are one entry
+    grown = bounds + np.array([-1, -1, 1, 1]) * MERGE_DEGREES / 2
+    offset = groups * GROUP_SPACING
+    boxes = shapely.box(grown[:, 0] + offset, grown[:, 1], grown[:, 2] + offset, grown[:, 3])
+    left, right = shapely.STRtree(boxes).query(boxes, predicate="intersects")
+    _, clusters = np.unique(connected_components(len(boxes), left, right), return_inverse=True)
+    count = clusters.max() + 1
+
+    entry_boxes = np.full((count, 4), [np.inf, np.inf, -np.inf, -np.inf])
+    for i, reduce in enumerate([np.minimum, np.minimum, np.maximum, np.maximum]):
+        reduce.at(entry_boxes[:, i], clusters, bounds[:, i])
+    # Each entry is named and centered after its member closest to the middle of its box
+    middle = (entry_boxes[:, :2] + entry_boxes[:, 2:]) / 2
+    distance = np.hypot(*(points - middle[clusters]).T)
+    order = np.lexsort((distance, clusters))
+    first = order[np.r_[True, clusters[order][1:] != clusters[order][:-1]]]
+    sizes = np.bincount(clusters, minlength=count)
+
+    # Entries of a key run from the largest merge down; a key's name is that of its first entry
+    entry_keys = key_ids[first]
+    entries = np.lexsort((-sizes, kinds[first], entry_keys))
+    entry_keys = entry_keys[entries]
+    starts = np.searchsorted(entry_keys, np.arange(len(keys) + 1))
+    key_names = names[first][entries][starts[:-1]]
+
+    keys = list(keys)
+    words = [(s, o) for s, key in enumerate(keys) for o in word_starts(key)]
+    words.sort(key=lambda word: keys[word[0]][word[1]:])
+    return SearchIndex(
+        list(key_names),
+        keys,
+        starts.astype(np.uint32),
+        np.array([s for s, _ in words], dtype=np.uint32),
+        np.array([o for _, o in words], dtype=np.uint16),
+        kinds[first][entries],
+        entry_boxes[entries].astype(np.float32),
+        points[first][entries].astype(np.float32),
+    )
+
+
+def _blob(strings: list[str]) -> tuple[np.ndarray, bytes]:
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_index(path: Path, index: SearchIndex) -> int:
+    # Header, then the 4-byte arrays, the 2- and 1-byte ones and the UTF-8 names, so every array is
+    # aligned for typed-array views in the browser
+    name_offsets, names = _blob(index.names)
+    header = np.array([(
+        MAGIC, VERSION, len(index.names), len(index.kinds), len(index.word_strings), len(names),
+    )], dtype=HEADER)
+    arrays = [
+        header,
+        name_offsets,
+        index.entry_starts.astype("<u4"),
+        index.word_strings.astype("<u4"),
+        index.boxes.astype("<f4"),
+        index.centers.astype("<f4"),
+        index.word_offsets.astype("<u2"),
+        index.kinds.astype(np.uint8),
+    ]
+    tmp_path = path.with_suffix(".bin.tmp")
+    with open(tmp_path, "wb") as f:
+        for array in arrays:
+            f.write(array.tobytes())
+        f.write(names)
+    tmp_path.replace(path)
+    return path.stat().st_size
+
+
+def read_index(data: bytes) -> SearchIndex:
+    header = np.frombuffer(data, dtype=HEADER, count=1)[0]
+    if header["magic"] != MAGIC or header["version"] != VERSION:
+        raise ValueError(f"not a version {VERSION} search index")
+    strings, entries, words = int(header["strings"]), int(header["entries"]), int(header["words"])
+    position = HEADER.itemsize
+
+    def take(dtype, count):
+        nonlocal position
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+        position += array.nbytes
+        return array
+
+    name_offsets = take("<u4", strings + 1)
+    entry_starts = take("<u4", strings + 1)
+    word_strings = take("<u4", words)
+    boxes = take("<f4", entries * 4).reshape(-1, 4)
+    centers = take("<f4", entries * 2).reshape(-1, 2)
+    word_offsets = take("<u2", words)
+    kinds = take(np.uint8, entries)
+    blob = data[position:position + int(header["names_bytes"])]
+    names = [blob[a:b].decode() for a, b in zip(name_offsets[:-1], name_offsets[1:])]
+    return SearchIndex(names, [search_key(n) for n in names], entry_starts, word_strings, word_offsets, kinds, boxes, centers)
+
+
+def load_index(path: Path) -> SearchIndex:
+    return read_index(path.read_bytes())
+
+
+def search(index: SearchIndex, query: str, limit: int = 10) -> list[Match]:
+    # Names with a word starting with the query; names that start with it come first
+    query = search_key(query)
+    if not query:
+        return []
+
+    def suffix(i):
+        return index.keys[index.word_strings[i]][index.word_offsets[i]:]
+
+    lo = bisect_left(range(len(index.word_strings)), query, key=suffix)
+    leading, inner = [], []
+    i = lo
+    while i < len(index.word_strings) and len(leading) < limit and suffix(i).startswith(query):
+        string = int(index.word_strings[i])
+        (inner if index.word_offsets[i] else leading).append(string)
+        i += 1
+
+    matches = []
+    for string in dict.fromkeys(leading + inner):
+        for e in range(index.entry_starts[string], index.entry_starts[string + 1]):
+            if len(matches) == limit:
+                return matches
+            matches.append(Match(
+                index.names[string], KINDS[index.kinds[e]], tuple(map(float, index.boxes[e])), tuple(map(float, index.centers[e])),
+            ))
+    return matches
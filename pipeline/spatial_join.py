@@ -0,0 +1,83 @@
+from typing import NamedTuple
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import shapely
+
+
+class PolygonIndex(NamedTuple):
+    tree: shapely.STRtree
+    geometries: np.ndarray
+    attributes: pa.Table
+
+
+def build_polygon_index(gdf: gpd.GeoDataFrame, columns: list[str]) -> PolygonIndex:
+    # Invalid rings (the BLM download has some) make GEOS overlays raise a TopologyException; the
+    # "structure" repair keeps them polygonal, dropping the slivers that collapse to lines
+    geometries = gdf.geometry.to_numpy().copy()
+    invalid = ~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)
+    geometries[invalid] = shapely.make_valid(geometries[invalid], method="structure", keep_collapsed=False)
+    keep = [c for c in columns if c in gdf.columns]
+    attributes = pa.Table.from_pandas(gdf[keep], preserve_index=False)
+    return PolygonIndex(shapely.STRtree(geometries), geometries, attributes)
+
+
+def left_join_within(points: np.ndarray, index: PolygonIndex) -> tuple[np.ndarray, np.ndarray]:
+    # Same pairs and order as gpd.sjoin(how="left", predicate="within"); unmatched rows get -1
+    left, right = index.tree.query(points, predicate="within")
+    unmatched = np.setdiff1d(np.arange(len(points)), left)
+    left = np.concatenate([left, unmatched])
+    right = np.concatenate([right, np.full(len(unmatched), -1, dtype=right.dtype)])
+    order = np.lexsort((right, left))
+    return left[order], right[order]
+
+
+def take_attributes(index: PolygonIndex, positions: np.ndarray) -> pa.Table:
+    return index.attributes.take(pa.array(positions, mask=positions < 0))
+
+
+def _linear_parts(geoms: np.ndarray) -> np.ndarray:
+    # Line x polygon intersections can come back as collections holding stray touch points
+    collections = shapely.get_type_id(geoms) == shapely.GeometryType.GEOMETRYCOLLECTION
+    if not collections.any():
+        return geoms
+    parts, owners = shapely.get_parts(geoms[collections], return_index=True)
+    is_line = np.isin(shapely.get_type_id(parts), [shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING])
+    merged = np.full(collections.sum(), None, dtype=object)
+    if is_line.any():
+        lines = shapely.get_parts(parts[is_line], return_index=True)
+        rebuilt = shapely.multilinestrings(lines[0], indices=owners[is_line][lines[1]])
+        merged[np.unique(owners[is_line])] = shapely.line_merge(rebuilt)
+    geoms = geoms.copy()
+    geoms[collections] = merged
+    return geoms
+
+
+def split_by_polygons(geoms: np.ndarray, index: PolygonIndex, min_length: float = 1e-9):
+    # Cut each line at polygon boundaries: one piece per intersecting polygon plus the
+    # uncovered remainder (polygon row -1). Overlapping polygons yield one piece each,
+    # mirroring the duplicate rows gpd.sjoin produces for them.
+    left, right = index.tree.query(geoms, predicate="intersects")
+    order = np.argsort(left, kind="stable")
+    left, right = left[order], right[order]
+    polygons = index.geometries[right]
+    pieces = shapely.intersection(geoms[left], polygons)
+
+    remainder = geoms.copy()
+    if len(left):
+        starts = np.r_[0, np.flatnonzero(np.diff(left)) + 1]
+        rank = np.arange(len(left)) - np.repeat(starts, np.diff(np.r_[starts, len(left)]))
+        for depth in range(rank.max() + 1):
+            sel = rank == depth
+            remainder[left[sel]] = shapely.difference(remainder[left[sel]], polygons[sel])
+
+    rows = np.concatenate([left, np.arange(len(geoms))])
+    parts = _linear_parts(np.concatenate([pieces, remainder]))
+    polygon_rows = np.concatenate([right, np.full(len(geoms), -1, dtype=right.dtype)])
+
+    keep = shapely.length(parts) > min_length
+    keep |= shapely.is_missing(geoms[rows]) & (polygon_rows < 0)
+    rows, parts, polygon_rows = rows[keep], parts[keep], polygon_rows[keep]
+    order = np.lexsort((polygon_rows, rows))
+    return rows[order], parts[order], polygon_rows[order]
@@ -0,0 +1,240 @@
+import gzip
+import io
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import shapely
+from PIL import Image
+
+from pipeline import pmtiles
+from pipeline.partitions import tile_coordinates
+
+# Terrarium: elevation = R * 256 + G + B / 256 - 32768 meters
+TERRARIUM_OFFSET = 32768.0
+# Decoded tiles kept in memory; a 512-pixel tile is 1 MB of float32
+TILE_CACHE_SIZE = 64
+# Zoom elevations are read at (or the archive's highest, if lower): 512-pixel tiles at z12 are
+# about 25 m per pixel in Arizona, near the 30 m source resolution of most of the state
+DEM_ZOOM = 12
+# Lines are sampled at least this often (degrees, about 30 m), besides at every vertex
+SAMPLE_DEGREES = 0.0003
+# Grades are measured over at least this run, so noise between neighbouring DEM pixels does not
+# read as a cliff; shorter lines are measured end to end
+GRADE_RUN_METERS = 50.0
+
+
+class Dem(NamedTuple):
+    # A Terrarium DEM in a PMTiles archive, memory-mapped; tiles are decoded on demand into an LRU
+    # cache of elevation arrays
+    data: np.ndarray
+    header: pmtiles.Header
+    ids: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+    runs: np.ndarray
+    zoom: int
+    cache: OrderedDict
+
+
+def open_dem(path: Path, zoom: int = DEM_ZOOM) -> Dem:
+    with open(path, "rb") as f:
+        header, _, entries = pmtiles.read_archive(f)
+    if header.tile_type not in (pmtiles.TILE_TYPE_PNG, pmtiles.TILE_TYPE_WEBP, pmtiles.TILE_TYPE_JPEG):
+        raise ValueError(f"{path} holds tile type {header.tile_type}, not raster elevation tiles")
+    zoom = min(zoom, header.max_zoom)
+    data = np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)
+    columns = np.array([(e.tile_id, e.offset, e.length, e.run_length) for e in entries], dtype=np.uint64).reshape(-1, 4)
+    return Dem(data, header, *columns.T, zoom, OrderedDict())
+
+
+def terrarium_elevation(rgb: np.ndarray) -> np.ndarray:
+    rgb = rgb.astype(np.float32)
+    return rgb[..., 0] * 256 + rgb[..., 1] + rgb[..., 2] / 256 - TERRARIUM_OFFSET
+
+
+def terrarium_rgb(elevation: np.ndarray) -> np.ndarray:
+    value = np.clip(np.asarray(elevation, dtype=np.float64) + TERRARIUM_OFFSET, 0, 65535.996)
+    whole = np.floor(value).astype(np.int64)
+    return np.stack([whole >> 8, whole & 0xFF, np.floor((value - whole) * 256)], axis=-1).astype(np.uint8)
+
+
+def decode_tile(data: bytes) -> np.ndarray:
+    # Elevation in meters of every pixel of a Terrarium tile (PNG, WebP or JPEG)
+    return terrarium_elevation(np.asarray(Image.open(io.BytesIO(data)).convert("RGB")))
+
+
+def encode_tile(elevation: np.ndarray) -> bytes:
+    # Terrarium PNG of an elevation array
+    out = io.BytesIO()
+    Image.fromarray(terrarium_rgb(elevation), "RGB").save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def _tile(dem: Dem, tile_id: int) -> np.ndarray | None:
+    if tile_id in dem.cache:
+        dem.cache.move_to_end(tile_id)
+        return dem.cache[tile_id]
+    i = np.searchsorted(dem.ids, np.uint64(tile_id), side="right") - 1
+    tile = None
+    if i >= 0 and tile_id < dem.ids[i] + dem.runs[i]:
+        start = int(dem.header.data_offset + dem.offsets[i])
+        data = dem.data[start:start + int(dem.lengths[i])].tobytes()
+        if dem.header.tile_compression == pmtiles.COMPRESSION_GZIP:
+            data = gzip.decompress(data)
+        tile = decode_tile(data)
+    dem.cache[tile_id] = tile
+    if len(dem.cache) > TILE_CACHE_SIZE:
+        dem.cache.popitem(last=False)
+    return tile
+
+
+def elevations(dem: Dem, lon, lat) -> np.ndarray:
+    # Bilinear elevation at every (lon, lat), NaN where the archive has no tile. Points are grouped
+    # by tile so each tile is looked up once per call; interpolation clamps at tile edges.
+    lon = np.asarray(lon, dtype=np.float64)
+    n = 1 << dem.zoom
+    x, y = tile_coordinates(lon, np.asarray(lat, dtype=np.float64), dem.zoom)
+    tx = np.clip(np.floor(x), 0, n - 1).astype(np.int64)
+    ty = np.clip(np.floor(y), 0, n - 1).astype(np.int64)
+    # Hilbert ids only for the distinct tiles, not for every point
+    keys, tiles = np.unique(tx * n + ty, return_inverse=True)
+    ids = pmtiles.tile_ids(dem.zoom, keys // n, keys % n)
+
+    out = np.full(len(lon), np.nan)
+    order = np.argsort(tiles, kind="stable")
+    starts = np.searchsorted(tiles[order], np.arange(len(keys) + 1))
+    for i, tile_id in enumerate(ids):
+        members = order[starts[i]:starts[i + 1]]
+        tile = _tile(dem, int(tile_id))
+        if tile is None:
+            continue
+        size_y, size_x = tile.shape
+        px = np.clip((x[members] - tx[members]) * size_x - 0.5, 0, size_x - 1)
+        py = np.clip((y[members] - ty[members]) * size_y - 0.5, 0, size_y - 1)
+        x0, y0 = np.floor(px).astype(np.int64), np.floor(py).astype(np.int64)
+        x1, y1 = np.minimum(x0 + 1, size_x - 1), np.minimum(y0 + 1, size_y - 1)
+        fx, fy = px - x0, py - y0
+        top = tile[y0, x0] * (1 - fx) + tile[y0, x1] * fx
+        bottom = tile[y1, x0] * (1 - fx) + tile[y1, x1] * fx
+        out[members] = top * (1 - fy) + bottom * fy
+    return out
+
+
+def step_meters(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    # Length of short (lon, lat) steps from the WGS84 meters per degree at their mid-latitude;
+    # within a millimeter of the geodesic at sample spacing, and far cheaper than Geod.inv
+    phi = np.radians((start[:, 1] + end[:, 1]) / 2)
+    per_lat = 111132.92 - 559.82 * np.cos(2 * phi) + 1.175 * np.cos(4 * phi) - 0.0023 * np.cos(6 * phi)
+    per_lon = 111412.84 * np.cos(phi) - 93.5 * np.cos(3 * phi) + 0.118 * np.cos(5 * phi)
+    return np.hypot((end[:, 0] - start[:, 0]) * per_lon, (end[:, 1] - start[:, 1]) * per_lat)
+
+
+class Samples(NamedTuple):
+    # Points along lines: coordinates, the part and line of each point, and meters from the
+    # previous point of the same part (0 at every part start)
+    coords: np.ndarray
+    parts: np.ndarray
+    lines: np.ndarray
+    steps: np.ndarray
+
+
+def line_samples(geoms: np.ndarray, spacing: float = SAMPLE_DEGREES) -> Samples:
+    parts, owners = shapely.get_parts(shapely.segmentize(geoms, spacing), return_index=True)
+    coords, part_rows = shapely.get_coordinates(parts, return_index=True)
+    steps = np.zeros(len(coords))
+    same = part_rows[1:] == part_rows[:-1]
+    start, end = coords[:-1][same], coords[1:][same]
+    steps[1:][same] = step_meters(start, end)
+    return Samples(coords, part_rows, owners[part_rows], steps)
+
+
+def elevation_profiles(dem: Dem, geoms: np.ndarray, spacing: float = SAMPLE_DEGREES) -> pa.Table:
+    # One row per sample of every line: the line's row, meters along it (parts of a multiline
+    # follow one another), position and elevation (null off the DEM)
+    samples = line_samples(np.asarray(geoms, dtype=object), spacing)
+    along = np.cumsum(samples.steps)
+    starts = np.flatnonzero(np.r_[True, samples.lines[1:] != samples.lines[:-1]]) if len(along) else np.zeros(0, dtype=np.int64)
+    along -= np.repeat(along[starts], np.diff(np.r_[starts, len(along)]))
+    return pa.table({
+        "line": pa.array(samples.lines, type=pa.int64()),
+        "distance_m": along,
+        "lon": samples.coords[:, 0],
+        "lat": samples.coords[:, 1],
+        "elevation_m": pa.array(elevations(dem, samples.coords[:, 0], samples.coords[:, 1]), from_pandas=True),
+    })
+
+
+def road_elevation(dem: Dem, geoms: np.ndarray) -> pa.Table:
+    # Lowest and highest point, total climb and descent along the digitized direction, and the
+    # steepest grade over GRADE_RUN_METERS, of every line; null where it lies off the DEM
+    count = len(geoms)
+    samples = line_samples(geoms)
+    elevation = elevations(dem, samples.coords[:, 0], samples.coords[:, 1])
+    known = ~np.isnan(elevation)
+
+    low = np.full(count, np.inf)
+    high = np.full(count, -np.inf)
+    np.minimum.at(low, samples.lines[known], elevation[known])
+    np.maximum.at(high, samples.lines[known], elevation[known])
+
+    rise = np.zeros(len(elevation))
+    rise[1:] = np.where(samples.steps[1:] > 0, elevation[1:] - elevation[:-1], 0)
+    rise = np.nan_to_num(rise)
+    climb = np.bincount(samples.lines, weights=np.maximum(rise, 0), minlength=count)
+    descent = np.bincount(samples.lines, weights=np.maximum(-rise, 0), minlength=count)
+
+    # Each sample pairs with the first one GRADE_RUN_METERS or more further along its part; parts
+    # are laid end to end with gaps no run can bridge. Parts shorter than that pair end to end.
+    gap = np.where(samples.steps > 0, samples.steps, GRADE_RUN_METERS * 2)
+    along = np.cumsum(gap)
+    ahead = np.searchsorted(along, along + GRADE_RUN_METERS)
+    first = np.flatnonzero(np.r_[True, samples.parts[1:] != samples.parts[:-1]]) if len(along) else np.zeros(0, dtype=np.int64)
+    last = np.r_[first[1:], len(along)] - 1
+    short = along[last] - along[first] < GRADE_RUN_METERS
+    left = np.r_[np.arange(len(along)), first[short]]
+    right = np.r_[np.minimum(ahead, len(along) - 1), last[short]]
+    pair = (right > left) & (samples.parts[right] == samples.parts[left]) & known[left] & known[right]
+    left, right = left[pair], right[pair]
+    grade = np.abs(elevation[right] - elevation[left]) / (along[right] - along[left])
+    steepest = np.full(count, np.nan)
+    np.fmax.at(steepest, samples.lines[left], grade)
+
+    def column(values, digits):
+        return pa.array(np.round(np.where(np.isfinite(values), values, np.nan), digits), from_pandas=True)
+
+    any_known = np.isfinite(low)
+    return pa.table({
+        "elevation_min_m": column(low, 1),
+        "elevation_max_m": column(high, 1),
+        "climb_m": column(np.where(any_known, climb, np.nan), 1),
+        "descent_m": column(np.where(any_known, descent, np.nan), 1),
+        "max_grade_pct": column(steepest * 100, 1),
+    })
+
+
+def write_dem(path: Path, zoom: int, tiles: Iterable[tuple[int, int, np.ndarray]], bounds: tuple) -> int:
+    # PMTiles archive of Terrarium PNG tiles from (x, y, elevation array) at one zoom
+    encoded = sorted(
+        (int(pmtiles.tile_ids(zoom, x, y)), encode_tile(elevation)) for x, y, elevation in tiles
+    )
+    west, south, east, north = bounds
+    header = pmtiles.Header(
+        tile_compression=pmtiles.COMPRESSION_NONE,
+        tile_type=pmtiles.TILE_TYPE_PNG,
+        min_zoom=zoom,
+        max_zoom=zoom,
+        min_lon_e7=int(west * 1e7),
+        min_lat_e7=int(south * 1e7),
+        max_lon_e7=int(east * 1e7),
+        max_lat_e7=int(north * 1e7),
+        center_zoom=zoom,
+        center_lon_e7=int((west + east) / 2 * 1e7),
+        center_lat_e7=int((south + north) / 2 * 1e7),
+    )
+    pmtiles.write_archive(path, header, json.dumps({"encoding": "terrarium"}).encode(), encoded)
+    return len(encoded)
+
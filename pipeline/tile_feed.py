@@ -0,0 +1,334 @@
+import contextlib
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+
+from pipeline import instrument, pmtiles
+from pipeline.geoparquet import geometry_column
+from pipeline.partitions import tile_bounds, tile_coordinates
+
+FEED_BATCH_SIZE = 65_536
+STDERR_TAIL = 20
+# tippecanoe's default --buffer of 5 pixels in 256, in tile widths
+TILE_BUFFER = 5 / 256
+# Past this share of the archive's tiles a full rebuild is cheaper than regenerating and splicing
+SPLICE_MAX_SHARE = 0.5
+# Optional per-feature zoom range, emitted as the feature's "tippecanoe" member
+ZOOM_COLUMNS = ("tippecanoe_minzoom", "tippecanoe_maxzoom")
+INDEX_SCHEMA = pa.schema([
+    ("hash", pa.uint64()),
+    ("xmin", pa.float64()),
+    ("ymin", pa.float64()),
+    ("xmax", pa.float64()),
+    ("ymax", pa.float64()),
+])
+
+
+class TileLayer(NamedTuple):
+    name: str
+    source: str
+    minzoom: int
+    maxzoom: int
+    options: tuple[str, ...]
+    attributes: tuple[str, ...]
+
+
+# attributes: the feature properties the frontend reads (styles in config/layers.js,
+# the road popup and UnitInfoPanel); everything else stays out of the tiles
+TILE_LAYERS = {
+    layer.name: layer
+    for layer in [
+        TileLayer(
+            "roads", "roads_enriched", 6, 14, ("--drop-densest-as-needed", "--extend-zooms-if-still-dropping"),
+            ("class", "land_status", "road_name", "surface", "GMUNAME", "elevation_min_m", "elevation_max_m", "max_grade_pct"),
+        ),
+        TileLayer("places", "places_hunt", 8, 14, ("-r1",), ("name",)),
+        TileLayer("water", "water_named", 8, 14, ("-r1",), ("name",)),
+        TileLayer(
+            "hunt-units", "hunt_units", 6, 14, ("--no-tile-size-limit",),
+            ("GMUNAME", "REG_NAME", "ACRES", "AGFDLink"),
+        ),
+        # Dissolved and pre-simplified per zoom band by prepare_land_ownership, so nothing is dropped,
+        # small parcels included
+        TileLayer(
+            "land-ownership", "land_ownership", 8, 14,
+            ("--no-tile-size-limit", "--detect-shared-borders", "--no-tiny-polygon-reduction"), ("ADMIN_AGENCY_CODE",),
+        ),
+        # Locked sections are often a single square mile; keep them from being dropped as tiny polygons
+        TileLayer(
+            "landlocked", "landlocked", 8, 14, ("--no-tile-size-limit", "--no-tiny-polygon-reduction"),
+            ("access", "GMUNAME", "acres", "component_acres"),
+        ),
+    ]
+}
+
+
+def _json_values(arr: pa.Array) -> pa.Array:
+    # JSON text for every value; strings are escaped once per distinct value, not per row
+    if pa.types.is_dictionary(arr.type):
+        arr = arr.dictionary_decode()
+    if pa.types.is_boolean(arr.type):
+        text = pc.if_else(arr, "true", "false")
+    elif pa.types.is_integer(arr.type):
+        text = arr.cast(pa.string())
+    elif pa.types.is_floating(arr.type):
+        text = pc.if_else(pc.is_finite(arr), arr.cast(pa.string()), pa.scalar(None, pa.string()))
+    else:
+        encoded = arr.cast(pa.string()).dictionary_encode()
+        escaped = [json.dumps(v, ensure_ascii=False) for v in encoded.dictionary.to_pylist()]
+        text = pa.array(escaped, type=pa.string()).take(encoded.indices)
+    return pc.fill_null(text, "null")
+
+
+def feature_lines(table: pa.Table, geom_col: str, attributes) -> tuple[pa.Array, np.ndarray]:
+    # One newline-terminated GeoJSON Feature per row, assembled column-wise in Arrow, and the
+    # bbox of each. Rows without a geometry are dropped.
+    geoms = shapely.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False))
+    present = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    if not present.all():
+        table, geoms = table.filter(pa.array(present)), geoms[present]
+
+    parts = ['{"type":"Feature","properties":{']
+    names = [name for name in attributes if name in table.column_names]
+    for i, name in enumerate(names):
+        parts += [("," if i else "") + json.dumps(name) + ":", _json_values(table.column(name).combine_chunks())]
+    parts.append("}")
+    zooms = [name for name in ZOOM_COLUMNS if name in table.column_names]
+    if zooms:
+        parts.append(',"tippecanoe":{')
+        for i, name in enumerate(zooms):
+            key = name.removeprefix("tippecanoe_")
+            parts += [("," if i else "") + f'"{key}":', _json_values(table.column(name).combine_chunks())]
+        parts.append("}")
+    parts += [',"geometry":', pa.array(shapely.to_geojson(geoms), type=pa.string()), "}\n"]
+    return pc.binary_join_element_wise(*parts, ""), shapely.bounds(geoms)
+
+
+def _line_offsets(lines: pa.Array) -> np.ndarray:
+    return np.frombuffer(lines.buffers()[1], dtype=np.int32, count=len(lines) + 1, offset=lines.offset * 4)
+
+
+def _write_lines(stream, lines: pa.Array):
+    # The string array's data buffer already is the concatenated text; write it without copying
+    if len(lines) == 0:
+        return
+    offsets = _line_offsets(lines)
+    stream.write(memoryview(lines.buffers()[2])[offsets[0]:offsets[-1]])
+
+
+def _index_batch(lines: pa.Array, bounds: np.ndarray) -> pa.Table:
+    # A hash of exactly what tippecanoe was fed for each feature, with the feature's bbox
+    if len(lines) == 0:
+        return INDEX_SCHEMA.empty_table()
+    offsets = _line_offsets(lines)
+    data = memoryview(lines.buffers()[2])
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(data[a:b], digest_size=8).digest(), "little")
+         for a, b in zip(offsets[:-1], offsets[1:])),
+        dtype=np.uint64, count=len(lines),
+    )
+    return pa.table([hashes, *bounds.T], schema=INDEX_SCHEMA)
+
+
+def feature_index_path(output_path: Path) -> Path:
+    return output_path.with_suffix(".features.parquet")
+
+
+def _layer_key(layer: TileLayer) -> bytes:
+    return json.dumps(layer._asdict()).encode()
+
+
+def touched_tiles(bounds: np.ndarray, zoom: int) -> np.ndarray:
+    # (x, y) of every tile at zoom whose buffered extent reaches one of the bboxes
+    n = 1 << zoom
+    x0, y1 = tile_coordinates(bounds[:, 0], bounds[:, 1], zoom)
+    x1, y0 = tile_coordinates(bounds[:, 2], bounds[:, 3], zoom)
+    ranges = np.clip(
+        np.floor(np.column_stack([x0 - TILE_BUFFER, x1 + TILE_BUFFER, y0 - TILE_BUFFER, y1 + TILE_BUFFER])), 0, n - 1
+    ).astype(np.int64)
+    tiles = [
+        np.stack(np.meshgrid(np.arange(xa, xb + 1), np.arange(ya, yb + 1)), axis=-1).reshape(-1, 2)
+        for xa, xb, ya, yb in np.unique(ranges, axis=0)
+    ]
+    return np.unique(np.concatenate(tiles), axis=0) if tiles else np.empty((0, 2), dtype=np.int64)
+
+
+def read_batches(path: Path, attributes) -> Iterator[tuple[pa.Table, str]]:
+    # Only the geometry and the wanted attributes are read
+    if path.suffix == ".parquet":
+        source = pq.ParquetFile(path)
+        geom_col = geometry_column(source.schema_arrow)
+        columns = [c for c in (*attributes, *ZOOM_COLUMNS) if c in source.schema_arrow.names] + [geom_col]
+        for batch in source.iter_batches(batch_size=FEED_BATCH_SIZE, columns=columns):
+            yield pa.Table.from_batches([batch]), geom_col
+        return
+
+    import pyogrio
+
+    fields = set(pyogrio.read_info(path)["fields"])
+    with pyogrio.open_arrow(
+        path, columns=[c for c in (*attributes, *ZOOM_COLUMNS) if c in fields], batch_size=FEED_BATCH_SIZE,
+        use_pyarrow=True,
+    ) as (meta, reader):
+        geom_col = meta["geometry_name"] or "wkb_geometry"
+        for batch in reader:
+            yield pa.Table.from_batches([batch]), geom_col
+
+
+def _drain(stream, name: str, tail: deque):
+    for raw in stream:
+        line = raw.decode(errors="replace").rstrip()
+        if line:
+            tail.append(line)
+            print(f"    [{name}] {line}", flush=True)
+
+
+def _feature_batches(layer: TileLayer, inputs: list[Path]) -> Iterator[tuple[pa.Array, np.ndarray]]:
+    for path in inputs:
+        for table, geom_col in read_batches(path, layer.attributes):
+            yield feature_lines(table, geom_col, layer.attributes)
+
+
+def _run_tippecanoe(layer: TileLayer, batches: Iterator[pa.Array], output_path: Path, threads: int | None) -> int:
+    # Streams the batches into tippecanoe's stdin as GeoJSON lines. The tileset is written to a
+    # temporary name and only replaces output_path when tippecanoe exits cleanly.
+    tmp_path = output_path.with_suffix(".tmp.pmtiles")
+    command = [
+        "tippecanoe", "-o", str(tmp_path), "-l", layer.name,
+        f"--minimum-zoom={layer.minzoom}", f"--maximum-zoom={layer.maxzoom}",
+        *layer.options, "--no-progress-indicator", "--force",
+    ]
+    env = dict(os.environ)
+    if threads:
+        env["TIPPECANOE_MAX_THREADS"] = str(threads)
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    tail = deque(maxlen=STDERR_TAIL)
+    drain = threading.Thread(target=_drain, args=(process.stderr, layer.name, tail), daemon=True)
+    drain.start()
+
+    features = 0
+    try:
+        for lines in batches:
+            _write_lines(process.stdin, lines)
+            features += len(lines)
+        process.stdin.close()
+    except BrokenPipeError:
+        # tippecanoe stopped reading; its exit status and stderr below say why
+        with contextlib.suppress(BrokenPipeError):
+            process.stdin.close()
+    except BaseException:
+        process.kill()
+        instrument.wait(process)
+        drain.join()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    returncode = instrument.wait(process)
+    drain.join()
+    if returncode != 0:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"tippecanoe exited with status {returncode} for {layer.name}:\n" + "\n".join(tail))
+    tmp_path.replace(output_path)
+    return features
+
+
+def build_tileset(layer: TileLayer, inputs: list[Path], output_path: Path, threads: int | None = None) -> int:
+    # Full build. The feature index written next to the archive lets update_tileset find what changed.
+    index_path = feature_index_path(output_path)
+    index_path.unlink(missing_ok=True)
+    index = []
+
+    def batches():
+        for lines, bounds in _feature_batches(layer, inputs):
+            index.append(_index_batch(lines, bounds))
+            yield lines
+
+    features = _run_tippecanoe(layer, batches(), output_path, threads)
+    table = pa.concat_tables(index) if index else INDEX_SCHEMA.empty_table()
+    pq.write_table(table.replace_schema_metadata({"tile_layer": _layer_key(layer)}), index_path)
+    return features
+
+
+class TileUpdate(NamedTuple):
+    features: int
+    changed: int
+    tiles: int
+    # Why the archive was rebuilt in full instead of spliced; None when it was spliced
+    rebuilt: str | None
+
+
+def update_tileset(layer: TileLayer, inputs: list[Path], output_path: Path, threads: int | None = None) -> TileUpdate:
+    # Regenerates only the tiles that changed features reach and splices them into the existing
+    # archive. tippecanoe sees just the features around those tiles, so its density-based dropping
+    # there can differ slightly from a full build; a periodic build_tileset resets that.
+    index_path = feature_index_path(output_path)
+    if not output_path.exists() or not index_path.exists():
+        features = build_tileset(layer, inputs, output_path, threads)
+        return TileUpdate(features, features, 0, "no archive and feature index from a previous build")
+    previous = pq.read_table(index_path)
+    if (previous.schema.metadata or {}).get(b"tile_layer") != _layer_key(layer):
+        features = build_tileset(layer, inputs, output_path, threads)
+        return TileUpdate(features, features, 0, "layer settings changed")
+
+    with instrument.step("diff features"):
+        current = pa.concat_tables(
+            [_index_batch(lines, bounds) for lines, bounds in _feature_batches(layer, inputs)]
+        ) if inputs else INDEX_SCHEMA.empty_table()
+        old_hashes = previous.column("hash").to_numpy()
+        new_hashes = current.column("hash").to_numpy()
+        removed = previous.filter(pa.array(~np.isin(old_hashes, new_hashes)))
+        added = current.filter(pa.array(~np.isin(new_hashes, old_hashes)))
+        changed = np.column_stack([
+            np.concatenate([removed.column(c).to_numpy(), added.column(c).to_numpy()])
+            for c in ("xmin", "ymin", "xmax", "ymax")
+        ])
+    if len(changed) == 0:
+        return TileUpdate(0, 0, 0, None)
+
+    with open(output_path, "rb") as f:
+        header = pmtiles.read_header(f)
+    replaced = np.concatenate([
+        pmtiles.tile_ids(zoom, *touched_tiles(changed, zoom).T)
+        for zoom in range(header.min_zoom, header.max_zoom + 1)
+    ])
+    if len(replaced) > SPLICE_MAX_SHARE * header.addressed_tiles:
+        features = build_tileset(layer, inputs, output_path, threads)
+        return TileUpdate(features, len(changed), 0, f"{len(replaced)} of {header.addressed_tiles} tiles touched")
+
+    # Every touched tile lies inside a touched tile at the archive's lowest zoom, so the
+    # features reaching those coarse tiles (with buffer) are all tippecanoe needs
+    coarse = touched_tiles(changed, header.min_zoom)
+    west, _, _, north = tile_bounds(coarse[:, 0] - TILE_BUFFER, coarse[:, 1] - TILE_BUFFER, header.min_zoom)
+    _, south, east, _ = tile_bounds(coarse[:, 0] + TILE_BUFFER, coarse[:, 1] + TILE_BUFFER, header.min_zoom)
+
+    def nearby():
+        for lines, bounds in _feature_batches(layer, inputs):
+            hit = (
+                (bounds[:, [0]] <= east) & (bounds[:, [2]] >= west)
+                & (bounds[:, [1]] <= north) & (bounds[:, [3]] >= south)
+            ).any(axis=1)
+            yield lines.filter(pa.array(hit))
+
+    patch_path = output_path.with_suffix(".patch.pmtiles")
+    index_path.unlink()
+    try:
+        with instrument.step("regenerate tiles"):
+            features = _run_tippecanoe(layer, nearby(), patch_path, threads)
+        with instrument.step("splice"):
+            pmtiles.splice(output_path, patch_path, replaced, output_path)
+    finally:
+        patch_path.unlink(missing_ok=True)
+    pq.write_table(current.replace_schema_metadata({"tile_layer": _layer_key(layer)}), index_path)
+    return TileUpdate(features, len(changed), len(replaced), None)
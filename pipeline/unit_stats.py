@@ -0,0 +1,138 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyproj
+import shapely
+
+from pipeline.columns import UNKNOWN_LAND_STATUS, UNKNOWN_SURFACE, hunt_category, land_status
+from pipeline.spatial_join import PolygonIndex, left_join_within, split_by_polygons, take_attributes
+
+METERS_PER_MILE = 1609.344
+SQUARE_METERS_PER_ACRE = 4046.8564224
+GEOD = pyproj.Geod(ellps="WGS84")
+# NAD83 / Conus Albers is equal-area, so planar areas in it are true ellipsoidal areas
+EQUAL_AREA = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:5070", always_xy=True)
+UNIT = "GMUNAME"
+
+
+def sum_by(table: pa.Table, keys: list[str], value: str) -> pa.Table:
+    return table.group_by(keys).aggregate([(value, "sum")]).rename_columns({f"{value}_sum": value}).select([*keys, value])
+
+
+def geodesic_lengths(geoms: np.ndarray) -> np.ndarray:
+    # Length in meters of every (multi)line on the WGS84 ellipsoid, summing all segments in one call
+    parts, owners = shapely.get_parts(geoms, return_index=True)
+    coords, part_rows = shapely.get_coordinates(parts, return_index=True)
+    same = part_rows[1:] == part_rows[:-1]
+    start, end = coords[:-1][same], coords[1:][same]
+    _, _, distances = GEOD.inv(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+    part_lengths = np.bincount(part_rows[1:][same], weights=distances, minlength=len(parts))
+    return np.bincount(owners, weights=part_lengths, minlength=len(geoms))
+
+
+def acres(geoms: np.ndarray) -> np.ndarray:
+    projected = shapely.transform(geoms, lambda xy: np.column_stack(EQUAL_AREA.transform(xy[:, 0], xy[:, 1])))
+    return shapely.area(projected) / SQUARE_METERS_PER_ACRE
+
+
+def exclusive_polygons(polygons: np.ndarray) -> np.ndarray:
+    # Where polygons overlap, the smallest keeps the overlap (the inholding rather than the forest
+    # around it, as lookup.locate decides) and it is cut out of the larger ones, so every point lies
+    # in at most one polygon. Ties go to the earlier row.
+    rank = np.empty(len(polygons), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(polygons)), shapely.area(polygons)))] = np.arange(len(polygons))
+    left, right = shapely.STRtree(polygons).query(polygons, predicate="intersects")
+    smaller = rank[right] < rank[left]
+    left, right = left[smaller], right[smaller]
+    # Neighbours that only share an edge have nothing to give up
+    interior = shapely.relate_pattern(polygons[left], polygons[right], "2********")
+    left, right = left[interior], right[interior]
+
+    polygons = polygons.copy()
+    if len(left):
+        order = np.argsort(left, kind="stable")
+        left, covers = left[order], polygons[right[order]]
+        starts = np.r_[0, np.flatnonzero(np.diff(left)) + 1]
+        depth = np.arange(len(left)) - np.repeat(starts, np.diff(np.r_[starts, len(left)]))
+        for level in range(depth.max() + 1):
+            sel = depth == level
+            polygons[left[sel]] = shapely.difference(polygons[left[sel]], covers[sel])
+    return polygons
+
+
+def unique_roads(batch: pa.Table, geom_col: str, carried: pa.Table | None = None) -> tuple[pa.Table, pa.Table]:
+    # Drops repeated (id, geometry) rows: enriched layers hold a copy of a road for every
+    # overlapping polygon the join matched. They are Hilbert-sorted, so the copies lie together and
+    # only the last road of a batch can come up again at the start of the next; that road's rows
+    # are returned to be carried into the next call.
+    unique = batch.group_by(["id", geom_col], use_threads=False).aggregate([("surface", "first")])
+    unique = unique.rename_columns({"surface_first": "surface"}).select(["id", geom_col, "surface"])
+    if carried is not None and carried.num_rows:
+        repeated = pc.and_(
+            pc.is_in(unique.column("id"), value_set=carried.column("id").combine_chunks()),
+            pc.is_in(unique.column(geom_col), value_set=carried.column(geom_col).combine_chunks()),
+        )
+        unique = unique.filter(pc.invert(pc.fill_null(repeated, False)))
+    if not batch.num_rows:
+        return unique, carried
+    last = batch.column("id")[-1]
+    tail = batch.filter(pc.equal(batch.column("id"), last)) if last.is_valid else batch.slice(batch.num_rows - 1)
+    return unique, tail.select(["id", geom_col])
+
+
+def road_miles(geoms: np.ndarray, surfaces: pa.Array, sma_index: PolygonIndex, gmu_index: PolygonIndex) -> pa.Table:
+    # Road miles per unit, land status and surface. Roads are cut at agency and unit boundaries,
+    # so a road crossing either is counted piece by piece on the right side of it; the polygons
+    # must not overlap (see exclusive_polygons) or overlaps are counted once per polygon.
+    owner_rows, pieces, sma_rows = split_by_polygons(geoms, sma_index)
+    unit_rows, pieces, gmu_rows = split_by_polygons(pieces, gmu_index)
+    codes = take_attributes(sma_index, sma_rows[unit_rows]).column("ADMIN_AGENCY_CODE")
+    table = pa.table({
+        UNIT: take_attributes(gmu_index, gmu_rows).column(UNIT).cast(pa.string()),
+        "land_status": land_status(codes),
+        "surface": surfaces.take(pa.array(owner_rows[unit_rows])).cast(pa.string()).fill_null(UNKNOWN_SURFACE),
+        "miles": geodesic_lengths(pieces) / METERS_PER_MILE,
+    })
+    return sum_by(table.filter(table.column(UNIT).is_valid()), [UNIT, "land_status", "surface"], "miles")
+
+
+def agency_acres(polygons: np.ndarray, agencies: np.ndarray, gmu_index: PolygonIndex) -> pa.Table:
+    # Acres of each agency's land inside each unit; polygons must not overlap
+    left, right = gmu_index.tree.query(polygons, predicate="intersects")
+    pieces = shapely.intersection(polygons[left], gmu_index.geometries[right])
+    table = pa.table({
+        UNIT: take_attributes(gmu_index, right).column(UNIT).cast(pa.string()),
+        "agency": pa.array(agencies[left], type=pa.string()),
+        "acres": acres(pieces),
+    })
+    return sum_by(table, [UNIT, "agency"], "acres")
+
+
+def poi_counts(geoms: np.ndarray, categories, gmu_index: PolygonIndex) -> pa.Table:
+    rows, gmu_rows = left_join_within(shapely.point_on_surface(geoms), gmu_index)
+    table = pa.table({
+        UNIT: take_attributes(gmu_index, gmu_rows).column(UNIT).cast(pa.string()),
+        "category": hunt_category(categories).take(pa.array(rows)),
+        "count": pa.repeat(1, len(rows)),
+    })
+    table = table.filter(table.column(UNIT).is_valid()).filter(table.column("category").is_valid())
+    return sum_by(table, [UNIT, "category"], "count")
+
+
+def unit_stats(unit_acres: pa.Table, miles: pa.Table, land: pa.Table, pois: pa.Table) -> dict:
+    # {unit: {"acres", "road_miles": {land status: {surface: miles}}, "agency_acres", "poi_counts"}}
+    units = {
+        unit: {"acres": round(total), "road_miles": {}, "agency_acres": {}, "poi_counts": {}}
+        for unit, total in zip(unit_acres.column(UNIT).to_pylist(), unit_acres.column("acres").to_pylist())
+    }
+    for row in miles.sort_by([("miles", "descending")]).to_pylist():
+        if row[UNIT] in units:
+            by_status = units[row[UNIT]]["road_miles"].setdefault(row["land_status"] or UNKNOWN_LAND_STATUS, {})
+            by_status[row["surface"]] = round(row["miles"], 2)
+    for row in land.sort_by([("acres", "descending")]).to_pylist():
+        if row[UNIT] in units:
+            units[row[UNIT]]["agency_acres"][row["agency"]] = round(row["acres"])
+    for row in pois.sort_by([("count", "descending")]).to_pylist():
+        if row[UNIT] in units:
+            units[row[UNIT]]["poi_counts"][row["category"]] = row["count"]
+    return units
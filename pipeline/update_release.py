@@ -0,0 +1,216 @@
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+from pipeline import instrument
+from pipeline.clip_engine import clip_batch
+from pipeline.geoparquet import BBOX_COLUMN, geometry_column, geoparquet_schema, sort_geoparquet
+from pipeline.manifest import is_fresh, record
+from pipeline.overture import THEMES as OVERTURE_THEMES, ThemeQuery, connect, diff_theme, extract_themes
+from pipeline.utils import AZ_BBOX, OVERTURE_S3_BASE, PROCESSED_DIR, RAW_DIR
+
+download = importlib.import_module("pipeline.01_download")
+clip = importlib.import_module("pipeline.02_clip_arizona")
+enrich = importlib.import_module("pipeline.03_enrich")
+
+PATCH_BATCH_SIZE = 65_536
+# Overture theme -> (raw layer, clipped layer, enriched layer)
+THEME_LAYERS = {
+    "transportation": ("overture_transportation_az", "overture_transportation_clipped", "roads_enriched"),
+    "places": ("overture_places_az", "overture_places_clipped", "places_hunt"),
+    "water": ("overture_water_az", "overture_water_clipped", "water_named"),
+}
+
+
+def enriched_stages(theme: str) -> list[dict]:
+    # Fingerprints the enriched layer may have been built under; the matching one is kept
+    if theme == "transportation":
+        return [enrich.road_stage(False), enrich.road_stage(True)]
+    if theme == "places":
+        return [enrich.poi_stage()]
+    return [enrich.water_stage()]
+
+
+def enrich_rows(theme: str, stage: dict, table: pa.Table, geom_col: str) -> pa.Table:
+    if theme == "transportation":
+        sma_index, gmu_index = enrich.load_polygon_indexes()
+        return enrich.enrich_road_batch(
+            table, geom_col, sma_index, gmu_index, stage["params"]["exact"], enrich.load_dem()
+        )
+    if theme == "places":
+        return enrich.hunt_poi_batch(table, geom_col)
+    return enrich.named_water_batch(table, geom_col)
+
+
+def read_ids(path: Path, ids: pa.Array) -> pa.Table:
+    source = pq.ParquetFile(path)
+    batches = [
+        batch.filter(pc.is_in(batch.column("id"), value_set=ids))
+        for batch in source.iter_batches(batch_size=PATCH_BATCH_SIZE)
+    ]
+    return pa.Table.from_batches(batches, schema=source.schema_arrow)
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    return table.select(schema.names).cast(schema)
+
+
+def _patch_schema(schema: pa.Schema, rows_schema: pa.Schema) -> pa.Schema:
+    # Layers written from GeoDataFrames carry null-typed fields wherever pandas only saw nulls;
+    # permissive unification widens them to the type the new rows actually have
+    fields = [rows_schema.field(name) for name in schema.names if name in rows_schema.names]
+    unified = pa.unify_schemas([schema, pa.schema(fields)], promote_options="permissive")
+    return unified.with_metadata(schema.metadata)
+
+
+def patch_layer(path: Path, drop_ids: pa.Array, rows: pa.Table, sort: bool = False) -> int:
+    # Rewrites a layer without the rows of drop_ids and with rows appended, streaming the kept
+    # rows batch by batch. Sorted layers go through the Hilbert sort, which restores the bbox column.
+    source = pq.ParquetFile(path)
+    schema = geoparquet_schema(source.schema_arrow)
+    if sort and BBOX_COLUMN in schema.names:
+        schema = schema.remove(schema.get_field_index(BBOX_COLUMN))
+    schema = _patch_schema(schema, rows.schema)
+    rows = _conform(rows, schema)
+
+    tmp_path = path.with_suffix(".patch.parquet")
+    written = 0
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for batch in source.iter_batches(batch_size=PATCH_BATCH_SIZE):
+                kept = batch.filter(pc.invert(pc.is_in(batch.column("id"), value_set=drop_ids)))
+                writer.write_table(_conform(pa.Table.from_batches([kept]), schema))
+                written += kept.num_rows
+            writer.write_table(rows)
+            written += rows.num_rows
+        if sort:
+            sort_geoparquet(tmp_path, path)
+        else:
+            tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return written
+
+
+def update_theme(theme: ThemeQuery, next_path: Path, source: str, boundary, con: duckdb.DuckDBPyConnection) -> int:
+    raw_name, clipped_name, enriched_name = THEME_LAYERS[theme.name]
+    raw_path = RAW_DIR / f"{raw_name}.parquet"
+    clipped_path = PROCESSED_DIR / f"{clipped_name}.parquet"
+    enriched_path = PROCESSED_DIR / f"{enriched_name}.parquet"
+
+    # Only layers that are current with the previous release, extracted with the same columns,
+    # can be patched; the rest are left stale and rebuild in full on the next clip or enrich run
+    clip_stage = clip.clip_stage(raw_name)
+    clipped_current = (
+        raw_path.exists()
+        and is_fresh(clipped_path, **clip_stage)
+        and set(pq.read_schema(raw_path).names) == set(pq.read_schema(next_path).names)
+    )
+    enriched_stage = None
+    if clipped_current:
+        enriched_stage = next((s for s in enriched_stages(theme.name) if is_fresh(enriched_path, **s)), None)
+
+    patched = 0
+    if clipped_current:
+        with instrument.step("diff"):
+            diff = diff_theme(con, theme, raw_path, next_path)
+        print(
+            f"  {theme.name}: {len(diff.added)} added, {len(diff.geometry)} geometry and "
+            f"{len(diff.attributes)} attribute changes, {len(diff.removed)} removed"
+        )
+        changed = pa.concat_arrays([diff.geometry, diff.attributes])
+        drop_ids = pa.concat_arrays([changed, diff.removed])
+        new_rows = read_ids(next_path, pa.concat_arrays([diff.added, changed]))
+        instrument.rows(rows_in=new_rows.num_rows)
+
+        with instrument.step(f"patch {clipped_name}"):
+            geom_col = geometry_column(new_rows.schema)
+            clipped_rows = clip_batch(new_rows, geom_col, boundary)
+            patch_layer(clipped_path, drop_ids, clipped_rows)
+        if enriched_stage is not None:
+            with instrument.step(f"patch {enriched_name}"):
+                enriched_rows = enrich_rows(theme.name, enriched_stage, clipped_rows, geom_col)
+                patch_layer(enriched_path, drop_ids, enriched_rows, sort=True)
+            patched = enriched_rows.num_rows
+        else:
+            print(f"    {enriched_name} is not current with the previous release; it will be rebuilt in full")
+    else:
+        print(f"  {theme.name}: {clipped_name} is not current with the previous release; it will be rebuilt in full")
+
+    next_path.replace(raw_path)
+    record(raw_path, **download.overture_stage(theme, source))
+    if clipped_current:
+        record(clipped_path, **clip_stage)
+    if enriched_stage is not None:
+        record(enriched_path, **enriched_stage)
+        print(f"    {enriched_name} patched with {patched} new or changed rows")
+    return patched
+
+
+@instrument.stage
+def update_release(source: str = OVERTURE_S3_BASE):
+    # Moves the raw Overture layers to a new release and patches the clipped and enriched
+    # layers in place, re-running clip and enrichment only for added and changed features
+    pending = []
+    for theme in OVERTURE_THEMES:
+        raw_name = THEME_LAYERS[theme.name][0]
+        if is_fresh(RAW_DIR / f"{raw_name}.parquet", **download.overture_stage(theme, source)):
+            print(f"  Overture {theme.name} is already at this release, skipping.")
+            continue
+        pending.append((theme, RAW_DIR / f"{raw_name}.next.parquet"))
+    if not pending:
+        return
+
+    print(f"Downloading Overture {', '.join(t.name for t, _ in pending)} from {source}...")
+    con = connect(source)
+    with instrument.step("extract"):
+        extracted = list(extract_themes(con, pending, source, AZ_BBOX))
+    con.close()
+
+    boundary = clip.load_az_boundary().geometry.union_all()
+    shapely.prepare(boundary)
+    con = duckdb.connect()
+    try:
+        for theme, next_path, rows in extracted:
+            print(f"  Overture {theme.name} extracted ({rows} features)")
+            instrument.rows(rows_out=update_theme(theme, next_path, source, boundary, con))
+    finally:
+        con.close()
+        for _, next_path in pending:
+            next_path.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the Overture layers to a new release incrementally")
+    parser.add_argument(
+        "--overture-source",
+        default=OVERTURE_S3_BASE,
+        help="New release prefix: the S3 bucket path or a local mirror with theme=*/type=* Parquet",
+    )
+    parser.add_argument("--profile", action="store_true", help="Capture a cProfile of the update in the run report")
+    args = parser.parse_args()
+    if args.profile:
+        instrument.enable_profiling()
+
+    print("=" * 60)
+    print("AZ Hunt Planner - Incremental Overture Update")
+    print("=" * 60)
+
+    update_release(args.overture_source)
+
+    print("=" * 60)
+    print("Update complete!")
+    print(f"Run report: {instrument.write_report()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 AZ_BBOX = {
@@ -10,10 +11,13 @@ AZ_BBOX = {
 OVERTURE_RELEASE = "2026-01-21.0"
 OVERTURE_S3_BASE = f"s3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}"
 
-DATA_DIR = Path(__file__).parent.parent / "data"
+# AZHP_DATA_DIR points the whole pipeline at another data tree (benchmarks, scratch runs)
+DATA_DIR = Path(os.environ.get("AZHP_DATA_DIR", Path(__file__).parent.parent / "data"))
 RAW_DIR = DATA_DIR / "raw"
 PROCESSED_DIR = DATA_DIR / "processed"
 TILES_DIR = DATA_DIR / "tiles"
+# Mapterhorn Terrarium DEM from make terrain; roads get elevation stats when it is present
+TERRAIN_PATH = RAW_DIR / "terrain.pmtiles"
 
 AGENCY_ACCESS_MAP = {
     "BLM": "public_blm",